@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
 import os
@@ -14,19 +14,24 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
 
-from shared.database import db, init_db, User, Interaction, Admin
-import threading
-from generate_translations import process_file as run_translation_for_file
+from shared.database import db, init_db, Interaction, Admin
+from shared.rollups import dashboard_summary, ensure_rollups, RANGES
+from shared.job_queue import enqueue, recent_jobs, queue_stalled
+from groq_service import invalidate_ai_definition
+from job_worker import start_in_process as start_job_worker
 
-def background_translation(filename):
-    print(f"[Background Task] Starting translation for {filename}...")
-    try:
-        # Re-import to avoid context issues or just run the function
-        # Using a simplified version of process_file or calling it directly if safe
-        run_translation_for_file(filename, [1]) # Defaults to Description col for simplicity, needs adjustment per file
-    except Exception as e:
-        print(f"[Background Task] Error: {e}")
-    print(f"[Background Task] Finished {filename}")
+# Interactions answered by Groq (their cached answer is dropped when corrected)
+AI_INTENTS = ("general_ai", "whatsapp_ai")
+
+# Twilio gives up on a webhook after 15 s; slower WhatsApp answers are never delivered
+TWILIO_DEADLINE_MS = 15000
+SLOW_REQUESTS_LIMIT = 100
+
+# Columns generate_translations translates per CMS file
+TRANSLATED_COLUMNS = {
+    "symptom_Description.csv": [1],     # Description
+    "symptom_precaution.csv": [1, 2, 3, 4], # Precautions
+}
 
 app = Flask(__name__)
 # Secure Secret Key from Env
@@ -39,6 +44,13 @@ ADMIN_PASS = os.getenv("ADMIN_PASSWORD", "admin123")
 # Initialize Shared Database
 # Note: passing database path in parent dir
 init_db(app)
+# Catch-up: build dashboard rollups from existing history on first start
+with app.app_context():
+    ensure_rollups()
+# Azure Web App starts only the web process: unless a job_worker.py holds this
+# node's lock, one web worker runs the CMS jobs in a background thread
+if os.getenv("JOB_WORKER_IN_WEB", "1") == "1":
+    start_job_worker()
 
 # Directories
 DATA_DIR = os.path.join(parent_dir, "Data")        # For Alerts & ML Data
@@ -78,18 +90,34 @@ def dashboard():
     if "admin_user" not in session:
         return redirect(url_for("login"))
     
-    # Fetch Analytics
-    total_users = User.query.count()
-    total_interactions = Interaction.query.count()
+    # Fetch Analytics (pre-aggregated rollups, no table scans)
+    summary = dashboard_summary(request.args.get("range", "24h"))
     
     # Recent Logs
     recent_logs = Interaction.query.order_by(Interaction.timestamp.desc()).limit(10).all()
     
     return render_template("dashboard.html", 
-                           total_users=total_users, 
-                           total_interactions=total_interactions,
+                           total_users=summary["total_users"], 
+                           total_interactions=summary["total_interactions"],
+                           active_alerts=count_active_alerts(),
+                           summary=summary,
+                           ranges=list(RANGES.keys()),
                            recent_logs=recent_logs)
 
+def count_active_alerts():
+    """Active manual broadcasts (Data/manual_alerts.json)."""
+    import json
+    json_path = os.path.join(DATA_DIR, "manual_alerts.json")
+    if not os.path.exists(json_path):
+        return 0
+    try:
+        with open(json_path, "r", encoding='utf-8') as f:
+            alerts = json.load(f)
+    except (OSError, ValueError) as e: # Unreadable file or invalid JSON/UTF-8
+        print(f"⚠️ Could not read {json_path}: {e}")
+        return 0
+    return sum(1 for a in alerts if a.get("active", True)) if isinstance(alerts, list) else 0
+
 # --- MODULE 2: CMS ---
 @app.route("/cms", methods=["GET", "POST"])
 def cms():
@@ -111,8 +139,10 @@ def cms():
             allowed_files = ["vaccination_schedule.json", "symptom_Description.csv", "symptom_precaution.csv"]
             if filename in allowed_files:
                 # 1. Save to MasterData (Original Source)
+                # Written to a temp file and renamed, so chatbot workers never read a half-written upload
                 save_path_master = os.path.join(MASTER_DIR, filename)
-                file.save(save_path_master)
+                file.save(save_path_master + ".uploading")
+                os.replace(save_path_master + ".uploading", save_path_master)
                 
                 # 2. Save to Static/Data (For Offline/Client-side Access)
                 # Helper to support parent directory traversal
@@ -124,20 +154,19 @@ def cms():
                 # Easiest way avoids seeking issues: just copy the saved file to destination
                 import shutil
                 save_path_static = os.path.join(static_data_dir, filename)
-                shutil.copy2(save_path_master, save_path_static)
-                
-                # 3. TRIGGER BACKGROUND TRANSLATION
-                # Determine columns based on filename
-                cols = [1] # Default: Description
-                if "precaution" in filename: cols = [1,2,3,4]
-                
-                # Run in thread
-                threading.Thread(target=run_translation_for_file, args=(filename, cols)).start()
-                
-                flash(f"✅ Uploaded {filename}. Background translation started (this may take time).")
+                shutil.copy2(save_path_master, save_path_static + ".uploading")
+                os.replace(save_path_static + ".uploading", save_path_static)
                 
-                # Ideally, trigger a reload in the main app (e.g., via a flag in DB or API call)
-                # For now, just updating the file is enough for next restart/reload
+                # 3. QUEUE BACKGROUND WORK (run by job_worker.py or a web worker; progress below the upload cards)
+                # Chatbot workers notice the new file themselves (knowledge_base.KnowledgeStore);
+                # the reindex job precompiles the snapshot they map
+                enqueue("reindex", "reindex", {"reason": f"uploaded {filename}"})
+                if filename in TRANSLATED_COLUMNS:
+                    # A newer upload of the same file replaces a translation that hasn't started yet
+                    job = enqueue("translate", f"translate:{filename}", {"filename": filename, "cols": TRANSLATED_COLUMNS[filename]})
+                    flash(f"✅ Uploaded {filename}. The chatbot picks it up within seconds; translation queued as job #{job.id}.")
+                else:
+                    flash(f"✅ Uploaded {filename}. The chatbot picks it up within seconds.")
             else:
                 flash(f"⚠️ Error: Only {', '.join(allowed_files)} can be updated.")
                 
@@ -148,7 +177,13 @@ def cms():
     if os.path.exists(MASTER_DIR):
         files = [f for f in os.listdir(MASTER_DIR) if f.endswith('.json') or f.endswith('.csv')]
         
-    return render_template("cms.html", files=files)
+    return render_template("cms.html", files=files, jobs=recent_jobs(), queue_stalled=queue_stalled())
+
+@app.route("/cms/jobs")
+def cms_jobs():
+    """Job list polled by the CMS page"""
+    if "admin_user" not in session: return jsonify({"error": "login required"}), 401
+    return jsonify({"jobs": recent_jobs(), "queue_stalled": queue_stalled()})
 
 # --- MODULE 3: BROADCAST ---
 @app.route("/broadcast", methods=["GET", "POST"])
@@ -219,14 +254,65 @@ def qc():
                 interaction.admin_correction = correction
                 interaction.flagged_for_review = False # Mark as reviewed
                 db.session.commit()
+                if interaction.intent_detected in AI_INTENTS:
+                    # Stop serving the corrected answer from the AI cache
+                    invalidate_ai_definition(interaction.user_message)
                 flash("✅ Correction saved. AI will learn from this in future updates.")
+
+        elif inter_id and request.form.get("action") == "invalidate":
+            interaction = Interaction.query.get(inter_id)
+            if interaction:
+                invalidate_ai_definition(interaction.user_message)
+                flash("🧹 Cached AI answer cleared. The next question will be answered fresh.")
             
     # Fetch "Red Flag" interactions: Low confidence (< 60%) or Explicitly Flagged
     flagged_logs = Interaction.query.filter(
         (Interaction.confidence_score < 60) | (Interaction.flagged_for_review == True)
     ).order_by(Interaction.timestamp.desc()).limit(50).all()
     
-    return render_template("qc.html", logs=flagged_logs)
+    return render_template("qc.html", logs=flagged_logs, ai_intents=AI_INTENTS)
+
+# --- MODULE 5: SLOW REQUESTS ---
+@app.route("/slow_requests")
+def slow_requests():
+    """Logged chat requests by latency, with their stage timings and upstream calls."""
+    if "admin_user" not in session: return redirect(url_for("login"))
+    import json
+
+    filters = {
+        "intent": request.args.get("intent", ""),
+        "language": request.args.get("language", ""),
+        "channel": request.args.get("channel", ""),
+        "min_ms": request.args.get("min_ms", type=float),
+    }
+    query = Interaction.query.filter(Interaction.latency_ms.isnot(None))
+    if filters["intent"]:
+        query = query.filter(Interaction.intent_detected == filters["intent"])
+    if filters["language"]:
+        query = query.filter(Interaction.language == filters["language"])
+    if filters["channel"]:
+        query = query.filter(Interaction.channel == filters["channel"])
+    if filters["min_ms"] is not None:
+        query = query.filter(Interaction.latency_ms >= filters["min_ms"])
+
+    # Totals over everything matching, not just the rows shown
+    totals = query.with_entities(
+        db.func.count(Interaction.id), db.func.avg(Interaction.latency_ms),
+        db.func.sum(Interaction.llm_calls), db.func.sum(Interaction.translate_calls),
+    ).one()
+    logs = query.order_by(Interaction.latency_ms.desc()).limit(SLOW_REQUESTS_LIMIT).all()
+    for log in logs:
+        log.stages = json.loads(log.stage_timings) if log.stage_timings else {}
+
+    def choices(column):
+        return [v for (v,) in db.session.query(column).filter(column.isnot(None)).distinct().order_by(column)]
+
+    return render_template("slow_requests.html", logs=logs, filters=filters,
+                           totals=dict(zip(("count", "avg_ms", "llm_calls", "translate_calls"), totals)),
+                           intents=choices(Interaction.intent_detected),
+                           languages=choices(Interaction.language),
+                           channels=choices(Interaction.channel),
+                           deadline_ms=TWILIO_DEADLINE_MS, limit=SLOW_REQUESTS_LIMIT)
 
 if __name__ == "__main__":
     app.run(debug=True, port=5001)
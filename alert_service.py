@@ -1,65 +1,382 @@
-
+import asyncio
 import feedparser
+import httpx
+import requests
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 import json
 import os
+import threading
+import time
 
-def get_health_alerts():
+from shared import metrics
+
+# --- CONFIG ---
+# Seconds an RSS snapshot is considered fresh. The background refresher
+# re-fetches on this interval; requests never wait on the feed servers.
+ALERT_CACHE_TTL = int(os.getenv("ALERT_CACHE_TTL", "300"))
+# Hard wall-clock budget per feed (connect + download), and max bytes read per feed.
+ALERT_FEED_TIMEOUT = float(os.getenv("ALERT_FEED_TIMEOUT", "5"))
+ALERT_FEED_MAX_BYTES = int(os.getenv("ALERT_FEED_MAX_BYTES", str(1024 * 1024)))
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MANUAL_ALERTS_PATH = os.path.join(BASE_DIR, "Data", "manual_alerts.json")
+
+# RSS Feed URLs (Verified Sources)
+RSS_URLS = [
+    "https://www.who.int/feeds/entity/csr/don/en/rss.xml", # WHO Disease Outbreak News
+    "https://news.google.com/rss/search?q=disease+outbreak+india&hl=en-IN&gl=IN&ceid=IN:en" # Google News (India Health)
+]
+# ALERT_FEEDS replaces the default sources (comma separated), e.g. local stubs for load tests
+if os.getenv("ALERT_FEEDS"):
+    RSS_URLS = [u.strip() for u in os.getenv("ALERT_FEEDS").split(",") if u.strip()]
+# Extra sources (e.g. state health department feeds), comma separated.
+# All feeds are fetched concurrently, so each one adds ~no latency.
+RSS_URLS += [u.strip() for u in os.getenv("ALERT_EXTRA_FEEDS", "").split(",") if u.strip()]
+
+# Basic Keyword Filter for Safety
+ALERT_KEYWORDS = ["outbreak", "virus", "infection", "alert", "emergency", "dengue", "malaria", "covid"]
+
+# --- CACHE STATE (per process) ---
+_lock = threading.Lock()
+_wake = threading.Event()
+_refresher_pid = None
+
+_manual_cache = {"mtime": None, "alerts": []}
+_rss_cache = {
+    "sources": {},          # url -> last good list of alerts from that feed
+    "validators": {},       # url -> {"etag": ..., "modified": ...} for conditional GETs
+    "updated_at": None,     # time.time() of last completed refresh
+    "refreshing": False,
+    "last_duration": None,  # seconds the last refresh took
+    "last_errors": {},      # url -> error string from the last refresh
+    "last_not_modified": [],  # urls that answered 304 on the last refresh
+    "refresh_count": 0,
+}
+
+
+def _load_manual_alerts():
     """
-    Fetches real-time health alerts from trusted RSS feeds (WHO, Google Health)
-    AND manual alerts from the Admin Portal.
+    Manual alerts from the Admin Portal (High Priority).
+    Re-read only when the broadcast file changes, so new broadcasts show up
+    on the next request without waiting for the RSS TTL.
     """
-    alerts = []
-    
-    # 0. Load Manual Alerts (High Priority)
     try:
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        json_path = os.path.join(base_dir, "Data", "manual_alerts.json")
-        
-        if os.path.exists(json_path):
-            with open(json_path, "r", encoding='utf-8') as f:
-                manual_data = json.load(f)
-                
-            # If it's a list (multiple alerts) or dict (single active alert wrapper)
-            # Let's assume list for now
-            if isinstance(manual_data, list):
-                for m in manual_data:
-                    if m.get('active', True):
-                        alerts.append({
-                            "title": m.get("title", "System Alert"),
-                            "link": "#",
-                            "source": "📢 Official Broadcast",
-                            "published": m.get("date", datetime.now().strftime("%d %b")),
-                            "summary": m.get("message", ""),
-                            "class": "manual-alert"
-                        })
+        if not os.path.exists(MANUAL_ALERTS_PATH):
+            _manual_cache["mtime"], _manual_cache["alerts"] = None, []
+            return []
+
+        mtime = os.path.getmtime(MANUAL_ALERTS_PATH)
+        if mtime == _manual_cache["mtime"]:
+            return _manual_cache["alerts"]
+
+        with open(MANUAL_ALERTS_PATH, "r", encoding='utf-8') as f:
+            manual_data = json.load(f)
+
+        alerts = []
+        # If it's a list (multiple alerts) or dict (single active alert wrapper)
+        # Let's assume list for now
+        if isinstance(manual_data, list):
+            for m in manual_data:
+                if m.get('active', True):
+                    alerts.append({
+                        "title": m.get("title", "System Alert"),
+                        "link": "#",
+                        "source": "📢 Official Broadcast",
+                        "published": m.get("date", datetime.now().strftime("%d %b")),
+                        "summary": m.get("message", ""),
+                        "class": "manual-alert"
+                    })
+
+        _manual_cache["mtime"], _manual_cache["alerts"] = mtime, alerts
+        return alerts
     except Exception as e:
         print(f"Manual Alert Load Error: {e}")
+        return _manual_cache["alerts"]
+
+
+def _download_feed(url, validators):
+    """
+    Conditional, size-capped GET of one feed within ALERT_FEED_TIMEOUT.
+    Returns (body_bytes or None on 304, new_validators).
+    """
+    deadline = time.time() + ALERT_FEED_TIMEOUT
+    headers = {"User-Agent": "SwasthyaSahayak/1.0 (+health alerts)"}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("modified"):
+        headers["If-Modified-Since"] = validators["modified"]
+
+    with requests.get(url, headers=headers, stream=True,
+                      timeout=(ALERT_FEED_TIMEOUT, ALERT_FEED_TIMEOUT)) as response:
+        if response.status_code == 304:
+            return None, validators
+        response.raise_for_status()
+
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=16384):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= ALERT_FEED_MAX_BYTES:
+                print(f"RSS Warning ({url}): truncated at {ALERT_FEED_MAX_BYTES} bytes")
+                break
+            if time.time() > deadline:
+                raise TimeoutError(f"Feed download exceeded {ALERT_FEED_TIMEOUT}s")
+
+        new_validators = {
+            "etag": response.headers.get("ETag"),
+            "modified": response.headers.get("Last-Modified"),
+        }
+        return b"".join(chunks)[:ALERT_FEED_MAX_BYTES], new_validators
+
+
+def _fetch_feed(url, validators):
+    """
+    Fetches one RSS feed and returns (alerts or None if unchanged, validators).
+    Only the top 3 entries are checked. Raises on failure so the caller can
+    keep the last good result.
+    """
+    body, validators = _download_feed(url, validators)
+    return _parse_feed(body, validators)
+
+
+def _parse_feed(body, validators):
+    """Alerts from a downloaded feed body: (alerts or None if unchanged, validators)."""
+    if body is None:
+        return None, validators # 304: nothing to parse
+
+    feed = feedparser.parse(body)
+    if feed.bozo and not feed.entries:
+        raise feed.get("bozo_exception", Exception("Unreadable feed"))
+
+    # Prefer validators as seen by feedparser if the server omitted headers
+    validators = {
+        "etag": validators.get("etag") or feed.get("etag"),
+        "modified": validators.get("modified") or feed.get("modified"),
+    }
+
+    alerts = []
+    for entry in feed.entries[:3]: # Get top 3 from each
+        title_lower = entry.get("title", "").lower()
+        if any(k in title_lower for k in ALERT_KEYWORDS):
+            alerts.append({
+                "title": entry.title,
+                "link": entry.get("link", "#"),
+                "source": feed.feed.title if 'title' in feed.feed else "News",
+                "published": entry.published if 'published' in entry else datetime.now().strftime("%d %b %Y")
+            })
+    return alerts, validators
+
+
+def refresh_alerts():
+    """
+    Re-fetches every RSS source concurrently and swaps the results into the cache.
+    Total time is bounded by ALERT_FEED_TIMEOUT regardless of the number of feeds.
+    A source that fails or times out keeps serving its last good alerts;
+    a source that answers 304 Not Modified is not re-parsed.
+    """
+    with _lock:
+        _rss_cache["refreshing"] = True
+        validators = {url: dict(_rss_cache["validators"].get(url, {})) for url in RSS_URLS}
+    started = time.time()
+    errors = {}
+    fresh = {}
+    fresh_validators = {}
+    not_modified = []
 
-    # 1. RSS Feed URLs (Verified Sources)
-    rss_urls = [
-        "https://www.who.int/feeds/entity/csr/don/en/rss.xml", # WHO Disease Outbreak News
-        "https://news.google.com/rss/search?q=disease+outbreak+india&hl=en-IN&gl=IN&ceid=IN:en" # Google News (India Health)
-    ]
-    
-    for url in rss_urls:
+    executor = ThreadPoolExecutor(max_workers=max(1, len(RSS_URLS)), thread_name_prefix="rss")
+    futures = {executor.submit(_fetch_feed, url, validators[url]): url for url in RSS_URLS}
+    done, pending = wait(futures, timeout=ALERT_FEED_TIMEOUT + 1)
+    # Don't block on stragglers; their results are discarded
+    executor.shutdown(wait=False)
+
+    for future in done:
+        url = futures[future]
         try:
-            feed = feedparser.parse(url)
-            
-            for entry in feed.entries[:3]: # Get top 3 from each
-                # Basic Keyword Filter for Safety
-                keywords = ["outbreak", "virus", "infection", "alert", "emergency", "dengue", "malaria", "covid"]
-                title_lower = entry.title.lower()
-                
-                if any(k in title_lower for k in keywords):
-                    alerts.append({
-                        "title": entry.title,
-                        "link": entry.link,
-                        "source": feed.feed.title if 'title' in feed.feed else "News",
-                        "published": entry.published if 'published' in entry else datetime.now().strftime("%d %b %Y")
-                    })
-                    
+            alerts, fresh_validators[url] = future.result()
+            if alerts is None:
+                not_modified.append(url)
+            else:
+                fresh[url] = alerts
         except Exception as e:
+            errors[url] = str(e)
             print(f"RSS Error ({url}): {e}")
-            
+    for future in pending:
+        url = futures[future]
+        errors[url] = f"Timed out after {ALERT_FEED_TIMEOUT}s"
+        print(f"RSS Error ({url}): timed out")
+
+    _store_refresh(started, fresh, fresh_validators, errors, not_modified)
+
+
+def _store_refresh(started, fresh, fresh_validators, errors, not_modified):
+    metrics.observe("chatbot_alert_refresh_seconds", time.time() - started)
+    metrics.inc("chatbot_upstream_requests_total", len(RSS_URLS), service="rss")
+    if errors:
+        metrics.inc("chatbot_upstream_errors_total", len(errors), service="rss")
+    with _lock:
+        _rss_cache["sources"].update(fresh)
+        _rss_cache["validators"].update(fresh_validators)
+        _rss_cache["updated_at"] = time.time()
+        _rss_cache["last_duration"] = _rss_cache["updated_at"] - started
+        _rss_cache["last_errors"] = errors
+        _rss_cache["last_not_modified"] = not_modified
+        _rss_cache["refresh_count"] += 1
+        _rss_cache["refreshing"] = False
+
+
+# --- ASYNC REFRESHER (asgi_entry.py runs this on the event loop instead of the thread) ---
+async def _download_feed_async(client, url, validators):
+    """httpx version of _download_feed (same headers, byte cap and deadline)."""
+    headers = {"User-Agent": "SwasthyaSahayak/1.0 (+health alerts)"}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("modified"):
+        headers["If-Modified-Since"] = validators["modified"]
+
+    async with client.stream("GET", url, headers=headers) as response:
+        if response.status_code == 304:
+            return None, validators
+        response.raise_for_status()
+
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_bytes(16384):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= ALERT_FEED_MAX_BYTES:
+                print(f"RSS Warning ({url}): truncated at {ALERT_FEED_MAX_BYTES} bytes")
+                break
+
+        new_validators = {
+            "etag": response.headers.get("ETag"),
+            "modified": response.headers.get("Last-Modified"),
+        }
+        return b"".join(chunks)[:ALERT_FEED_MAX_BYTES], new_validators
+
+
+async def refresh_alerts_async(client):
+    """refresh_alerts() on the event loop: all feeds concurrently, each within ALERT_FEED_TIMEOUT."""
+    with _lock:
+        _rss_cache["refreshing"] = True
+        validators = {url: dict(_rss_cache["validators"].get(url, {})) for url in RSS_URLS}
+    started = time.time()
+
+    async def fetch(url):
+        body, new_validators = await asyncio.wait_for(
+            _download_feed_async(client, url, validators[url]), ALERT_FEED_TIMEOUT
+        )
+        return _parse_feed(body, new_validators)
+
+    results = await asyncio.gather(*(fetch(url) for url in RSS_URLS), return_exceptions=True)
+
+    errors = {}
+    fresh = {}
+    fresh_validators = {}
+    not_modified = []
+    for url, result in zip(RSS_URLS, results):
+        if isinstance(result, asyncio.TimeoutError):
+            errors[url] = f"Timed out after {ALERT_FEED_TIMEOUT}s"
+            print(f"RSS Error ({url}): timed out")
+        elif isinstance(result, Exception):
+            errors[url] = str(result)
+            print(f"RSS Error ({url}): {result}")
+        else:
+            alerts, fresh_validators[url] = result
+            if alerts is None:
+                not_modified.append(url)
+            else:
+                fresh[url] = alerts
+    _store_refresh(started, fresh, fresh_validators, errors, not_modified)
+
+
+async def run_alert_refresher_async():
+    """
+    Async replacement for the refresher thread in this process: claims the
+    per-PID refresher slot (so get_health_alerts won't start a thread) and
+    refreshes every ALERT_CACHE_TTL seconds, or sooner when woken.
+    """
+    global _refresher_pid
+    with _lock:
+        _refresher_pid = os.getpid()
+    async with httpx.AsyncClient(timeout=ALERT_FEED_TIMEOUT, follow_redirects=True) as client:
+        while True:
+            try:
+                await refresh_alerts_async(client)
+            except Exception as e:
+                print(f"Alert Refresher Error: {e}")
+                with _lock:
+                    _rss_cache["refreshing"] = False
+            # get_health_alerts signals staleness through the threading.Event
+            for _ in range(max(1, int(ALERT_CACHE_TTL))):
+                if _wake.is_set():
+                    break
+                await asyncio.sleep(1)
+            _wake.clear()
+
+
+def _refresher_loop():
+    while True:
+        try:
+            refresh_alerts()
+        except Exception as e:
+            print(f"Alert Refresher Error: {e}")
+            with _lock:
+                _rss_cache["refreshing"] = False
+        _wake.wait(ALERT_CACHE_TTL)
+        _wake.clear()
+
+
+def start_alert_refresher():
+    """
+    Starts the background refresher for this process (idempotent).
+    Keyed on PID so each forked gunicorn worker gets its own thread.
+    """
+    global _refresher_pid
+    with _lock:
+        if _refresher_pid == os.getpid():
+            return
+        _refresher_pid = os.getpid()
+    threading.Thread(target=_refresher_loop, name="alert-refresher", daemon=True).start()
+
+
+def get_alert_cache_status():
+    """Age and refresh status of the RSS alert cache (for monitoring)."""
+    with _lock:
+        updated_at = _rss_cache["updated_at"]
+        return {
+            "ttl_seconds": ALERT_CACHE_TTL,
+            "age_seconds": round(time.time() - updated_at, 1) if updated_at else None,
+            "stale": updated_at is None or time.time() - updated_at > ALERT_CACHE_TTL,
+            "refreshing": _rss_cache["refreshing"],
+            "refresh_count": _rss_cache["refresh_count"],
+            "last_refresh_seconds": round(_rss_cache["last_duration"], 3) if _rss_cache["last_duration"] is not None else None,
+            "last_errors": dict(_rss_cache["last_errors"]),
+            "last_not_modified": list(_rss_cache["last_not_modified"]),
+            "sources_cached": len(_rss_cache["sources"]),
+        }
+
+
+def get_health_alerts():
+    """
+    Returns real-time health alerts from trusted RSS feeds (WHO, Google Health)
+    AND manual alerts from the Admin Portal.
+    RSS results come from the cache immediately (stale-while-revalidate);
+    a stale cache only wakes the background refresher.
+    """
+    with metrics.stage("alerts"):
+        start_alert_refresher()
+
+        alerts = list(_load_manual_alerts())
+
+        with _lock:
+            updated_at = _rss_cache["updated_at"]
+            stale = updated_at is not None and time.time() - updated_at > ALERT_CACHE_TTL \
+                and not _rss_cache["refreshing"]
+            for url in RSS_URLS:
+                alerts.extend(_rss_cache["sources"].get(url, []))
+        if stale:
+            _wake.set()
+
     return alerts[:5] # Return top 5 combined
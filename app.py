@@ -1,139 +1,122 @@
 
 import os
+import re
 import json
-import pandas as pd
-from flask import Flask, render_template, request, jsonify
-from difflib import get_close_matches
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 from dotenv import load_dotenv
 
 # Load env vars
 load_dotenv()
 
 from groq_service import get_ai_explanation, translate_to_english, translate_message
-from alert_service import get_health_alerts
-from shared.database import db, init_db, Interaction, User
+from groq_service import get_cached_ai_explanation, stream_ai_explanation
+from groq_service import get_translation_cache_stats, get_ai_cache_stats, get_coalescing_stats, llm_client
+from alert_service import get_health_alerts, get_alert_cache_status
+from shared.database import init_db
+from shared.interaction_logger import InteractionLogger
+from shared import metrics
+from knowledge_base import KnowledgeStore
 # from whatsapp_service import process_webhook_payload, send_whatsapp_message # Meta Service Disabled
 
 app = Flask(__name__)
 # Initialize Shared Database
 init_db(app)
+# Interactions are written in background batches (see shared/interaction_logger.py)
+interaction_logger = InteractionLogger(app)
 
-# --- PATHS ---
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(BASE_DIR, "MasterData")
+# --- METRICS ---
+# Per-stage latency of the chat endpoints, summed over all workers on /metrics
+# and sent per response as Server-Timing (see shared/metrics.py)
+TIMED_ENDPOINTS = {"get_response", "get_response_stream", "whatsapp_reply"}
 
-# --- GLOBAL VARS ---
-description_dict = {}
-precaution_dict = {}
-disease_list = []
-vaccine_schedule = []
+@app.before_request
+def start_request_timing():
+    if request.endpoint in TIMED_ENDPOINTS:
+        metrics.begin_request(request.endpoint)
 
-# --- LOAD RESOURCES ---
-def load_artifacts():
-    global description_dict, precaution_dict, disease_list, vaccine_schedule
-    try:
-        print("Loading Information Knowledge Base...")
-
-        # 1. Load Descriptions
-        desc_path = os.path.join(DATA_DIR, "symptom_Description.csv")
-        try:
-            desc_df = pd.read_csv(desc_path)
-            # Normalize column names if needed, assume 0=Disease, 1=Description
-            if desc_df.shape[1] >= 2:
-                for index, row in desc_df.iterrows():
-                    d_name = str(row.iloc[0]).strip().lower()
-                    d_desc = str(row.iloc[1])
-                    description_dict[d_name] = d_desc
-        except Exception as e:
-            print(f"Error loading descriptions: {e}")
-
-        disease_list = list(description_dict.keys())
-        
-        # 2. Load Precautions
-        prec_path = os.path.join(DATA_DIR, "symptom_precaution.csv")
-        try:
-            prec_df = pd.read_csv(prec_path)
-             # Assume 0=Disease, 1..N=Precautions
-            if prec_df.shape[1] >= 2:
-                for index, row in prec_df.iterrows():
-                    d_name = str(row.iloc[0]).strip().lower()
-                    # Filter out NaN or empty
-                    precs = [str(x) for x in row.iloc[1:] if pd.notna(x) and str(x).strip() != ""]
-                    precaution_dict[d_name] = precs
-        except Exception as e:
-            print(f"Error loading precautions: {e}")
-
-        # 3. Load Vaccination Schedule
-        vac_path = os.path.join(DATA_DIR, "vaccination_schedule.json")
-        if os.path.exists(vac_path):
-            with open(vac_path, 'r', encoding='utf-8') as f:
-                vaccine_schedule = json.load(f)
-            print(f"DEBUG: Loaded {len(vaccine_schedule)} vaccination records.")
-        else:
-            print(f"DEBUG: Vaccination Schedule file not found at {vac_path}")
-            
-        print(f"System Ready. Information available for {len(disease_list)} topics.")
-        print(f"DEBUG: Disease List Sample: {disease_list[:5]}")
+@app.after_request
+def add_server_timing(response):
+    server_timing = metrics.end_request()
+    if server_timing:
+        response.headers["Server-Timing"] = server_timing
+    return response
 
-    except Exception as e:
-        print(f"CRITICAL SYSTEM FAILURE: {e}")
-        import traceback
-        traceback.print_exc()
+@app.teardown_request
+def clear_request_timing(exc):
+    metrics.clear_request()
+
+def collect_worker_stats():
+    """This worker's cache, coalescing, Groq client and DB writer totals, for /metrics."""
+    samples = []
+    for cache, stats in (("translation", get_translation_cache_stats()), ("ai_definition", get_ai_cache_stats())):
+        for result in ("memory_hits", "disk_hits", "misses"):
+            samples.append(("chatbot_cache_lookups_total", {"cache": cache, "result": result}, stats[result]))
+    samples.append(("chatbot_coalesced_calls_total", {"mode": "sync"}, get_coalescing_stats()["deduplicated"]))
+    for event, value in llm_client.stats.items():
+        samples.append(("chatbot_llm_client_events_total", {"event": event, "mode": "sync"}, value))
+    logging = interaction_logger.stats()
+    for result in ("enqueued", "written", "dropped", "failed"):
+        samples.append(("chatbot_interactions_total", {"result": result}, logging[result]))
+    samples.append(("chatbot_interaction_queue_depth", {}, logging["queue_depth"]))
+    return samples
+
+metrics.register_collector(collect_worker_stats)
+
+# Fixed text of the info card, pre-translated for the languages we ship CSVs for
+CARD_LABELS = {
+    "English": {
+        "information": "Information",
+        "safety": "Health Safety Awareness",
+        "disclaimer": "⚠️ <b>Disclaimer:</b> This is an AI-powered information tool, NOT a doctor. The content above is for educational purposes only and does not constitute a medical diagnosis. Please consult a healthcare professional for advice.",
+    },
+    "Hindi": {
+        "information": "जानकारी",
+        "safety": "स्वास्थ्य सुरक्षा जागरूकता",
+        "disclaimer": "⚠️ <b>अस्वीकरण:</b> यह एक AI-आधारित सूचना उपकरण है, डॉक्टर नहीं। ऊपर दी गई सामग्री केवल शैक्षिक उद्देश्यों के लिए है और यह चिकित्सा निदान नहीं है। कृपया सलाह के लिए किसी स्वास्थ्य विशेषज्ञ से परामर्श करें।",
+    },
+    "Tamil": {
+        "information": "தகவல்",
+        "safety": "சுகாதார பாதுகாப்பு விழிப்புணர்வு",
+        "disclaimer": "⚠️ <b>பொறுப்புத் துறப்பு:</b> இது AI அடிப்படையிலான தகவல் கருவி, மருத்துவர் அல்ல. மேலே உள்ள உள்ளடக்கம் கல்வி நோக்கத்திற்காக மட்டுமே, இது மருத்துவ நோயறிதல் அல்ல. ஆலோசனைக்கு சுகாதார நிபுணரை அணுகவும்.",
+    },
+    "Odia": {
+        "information": "ସୂଚନା",
+        "safety": "ସ୍ୱାସ୍ଥ୍ୟ ସୁରକ୍ଷା ସଚେତନତା",
+        "disclaimer": "⚠️ <b>ଦାୟିତ୍ୱ ଅସ୍ୱୀକାର:</b> ଏହା ଏକ AI-ଆଧାରିତ ସୂଚନା ଉପକରଣ, ଡାକ୍ତର ନୁହେଁ। ଉପରୋକ୍ତ ବିଷୟବସ୍ତୁ କେବଳ ଶିକ୍ଷାଗତ ଉଦ୍ଦେଶ୍ୟରେ ଏବଂ ଏହା ଚିକିତ୍ସା ନିଦାନ ନୁହେଁ। ଦୟାକରି ପରାମର୍ଶ ପାଇଁ ଜଣେ ସ୍ୱାସ୍ଥ୍ୟ ବିଶେଷଜ୍ଞଙ୍କ ସହ ଯୋଗାଯୋଗ କରନ୍ତୁ।",
+    },
+}
+
+# --- KNOWLEDGE BASE ---
+# Versioned and swapped atomically; picks up CMS uploads without a restart (see knowledge_base.py)
+knowledge = KnowledgeStore(languages=[lang for lang in CARD_LABELS if lang != "English"])
+knowledge.load()
 
-load_artifacts()
+@app.before_request
+def check_knowledge_base():
+    knowledge.maybe_reload()
 
 # --- INFORMATION RETRIEVAL LOGIC ---
 
-def find_topic_info(text):
+def find_topic_info(text, kb=None):
     """
-    Strict keyword match + fuzzy match for Diseases.
+    Compiled keyword/alias match + fuzzy match for Diseases.
     Returns: (TopicName, Description, Precautions) or None
     """
+    kb = kb or knowledge.current
     text = text.lower()
     
-    # 1. Direct Alias/Keyword Mapping (Can expand this)
-    aliases = {
-        "chickenpox": "chicken pox",
-        "flu": "influenza",
-        "sugar": "diabetes",
-        "bp": "hypertension",
-        "high bp": "hypertension",
-        "madras eye": "madras eye (conjunctivitis)",
-        "piles": "dimorphic hemmorhoids(piles)",
-        "chinnammai": "chicken pox",
-        "chinna ammai": "chicken pox", 
-        "chicken pox": "chicken pox"
-    }
-    
-    # Check aliases
-    for alias, canonical in aliases.items():
-        if alias in text:
-            text = text.replace(alias, canonical)
-
-    # 2. Search in Disease List
-    best_match = None
-    
-    # Exact substring match
-    for disease in disease_list:
-        if disease in text: 
-            best_match = disease
-            break # High confidence match
+    # 1. Exact match: longest topic/alias hit from the compiled index (single pass)
+    best_match = kb.topic_index.best_match(text)
             
-    # Fuzzy match if no direct match (for typos)
+    # Fuzzy match if no direct match (for typos, incl. multi-word names)
     if not best_match:
-        words = text.split()
-        possible_matches = []
-        for word in words:
-            if len(word) > 4: 
-                matches = get_close_matches(word, disease_list, n=1, cutoff=0.8)
-                if matches: possible_matches.append(matches[0])
-        
-        if possible_matches:
-            best_match = possible_matches[0] # Take first reasonable guess for INFO only
+        matches = kb.fuzzy_index.search(text, limit=1, cutoff=0.8)
+        if matches:
+            best_match = matches[0][0] # Best ranked guess for INFO only
 
     if best_match:
-        desc = description_dict.get(best_match, "No description available.")
-        precs = precaution_dict.get(best_match, ["Consult a doctor for advice."])
+        desc = kb.descriptions.get(best_match, "No description available.")
+        precs = kb.precautions.get(best_match, ["Consult a doctor for advice."])
         
         return best_match, desc, precs
         
@@ -147,9 +130,47 @@ def home():
 
 @app.route("/api/alerts")
 def api_alerts():
-    """API Endpoint for Real-time Alert Polling"""
+    """API Endpoint for Real-time Alert Polling (served from the alert cache)"""
     alerts = get_health_alerts()
-    return jsonify(alerts)
+    response = jsonify(alerts)
+    age = get_alert_cache_status()["age_seconds"]
+    if age is not None:
+        response.headers['Age'] = str(int(age))
+    return response
+
+@app.route("/api/alerts/status")
+def api_alerts_status():
+    """Age and refresh status of the alert cache"""
+    return jsonify(get_alert_cache_status())
+
+@app.route("/api/logging/status")
+def api_logging_status():
+    """Queue depth and flush latency of the background interaction writer"""
+    return jsonify(interaction_logger.stats())
+
+@app.route("/api/kb/status")
+def api_kb_status():
+    """Version and reload history of this worker's knowledge base"""
+    return jsonify(knowledge.status())
+
+@app.route("/api/upstream/status")
+def api_upstream_status():
+    """Cache hit rates, coalesced duplicate calls and LLM client counters for this worker"""
+    return jsonify({
+        "translation_cache": get_translation_cache_stats(),
+        "ai_cache": get_ai_cache_stats(),
+        "coalescing": get_coalescing_stats(),
+        "llm": dict(llm_client.stats),
+    })
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus scrape target: stage latencies and counters of every worker, summed"""
+    token = os.getenv("METRICS_TOKEN")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return Response("Unauthorized\n", status=401, mimetype="text/plain")
+    return Response(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.route("/service-worker.js")
 def service_worker():
     from flask import send_from_directory
@@ -159,28 +180,148 @@ def service_worker():
 
 @app.route("/get_response", methods=["POST"])
 def get_response():
-    import re
-    
     msg = request.form.get("msg", "")
-    lang = request.form.get("lang", "English")
-    
+    cleaned_msg, lang = prepare_message(msg, request.form.get("lang", "English"))
+
+    html, intent, conf, cleaned_input = answer_locally(msg, cleaned_msg, lang)
+    if html is None:
+        # Only use Groq if input looks like a "What is" question
+        if is_definition_question(cleaned_input):
+            with metrics.stage("groq"):
+                ai_resp = get_ai_explanation(cleaned_input, lang)
+            if ai_resp:
+                html = build_ai_card(ai_resp)
+                save_interaction(msg, html, "general_ai", 0.5, lang=lang)
+                return jsonify({"response": html})
+        html, intent, conf = unclear_response(lang), "unclear", 0.0
+
+    save_interaction(msg, html, intent, conf, None, lang) # None for Region (Feature 4 placeholder)
+    return jsonify({"response": html})
+
+@app.route("/get_response/stream", methods=["POST"])
+def get_response_stream():
+    """
+    Same answers as /get_response, as Server-Sent Events:
+      event: answer  {"response": html}  - complete answer (knowledge base, cached AI, fallback)
+      event: token   {"text": "..."}     - one chunk of a live Groq completion
+      event: done    {"response": html}  - final formatted card replacing the streamed text
+    """
+    msg = request.form.get("msg", "")
+    cleaned_msg, lang = prepare_message(msg, request.form.get("lang", "English"))
+
+    html, intent, conf, cleaned_input = answer_locally(msg, cleaned_msg, lang)
+    if html is None and is_definition_question(cleaned_input):
+        cached = get_cached_ai_explanation(cleaned_input, lang)
+        if cached:
+            html, intent, conf = build_ai_card(cached), "general_ai", 0.5
+        else:
+            # Timed until the last event, not until the headers go out
+            return sse_response(stream_ai_answer(msg, cleaned_input, lang, metrics.detach_request()))
+    if html is None:
+        html, intent, conf = unclear_response(lang), "unclear", 0.0
+
+    save_interaction(msg, html, intent, conf, None, lang)
+    return sse_response(iter([sse_event("answer", {"response": html})]))
+
+def stream_ai_answer(msg, cleaned_input, lang, timing=None):
+    # Flush headers right away so the browser's connect timeout never fires on a slow model
+    yield ": connected\n\n"
+    metrics.resume_request(timing)
+    parts = []
+    try:
+        with metrics.stage("groq"):
+            for chunk in stream_ai_explanation(cleaned_input, lang):
+                parts.append(chunk)
+                yield sse_event("token", {"text": chunk})
+    except Exception as e:
+        print(f"Groq Stream Error: {e}")
+        parts = []
+    if parts:
+        html = build_ai_card("".join(parts))
+        save_interaction(msg, html, "general_ai", 0.5, lang=lang)
+        event = sse_event("done", {"response": html})
+    else:
+        html = unclear_response(lang)
+        save_interaction(msg, html, "unclear", 0.0, None, lang)
+        event = sse_event("answer", {"response": html})
+    metrics.end_request() # Stage and request histograms; the headers are long gone
+    yield event
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def sse_response(events):
+    response = Response(stream_with_context(events), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no" # Don't let a reverse proxy hold the stream back
+    return response
+
+def prepare_message(msg, lang):
+    """Lower-cased message for keyword checks, and the language to answer in."""
     cleaned_msg = msg.lower().strip().replace("!","").replace(".","")
     
     # --- ROBUST OVERRIDES (Fix for Translation Issues) ---
     if "சின்னம்மை" in cleaned_msg or "chinnammai" in cleaned_msg:
         cleaned_msg = "chicken pox"
         lang = "Tamil" # Enforce lang context if needed
+    return cleaned_msg, lang
+
+def answer_locally(msg, cleaned_msg, lang):
+    """
+    Everything /get_response can answer without Groq.
+    Returns (html, intent, confidence, cleaned_input); html is None when no
+    local answer exists and the caller decides between the AI fallback and
+    the help text.
+    """
+    with metrics.stage("quick_answer"):
+        quick = quick_answer(msg, cleaned_msg)
+    if quick:
+        return quick + (cleaned_msg,)
+
+    # --- INFO RETRIEVAL ---
     
-    # --- GREETING ---
-    greetings = ["hi", "hello", "hey", "vanakam", "namaste", "hola", "greetings", "epdi iruka", "nalama", "kaisan ba", "how are you"]
-    for g in greetings:
+    # 1. Translate Input if needed
+    if lang != "English":
+         with metrics.stage("translate_in"):
+             cleaned_input = translate_to_english(msg, "Auto")
+    else:
+         cleaned_input = msg
+
+    # 2. Find Topic
+    with metrics.stage("topic_match"):
+        card = topic_card(cleaned_input, lang)
+    if card:
+        html, needs_translation = card
+        if needs_translation:
+            with metrics.stage("translate_out"):
+                html = translate_message(html, lang)
+        return html, "info_lookup", 1.0, cleaned_input
+
+    # Fallback: No topic found
+    return None, None, 0.0, cleaned_input
+
+GREETINGS = ["hi", "hello", "hey", "vanakam", "namaste", "hola", "greetings", "epdi iruka", "nalama", "kaisan ba", "how are you"]
+
+def is_greeting(cleaned_msg):
+    for g in GREETINGS:
         if re.search(r'\b' + re.escape(g) + r'\b', cleaned_msg):
-            resp = "<b>Namaste! 🙏</b><br>I am your Public Health Information Assistant.<br>I can provide information on vaccinations, diseases (like Dengue, Malaria), and general health safety.<br><br><b>Note:</b> I do not provide medical diagnoses."
-            save_interaction(msg, resp, "greeting", 0.0, None)
-            return jsonify({"response": resp})
+            return True
+    return False
+
+def is_vaccination_question(msg):
+    msg = msg.lower()
+    return "vaccin" in msg or "immuniz" in msg or "schedule" in msg
+
+def quick_answer(msg, cleaned_msg):
+    """Greeting / vaccination replies, which need no lookup: (html, intent, confidence) or None."""
+    # --- GREETING ---
+    if is_greeting(cleaned_msg):
+        resp = "<b>Namaste! 🙏</b><br>I am your Public Health Information Assistant.<br>I can provide information on vaccinations, diseases (like Dengue, Malaria), and general health safety.<br><br><b>Note:</b> I do not provide medical diagnoses."
+        return resp, "greeting", 0.0
     
     # --- VACCINATION LAYER ---
-    if "vaccin" in msg.lower() or "immuniz" in msg.lower() or "schedule" in msg.lower():
+    if is_vaccination_question(msg):
+        vaccine_schedule = knowledge.current.vaccine_schedule
         html = "<div class='diagnosis-card' style='border-left-color: #6c5ce7;'><div class='diagnosis-title' style='color:#6c5ce7;'>💉 Universal Immunization Schedule</div><table style='width:100%; font-size:0.9rem; border-collapse: collapse;'><tr><th style='text-align:left; border-bottom:1px solid #ccc;'>Age</th><th style='text-align:left; border-bottom:1px solid #ccc;'>Vaccines</th></tr>"
         if vaccine_schedule:
             for v in vaccine_schedule:
@@ -188,81 +329,53 @@ def get_response():
         else:
             html += "<tr><td colspan='2'>Schedule data unavailable.</td></tr>"
         html += "</table></div>"
-        save_interaction(msg, html, "vaccination", 1.0, None)
-        return jsonify({"response": html})
+        return html, "vaccination", 1.0
+    return None
 
-    # --- INFO RETRIEVAL ---
-    
-    # 1. Translate Input if needed
-    if lang != "English":
-         cleaned_input = translate_to_english(msg, "Auto")
-    else:
-         cleaned_input = msg
-         
+def topic_card(cleaned_input, lang):
+    """
+    Info card for the topic in `cleaned_input` (English): (html, needs_translation) or None.
+    needs_translation is True when no pre-translated card exists and the
+    English card must go through translate_message.
+    """
     # DEBUG LOGGING
-    print(f"DEBUG: Msg='{msg}' | Cleaned='{cleaned_input}' | Lang='{lang}'")
-    
-    # 2. Find Topic
-    info = find_topic_info(cleaned_input)
+    print(f"DEBUG: Cleaned='{cleaned_input}' | Lang='{lang}'")
+
+    kb = knowledge.current # one version for the whole card
+    info = find_topic_info(cleaned_input, kb)
     print(f"DEBUG: Info Found: {info}")
+    if not info:
+        return None
+
+    topic, desc, precs = info
     
-    if info:
-        topic, desc, precs = info
-        
-        # Optional: Enrich with Groq (Definitions Only)
-        
-        html = f"""
-        <div class='diagnosis-card' style='border-left-color: #0984E3;'>
-            <div class='diagnosis-title' style='color:#0984E3;'>ℹ️ Information: {topic.title()}</div>
-            <p>{desc}</p>
-        """
-            
-        html += f"""
-            <div class='section-title'>Health Safety Awareness</div>
-            <ul class='precautions-list'>
-                {''.join([f"<li>{p.title()}</li>" for p in precs])}
-            </ul>
-        </div>
-        """
-        
-        # Add Disclaimer
-        html += """
-        <div style='margin-top:10px; padding:10px; background:#fff3cd; border:1px solid #ffeeba; border-radius:5px; font-size:0.75rem; color:#856404;'>
-             ⚠️ <b>Disclaimer:</b> This is an AI-powered information tool, NOT a doctor. The content above is for educational purposes only and does not constitute a medical diagnosis. Please consult a healthcare professional for advice.
-        </div>
-        """
-        
-        if lang != "English":
-            html = translate_message(html, lang)
-            
-        save_interaction(msg, html, "info_lookup", 1.0, None) # None for Region (Feature 4 placeholder)
-        return jsonify({"response": html})
+    # Optional: Enrich with Groq (Definitions Only)
+    
+    # Pre-translated card when every part exists for this language, else live translation
+    localized = localize_topic(topic, lang, kb)
+    if localized:
+        return build_info_card(topic, localized[0], localized[1], CARD_LABELS[lang]), False
+    return build_info_card(topic, desc, precs, CARD_LABELS["English"]), lang != "English"
 
-        
-    else:
-        # Fallback: No topic found
-        resp = "I am a public health information guide. I can tell you about specific diseases (e.g., 'Malaria', 'Typhoid') or vaccinations. <br><b>I do not interpret symptoms or diagnose conditions.</b>"
-        
-        # Try Groq for generic definition? 
-        # "LLM usage restricted to generic definitions" -> Verify if safe.
-        # If user asks "What is Tuberculosis?", our CSV handles it.
-        # If user asks "What is a virus?", CSV might miss it. 
-        # Let's enable Groq fallback for GENERAL DEFINITIONS only.
-        
-        # Only use Groq if input looks like a "What is" question
-        if "what is" in cleaned_input.lower() or "define" in cleaned_input.lower():
-             ai_resp = get_ai_explanation(cleaned_input, lang)
-             if ai_resp:
-                 html = f"<div class='diagnosis-card'><div class='diagnosis-title'>General Definition</div><p>{format_ai_response(ai_resp)}</p></div>"
-                 html += "<div style='font-size:0.7rem; color:#888; margin-top:5px;'>Generated by AI (General Definition)</div>"
-                 save_interaction(msg, html, "general_ai", 0.5)
-                 return jsonify({"response": html})
-        
-        if lang != "English":
-            resp = translate_message(resp, lang)
-            
-        save_interaction(msg, resp, "unclear", 0.0, None)
-        return jsonify({"response": resp})
+def is_definition_question(cleaned_input):
+    # "LLM usage restricted to generic definitions" -> Verify if safe.
+    # If user asks "What is Tuberculosis?", our CSV handles it.
+    # If user asks "What is a virus?", CSV might miss it. 
+    # Let's enable Groq fallback for GENERAL DEFINITIONS only.
+    return "what is" in cleaned_input.lower() or "define" in cleaned_input.lower()
+
+def build_ai_card(ai_resp):
+    html = f"<div class='diagnosis-card'><div class='diagnosis-title'>General Definition</div><p>{format_ai_response(ai_resp)}</p></div>"
+    html += "<div style='font-size:0.7rem; color:#888; margin-top:5px;'>Generated by AI (General Definition)</div>"
+    return html
+
+UNCLEAR_MESSAGE = "I am a public health information guide. I can tell you about specific diseases (e.g., 'Malaria', 'Typhoid') or vaccinations. <br><b>I do not interpret symptoms or diagnose conditions.</b>"
+
+def unclear_response(lang):
+    if lang != "English":
+        with metrics.stage("translate_out"):
+            return translate_message(UNCLEAR_MESSAGE, lang)
+    return UNCLEAR_MESSAGE
 
 
 # --- WHATSAPP INTEGRATION (Meta Cloud API) ---
@@ -282,6 +395,34 @@ def whatsapp_reply():
     if not incoming_msg:
         return str(resp)
 
+    reply_text, intent, cleaned_input = whatsapp_answer_locally(incoming_msg)
+    if reply_text is not None:
+        msg.body(reply_text)
+        save_interaction(incoming_msg, reply_text, intent, 1.0, "WhatsApp", "English")
+        return str(resp)
+
+    # Fallback: only definition questions go to Groq (no paid call for answers we'd discard)
+    groq_resp = None
+    if is_whatsapp_definition(incoming_msg):
+        with metrics.stage("groq"):
+            groq_resp = get_ai_explanation(cleaned_input, "English")
+    if groq_resp:
+         msg.body(whatsapp_ai_reply(groq_resp))
+         save_interaction(incoming_msg, groq_resp, "whatsapp_ai", 0.5, "WhatsApp", "English")
+    else:
+         msg.body(WHATSAPP_HELP)
+         save_interaction(incoming_msg, "Fallback Help", "whatsapp_unclear", 0.0, "WhatsApp", "English")
+        
+    return str(resp)
+
+WHATSAPP_HELP = "I am a Public Health Bot. Ask me about 'Malaria', 'Dengue' or 'Vaccinations'.\n\n_I do not diagnose conditions._"
+
+def whatsapp_answer_locally(incoming_msg):
+    """
+    WhatsApp replies that need no Groq call.
+    Returns (reply_text, intent, cleaned_input); reply_text is None when the
+    caller should try the AI fallback / help text.
+    """
     # Logic Reuse (Text Processing)
     cleaned_input = incoming_msg.replace("!","").replace(".","")
     
@@ -290,7 +431,8 @@ def whatsapp_reply():
         cleaned_input = "chicken pox"
 
     # --- VACCINATION LAYER (WhatsApp) ---
-    if "vaccin" in incoming_msg or "immuniz" in incoming_msg or "schedule" in incoming_msg:
+    if is_vaccination_question(incoming_msg):
+        vaccine_schedule = knowledge.current.vaccine_schedule
         if vaccine_schedule:
             reply_text = "*💉 Universal Immunization Schedule*:\n\n"
             for v in vaccine_schedule:
@@ -299,10 +441,7 @@ def whatsapp_reply():
                 reply_text += f"• *{age}*: {vaccines}\n"
         else:
             reply_text = "⚠️ Vaccination schedule data is currently unavailable."
-            
-        msg.body(reply_text)
-        save_interaction(incoming_msg, reply_text, "vaccination", 1.0, "WhatsApp")
-        return str(resp)
+        return reply_text, "vaccination", cleaned_input
 
     # --- ALERTS LAYER (WhatsApp) ---
     if "alert" in incoming_msg or "news" in incoming_msg or "outbreak" in incoming_msg:
@@ -315,13 +454,11 @@ def whatsapp_reply():
                 reply_text += f"⚠️ *{title}*\nSource: {source}\n\n"
         else:
             reply_text = "✅ No major disease outbreak alerts at this time."
-            
-        msg.body(reply_text)
-        save_interaction(incoming_msg, reply_text, "alerts", 1.0, "WhatsApp")
-        return str(resp)
+        return reply_text, "alerts", cleaned_input
 
     # 4. Find Info
-    info = find_topic_info(cleaned_input)
+    with metrics.stage("topic_match"):
+        info = find_topic_info(cleaned_input)
     
     if info:
         topic, desc, precs = info
@@ -329,55 +466,65 @@ def whatsapp_reply():
         clean_precs = "\n".join([f"- {p}" for p in precs])
         
         reply_text = f"*ℹ️ Information: {topic.title()}*\n\n{clean_desc}\n\n*Health Safety Awareness:*\n{clean_precs}\n\n⚠️ _Disclaimer: Educational info only. Not a diagnosis._"
-        msg.body(reply_text)
-        
-        save_interaction(incoming_msg, reply_text, "whatsapp_info", 1.0, "WhatsApp")
-        
-    else:
-        # Fallback
-        groq_resp = get_ai_explanation(cleaned_input, "English")
-        if groq_resp and ("what is" in incoming_msg or "define" in incoming_msg):
-             reply_text = f"*Definition:*\n{groq_resp}\n\n⚠️ _General Info Only._"
-             msg.body(reply_text)
-             save_interaction(incoming_msg, groq_resp, "whatsapp_ai", 0.5, "WhatsApp")
-        else:
-             reply_text = "I am a Public Health Bot. Ask me about 'Malaria', 'Dengue' or 'Vaccinations'.\n\n_I do not diagnose conditions._"
-             msg.body(reply_text)
-             save_interaction(incoming_msg, "Fallback Help", "whatsapp_unclear", 0.0, "WhatsApp")
-        
-    return str(resp)
+        return reply_text, "whatsapp_info", cleaned_input
+
+    return None, None, cleaned_input
 
+def is_whatsapp_definition(incoming_msg):
+    return "what is" in incoming_msg or "define" in incoming_msg
+
+def whatsapp_ai_reply(groq_resp):
+    return f"*Definition:*\n{groq_resp}\n\n⚠️ _General Info Only._"
+
+
+def localize_topic(topic, lang, kb=None):
+    """Returns (desc, precs) from the pre-translated CSVs, or None if not fully available."""
+    if lang == "English" or lang not in CARD_LABELS:
+        return None
+    kb = kb or knowledge.current
+    desc = kb.localized_descriptions.get(lang, {}).get(topic)
+    precs = kb.localized_precautions.get(lang, {}).get(topic)
+    if desc is None or (precs is None and kb.precautions.get(topic)):
+        return None
+    return desc, precs or []
+
+def build_info_card(topic, desc, precs, labels):
+    html = f"""
+        <div class='diagnosis-card' style='border-left-color: #0984E3;'>
+            <div class='diagnosis-title' style='color:#0984E3;'>ℹ️ {labels["information"]}: {topic.title()}</div>
+            <p>{desc}</p>
+        """
+        
+    html += f"""
+            <div class='section-title'>{labels["safety"]}</div>
+            <ul class='precautions-list'>
+                {''.join([f"<li>{p.title()}</li>" for p in precs])}
+            </ul>
+        </div>
+        """
+    
+    # Add Disclaimer
+    html += f"""
+        <div style='margin-top:10px; padding:10px; background:#fff3cd; border:1px solid #ffeeba; border-radius:5px; font-size:0.75rem; color:#856404;'>
+             {labels["disclaimer"]}
+        </div>
+        """
+    return html
 
 def format_ai_response(text):
     if not text: return ""
-    import re
     text = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', text)
     text = text.replace("\n", "<br>")
     return text
 
-def save_interaction(user_text, bot_html, intent, conf, region=None):
-    """Helper to log interactions to the DB safely."""
+def save_interaction(user_text, bot_html, intent, conf, region=None, lang=None):
+    """Helper to queue interactions for the background DB writer safely (with the request's latency and upstream calls)."""
     try:
         u_identifier = request.headers.get('X-Forwarded-For', request.remote_addr)
-        
-        with app.app_context(): # Ensure we are in context
-            user = User.query.filter_by(user_identifier=u_identifier).first()
-            if not user:
-                user = User(user_identifier=u_identifier)
-                db.session.add(user)
-                db.session.commit()
-                
-            interaction = Interaction(
-                user_id=user.id,
-                user_message=user_text,
-                bot_response=bot_html, 
-                intent_detected=intent,
-                confidence_score=float(conf),
-                region=region, # Store simulated or real region
-                sentiment="neutral" 
-            )
-            db.session.add(interaction)
-            db.session.commit()
+        channel = "whatsapp" if request.path.startswith("/whatsapp") else "web"
+        timing = metrics.request_summary()
+        with metrics.stage("db_enqueue"):
+            interaction_logger.log(u_identifier, user_text, bot_html, intent, conf, region, channel, lang, timing)
     except Exception as e:
         print(f"⚠️ DB LOGGING FAILED: {e}")
 
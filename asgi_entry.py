@@ -0,0 +1,262 @@
+"""
+Async serving mode.
+
+The chat hot paths (/get_response, /get_response/stream, /whatsapp,
+/api/alerts) run as asyncio handlers: Google Translate, Groq and the RSS
+feeds are called through non-blocking httpx clients, so one worker keeps
+serving while hundreds of requests wait on upstream - a streamed Groq
+answer holds no thread. Interaction logging is already write-behind
+(shared/interaction_logger.py), and cache reads past the in-memory tier and
+all cache writes run in a thread, so SQLite never blocks the event loop.
+
+Every other route - the landing page, status APIs and the whole admin portal under /admin - is the unchanged Flask app, mounted
+through a WSGI adapter (runs in a thread pool).
+
+    uvicorn asgi_entry:application --host 0.0.0.0 --port $PORT --workers 4
+
+production_entry.py (sync gunicorn workers) remains the default.
+"""
+import asyncio
+import contextlib
+import functools
+import os
+import sys
+from urllib.parse import parse_qs
+
+# Add the project root to path so imports work correctly
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import app as chat
+from admin_portal.app import app as admin_app
+from alert_service import get_health_alerts, get_alert_cache_status, run_alert_refresher_async
+from groq_service import (
+    translate_to_english_async, translate_message_async, get_ai_explanation_async, close_async_clients,
+    get_async_coalescing_stats, async_llm_client, get_cached_ai_explanation_async, stream_ai_explanation_async,
+)
+from shared import metrics
+
+# Threads for the mounted Flask apps (admin pages, SSE stream, static files)
+WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", "10"))
+
+
+async def read_form(request):
+    """Form fields of a urlencoded POST (web chat and Twilio both send these)."""
+    body = (await request.body()).decode("utf-8", errors="replace")
+    return {key: values[0] for key, values in parse_qs(body, keep_blank_values=True).items()}
+
+
+def save_interaction(request, user_text, bot_html, intent, conf, region=None, channel="web", lang=None):
+    """Queues the interaction for the background writer (never touches SQLite here)."""
+    try:
+        u_identifier = request.headers.get("X-Forwarded-For", request.client.host if request.client else None)
+        timing = metrics.request_summary()
+        with metrics.stage("db_enqueue"):
+            chat.interaction_logger.log(u_identifier, user_text, bot_html, intent, conf, region, channel, lang, timing)
+    except Exception as e:
+        print(f"⚠️ DB LOGGING FAILED: {e}")
+
+
+# --- METRICS ---
+def timed(endpoint):
+    """Stage timing for an async chat handler, like the Flask hooks in app.py (/metrics + Server-Timing)."""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            metrics.begin_request(endpoint)
+            try:
+                response = await handler(request)
+            finally:
+                server_timing = metrics.end_request()
+            if server_timing: # None when a streamed body took the timing over
+                response.headers["Server-Timing"] = server_timing
+            return response
+        return wrapper
+    return decorator
+
+def collect_async_stats():
+    samples = [("chatbot_coalesced_calls_total", {"mode": "async"}, get_async_coalescing_stats()["deduplicated"])]
+    for event, value in async_llm_client.stats.items():
+        samples.append(("chatbot_llm_client_events_total", {"event": event, "mode": "async"}, value))
+    return samples
+
+metrics.register_collector(collect_async_stats)
+
+
+# --- ROUTES ---
+async def answer_locally(msg, cleaned_msg, lang):
+    """
+    Async chat.answer_locally: (html, intent, confidence, cleaned_input),
+    html is None when only Groq or the help text are left.
+    """
+    with metrics.stage("quick_answer"):
+        quick = chat.quick_answer(msg, cleaned_msg)
+    if quick:
+        return quick + (cleaned_msg,)
+    cleaned_input = msg
+    if lang != "English":
+        with metrics.stage("translate_in"):
+            cleaned_input = await translate_to_english_async(msg, "Auto")
+    with metrics.stage("topic_match"):
+        card = chat.topic_card(cleaned_input, lang)
+    if card:
+        html, needs_translation = card
+        if needs_translation:
+            with metrics.stage("translate_out"):
+                html = await translate_message_async(html, lang)
+        return html, "info_lookup", 1.0, cleaned_input
+    return None, None, 0.0, cleaned_input
+
+async def unclear_response(lang):
+    with metrics.stage("translate_out"):
+        return await translate_message_async(chat.UNCLEAR_MESSAGE, lang)
+
+
+@timed("get_response")
+async def get_response(request):
+    chat.knowledge.maybe_reload()
+    form = await read_form(request)
+    msg = form.get("msg", "")
+    cleaned_msg, lang = chat.prepare_message(msg, form.get("lang", "English"))
+
+    html, intent, conf, cleaned_input = await answer_locally(msg, cleaned_msg, lang)
+    if html is None:
+        ai_resp = None
+        if chat.is_definition_question(cleaned_input):
+            with metrics.stage("groq"):
+                ai_resp = await get_ai_explanation_async(cleaned_input, lang)
+        if ai_resp:
+            html, intent, conf = chat.build_ai_card(ai_resp), "general_ai", 0.5
+        else:
+            html, intent, conf = await unclear_response(lang), "unclear", 0.0
+
+    save_interaction(request, msg, html, intent, conf, lang=lang)
+    return JSONResponse({"response": html})
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@timed("get_response_stream")
+async def get_response_stream(request):
+    """Same events as the Flask /get_response/stream (see app.py); a live Groq answer streams without a thread."""
+    chat.knowledge.maybe_reload()
+    form = await read_form(request)
+    msg = form.get("msg", "")
+    cleaned_msg, lang = chat.prepare_message(msg, form.get("lang", "English"))
+
+    html, intent, conf, cleaned_input = await answer_locally(msg, cleaned_msg, lang)
+    if html is None and chat.is_definition_question(cleaned_input):
+        cached = await get_cached_ai_explanation_async(cleaned_input, lang)
+        if cached:
+            html, intent, conf = chat.build_ai_card(cached), "general_ai", 0.5
+        else:
+            # Timed until the last event, not until the headers go out
+            events = stream_ai_answer(request, msg, cleaned_input, lang, metrics.detach_request())
+            return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+    if html is None:
+        html, intent, conf = await unclear_response(lang), "unclear", 0.0
+
+    save_interaction(request, msg, html, intent, conf, lang=lang)
+    return Response(chat.sse_event("answer", {"response": html}), media_type="text/event-stream", headers=SSE_HEADERS)
+
+async def stream_ai_answer(request, msg, cleaned_input, lang, timing=None):
+    # Flush headers right away so the browser's connect timeout never fires on a slow model
+    yield ": connected\n\n"
+    metrics.resume_request(timing)
+    parts = []
+    try:
+        with metrics.stage("groq"):
+            async for chunk in stream_ai_explanation_async(cleaned_input, lang):
+                parts.append(chunk)
+                yield chat.sse_event("token", {"text": chunk})
+    except Exception as e:
+        print(f"Groq Stream Error: {e}")
+        parts = []
+    if parts:
+        html = chat.build_ai_card("".join(parts))
+        save_interaction(request, msg, html, "general_ai", 0.5, lang=lang)
+        event = chat.sse_event("done", {"response": html})
+    else:
+        html = await unclear_response(lang)
+        save_interaction(request, msg, html, "unclear", 0.0, lang=lang)
+        event = chat.sse_event("answer", {"response": html})
+    metrics.end_request()
+    yield event
+
+
+@timed("whatsapp_reply")
+async def whatsapp_reply(request):
+    from twilio.twiml.messaging_response import MessagingResponse
+
+    chat.knowledge.maybe_reload()
+    form = await read_form(request)
+    incoming_msg = form.get("Body", "").lower().strip()
+
+    resp = MessagingResponse()
+    msg = resp.message()
+    if not incoming_msg:
+        return Response(str(resp), media_type="text/xml")
+
+    reply_text, intent, cleaned_input = chat.whatsapp_answer_locally(incoming_msg)
+    if reply_text is not None:
+        msg.body(reply_text)
+        save_interaction(request, incoming_msg, reply_text, intent, 1.0, "WhatsApp", "whatsapp", "English")
+        return Response(str(resp), media_type="text/xml")
+
+    groq_resp = None
+    if chat.is_whatsapp_definition(incoming_msg):
+        with metrics.stage("groq"):
+            groq_resp = await get_ai_explanation_async(cleaned_input, "English")
+    if groq_resp:
+        msg.body(chat.whatsapp_ai_reply(groq_resp))
+        save_interaction(request, incoming_msg, groq_resp, "whatsapp_ai", 0.5, "WhatsApp", "whatsapp", "English")
+    else:
+        msg.body(chat.WHATSAPP_HELP)
+        save_interaction(request, incoming_msg, "Fallback Help", "whatsapp_unclear", 0.0, "WhatsApp", "whatsapp", "English")
+    return Response(str(resp), media_type="text/xml")
+
+
+async def api_alerts(request):
+    """Served from the in-memory cache; the async refresher keeps it fresh"""
+    response = JSONResponse(get_health_alerts())
+    age = get_alert_cache_status()["age_seconds"]
+    if age is not None:
+        response.headers["Age"] = str(int(age))
+    return response
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    refresher = asyncio.create_task(run_alert_refresher_async())
+    try:
+        yield
+    finally:
+        refresher.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await refresher
+        await close_async_clients()
+        chat.interaction_logger.stop()
+
+
+# Configure the Admin App's URL structure when mounted
+admin_app.config['APPLICATION_ROOT'] = '/admin'
+
+application = Starlette(
+    routes=[
+        Route("/get_response", get_response, methods=["POST"]),
+        Route("/get_response/stream", get_response_stream, methods=["POST"]),
+        Route("/whatsapp", whatsapp_reply, methods=["POST"]),
+        Route("/api/alerts", api_alerts),
+        Mount("/admin", app=WSGIMiddleware(admin_app, workers=WSGI_THREADS)),
+        Mount("/", app=WSGIMiddleware(chat.app, workers=WSGI_THREADS)),
+    ],
+    lifespan=lifespan,
+)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(application, host="localhost", port=5000)
@@ -0,0 +1,121 @@
+"""
+Benchmark: concurrent-user throughput, sync gunicorn vs async (uvicorn) mode.
+
+Starts each server as a subprocess with the same number of worker processes,
+Groq replaced by the local stub (fixed upstream latency), and a throwaway
+copy of the database and cache. Simulated users then send a mix of
+knowledge-base questions and never-seen-before "what is" questions (each
+one a Groq call) for a fixed time.
+
+Usage: python benchmarks/bench_async_serving.py [users] [seconds] [workers] [upstream_latency]
+"""
+import asyncio
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+from stub_servers import GroqStub
+
+KB_QUESTIONS = ["dengue", "malaria", "typhoid", "chicken pox", "vaccination schedule"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode, port, workers, env):
+    if mode == "sync":
+        cmd = ["gunicorn", "production_entry:application", "-w", str(workers), "-b", f"127.0.0.1:{port}", "--log-level", "warning"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "asgi_entry:application", "--workers", str(workers),
+               "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    proc = subprocess.Popen(cmd, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/api/alerts/status", timeout=1)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    proc.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+async def user(client, base, deadline, latencies, failures, i):
+    n = 0
+    while time.time() < deadline:
+        n += 1
+        if n % 2:
+            msg = KB_QUESTIONS[(i + n) % len(KB_QUESTIONS)]
+        else:
+            msg = f"what is condition {uuid.uuid4().hex[:8]}" # cache miss -> Groq
+        started = time.perf_counter()
+        try:
+            response = await client.post(base + "/get_response", data={"msg": msg, "lang": "English"})
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+        except httpx.HTTPError:
+            failures.append(msg)
+
+
+async def load(base, users, seconds):
+    latencies, failures = [], []
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        deadline = time.time() + seconds
+        await asyncio.gather(*(user(client, base, deadline, latencies, failures, i) for i in range(users)))
+    return latencies, failures
+
+
+def run(mode, users, seconds, workers, stub_url, tmp):
+    db_path = os.path.join(tmp, f"{mode}.db")
+    shutil.copy(os.path.join(BASE_DIR, "database.db"), db_path)
+    env = dict(os.environ,
+               GROQ_API_URL=stub_url, GROQ_API_KEY="bench",
+               DATABASE_PATH=db_path, CACHE_DB_PATH=os.path.join(tmp, f"{mode}-cache.db"),
+               LLM_MAX_CONCURRENCY=str(users), LLM_ACQUIRE_TIMEOUT="30")
+    port = free_port()
+    proc = start_server(mode, port, workers, env)
+    try:
+        latencies, failures = asyncio.run(load(f"http://127.0.0.1:{port}", users, seconds))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+    print(f"{mode:6} {len(latencies) / seconds:8.1f} req/s   p50 {statistics.median(latencies) if latencies else 0:8.1f} ms"
+          f"   p95 {p95:8.1f} ms   failed {len(failures)}")
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 15
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    latency = float(sys.argv[4]) if len(sys.argv) > 4 else 0.3
+
+    tmp = tempfile.mkdtemp()
+    try:
+        with GroqStub(latency=latency) as stub:
+            print(f"{users} concurrent users, {seconds:.0f}s, {workers} workers, {latency * 1000:.0f} ms Groq latency\n")
+            run("sync", users, seconds, workers, stub.url, tmp)
+            run("async", users, seconds, workers, stub.url, tmp)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
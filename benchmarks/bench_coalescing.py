@@ -0,0 +1,83 @@
+"""
+Benchmark: outbreak burst against a cold AI-definition cache.
+
+N threads ask the same few questions at the same moment (as during an
+outbreak). Compares upstream Groq calls and latency with request coalescing
+off (every cache miss calls upstream) and on (one call per distinct question).
+Runs against the local Groq stub with a throwaway cache file.
+
+Usage: python benchmarks/bench_coalescing.py [threads] [distinct_questions] [upstream_latency]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ["CACHE_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "cache.db")
+os.environ.setdefault("GROQ_API_KEY", "bench")
+os.environ.setdefault("LLM_MAX_CONCURRENCY", "64")
+
+import groq_service
+from shared.single_flight import SingleFlight
+from stub_servers import GroqStub
+
+
+class NoFlight(SingleFlight):
+    """Pass-through: the pre-coalescing behaviour."""
+
+    def do(self, key, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+
+def burst(threads, questions):
+    latencies = []
+    lock = threading.Lock()
+    start = threading.Barrier(threads)
+
+    def ask(i):
+        start.wait()
+        t0 = time.perf_counter()
+        groq_service.get_ai_explanation(f"what is {questions[i % len(questions)]}")
+        with lock:
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    workers = [threading.Thread(target=ask, args=(i,)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+def run(label, flight, stub, threads, questions):
+    groq_service.ai_definition_cache.clear()
+    groq_service.upstream_flight = flight
+    before = len(stub.requests)
+    p50, p99 = burst(threads, questions)
+    calls = len(stub.requests) - before
+    print(f"{label:22} upstream calls {calls:5}   p50 {p50:8.1f} ms   p99 {p99:8.1f} ms"
+          f"   deduplicated {flight.stats()['deduplicated']}")
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.3
+    questions = ["nipah", "dengue", "zika", "cholera", "measles"][:distinct]
+
+    with GroqStub(latency=latency) as stub:
+        groq_service.llm_client.api_url = stub.url
+        print(f"{threads} concurrent requests, {len(questions)} distinct questions, {latency * 1000:.0f} ms upstream\n")
+        run("before: no coalescing", NoFlight(), stub, threads, questions)
+        run("after: single-flight", SingleFlight(), stub, threads, questions)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: FuzzyIndex vs the legacy per-word difflib.get_close_matches
+fallback of find_topic_info, on the full symptom_Description.csv topic set.
+
+Usage: python benchmarks/bench_fuzzy_index.py [rounds]
+"""
+import os
+import sys
+import time
+from difflib import get_close_matches
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from topic_index import FuzzyIndex
+from bench_topic_index import load_topics
+
+QUERIES = [
+    "dengu",
+    "malarea",
+    "tyfoid fever treatment",
+    "dimorphic hemmorhoids",
+    "dimorfic hemorhoids treatment please",
+    "tuberculosys symptoms",
+    "my mother has had a persistant cough and fevr for two weeks and she is loosing weight, neighbours say it could be tuberclosis or pnemonia, what precautions should the family take",
+    "what is a virus",
+]
+
+
+def legacy_fuzzy(text, disease_list):
+    for word in text.lower().split():
+        if len(word) > 4:
+            matches = get_close_matches(word, disease_list, n=1, cutoff=0.8)
+            if matches:
+                return matches[0]
+    return None
+
+
+def timeit(fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for q in QUERIES:
+            fn(q)
+    return (time.perf_counter() - start) / (rounds * len(QUERIES))
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    disease_list = load_topics()
+
+    start = time.perf_counter()
+    index = FuzzyIndex(disease_list)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"Topics: {len(disease_list)} | Index build: {build_ms:.1f} ms")
+
+    print(f"{'Query':50} {'legacy':>24} {'indexed':>32}")
+    for q in QUERIES:
+        hits = index.search(q, limit=1)
+        hit = f"{hits[0][0][:24]} ({hits[0][1]:.2f})" if hits else "None"
+        print(f"{q[:48]:50} {str(legacy_fuzzy(q, disease_list))[:24]:>24} {hit:>32}")
+
+    for q in QUERIES:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            index.search(q)
+        per = (time.perf_counter() - start) / rounds
+        print(f"  search {per * 1e6:8.1f} us  <- {q[:48]}")
+
+    legacy = timeit(lambda q: legacy_fuzzy(q, disease_list), rounds)
+    indexed = timeit(index.search, rounds)
+    print()
+    print(f"Legacy difflib : {legacy * 1e6:10.1f} us/lookup")
+    print(f"FuzzyIndex     : {indexed * 1e6:10.1f} us/lookup")
+    print(f"Speedup        : {legacy / indexed:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
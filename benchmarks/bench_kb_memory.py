@@ -0,0 +1,92 @@
+"""
+Benchmark: knowledge-base memory per worker as the worker count grows.
+
+  dict   every worker parses the sources into its own dicts (the layout
+         before the memory-mapped snapshot)
+  mmap   every worker maps the compiled snapshot (knowledge_base.load_snapshot)
+
+Each worker is a separate process that loads the knowledge base and then
+reads every description and precaution in every language, so all of it is
+resident. While all N are alive the parent reads /proc/<pid>/smaps_rollup:
+RSS counts shared page-cache pages in every process that touches them, PSS
+splits them between the processes sharing them, which is what the node
+actually pays. "KB" is the growth in the worker's private memory from
+loading and reading the knowledge base.
+
+Linux only. Usage: python benchmarks/bench_kb_memory.py [max_workers]
+"""
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+LANGUAGES = ["Hindi", "Tamil", "Odia"]
+
+WORKER = """
+import sys
+from knowledge_base import build_knowledge_base, load_snapshot
+
+def private_kb():
+    with open("/proc/self/smaps_rollup") as f:
+        fields = dict(line.split(":")[0:2] for line in f if line.endswith("kB\\n"))
+    return sum(int(fields[k].split()[0]) for k in ("Private_Clean", "Private_Dirty"))
+
+languages = %r
+before = private_kb()
+kb = build_knowledge_base(languages) if sys.argv[1] == "dict" else load_snapshot(languages)
+for topic in kb.topics:
+    kb.descriptions.get(topic), kb.precautions.get(topic)
+    for lang in languages:
+        kb.localized_descriptions[lang].get(topic), kb.localized_precautions[lang].get(topic)
+print(private_kb() - before, flush=True)
+sys.stdin.read() # Stay alive until the parent has measured every worker
+""" % (LANGUAGES,)
+
+
+def rollup(pid):
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        fields = dict(line.split(":")[0:2] for line in f if line.endswith("kB\n"))
+    return {k: int(fields[k].split()[0]) / 1024 for k in ("Rss", "Pss")}
+
+
+def run(layout, workers, env):
+    procs = [subprocess.Popen([sys.executable, "-c", WORKER, layout], cwd=BASE_DIR, env=env, text=True,
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE) for _ in range(workers)]
+    try:
+        kb = [int(p.stdout.readline()) / 1024 for p in procs] # Every worker loaded and read the KB
+        usage = [rollup(p.pid) for p in procs]
+    finally:
+        for p in procs:
+            p.stdin.close()
+            p.wait()
+    rss = statistics.median(u["Rss"] for u in usage)
+    pss = statistics.median(u["Pss"] for u in usage)
+    print(f"{layout:5} {workers:3} workers   RSS/worker {rss:6.1f} MB   PSS/worker {pss:6.1f} MB   "
+          f"KB/worker {statistics.median(kb):5.1f} MB   PSS total {sum(u['Pss'] for u in usage):7.1f} MB")
+
+
+def main():
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    tmp = tempfile.mkdtemp()
+    try:
+        snapshot = os.path.join(tmp, "kb_snapshot.bin")
+        env = dict(os.environ, KB_SNAPSHOT_PATH=snapshot)
+        subprocess.run([sys.executable, "knowledge_base.py"], cwd=BASE_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+        print(f"snapshot {os.path.getsize(snapshot) / 1024 / 1024:.1f} MB on disk\n")
+
+        counts = [n for n in (1, 2, 4, 8, 16) if n <= max_workers]
+        for layout in ("dict", "mmap"):
+            for n in counts:
+                run(layout, n, env)
+            print()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
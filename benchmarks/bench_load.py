@@ -0,0 +1,330 @@
+"""
+End-to-end load test of the chat endpoints.
+
+Serves production_entry.application under gunicorn (or asgi_entry under
+uvicorn with --server async) with Google Translate, Groq and the RSS feeds
+replaced by the local stubs (stub_servers.py, configurable latency), and a
+throwaway copy of the database, caches and knowledge-base snapshot. The sync
+server runs it through stub_entry.py, which points deep-translator at the
+translate stub.
+Simulated users then send a weighted mix of messages for a fixed time:
+
+  web        POST /get_response in English, Hindi, Tamil and Odia
+  whatsapp   POST /whatsapp, Twilio-style form posts
+
+Every reply is checked against the intent path it was meant to exercise
+(greeting, vaccination, info_lookup, general_ai, unclear, and alerts on
+WhatsApp), so a change in routing shows up as "wrong path" instead of
+silently shifting the numbers. Reports throughput and p50/p95/p99 per
+channel/intent and per language, and saves everything as JSON
+(benchmarks/results/ by default) for comparing runs:
+
+    python benchmarks/bench_load.py --users 40 --seconds 30
+    python benchmarks/bench_load.py --compare benchmarks/results/load-20251014-101500.json
+
+general_ai questions are all distinct by default (every one is a Groq
+call); --ai-distinct N draws them from N questions so the AI cache warms up.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+from stub_servers import GroqStub, TranslateStub, RssStub
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# --- WORKLOAD ---
+# Share of web traffic per UI language, and of all traffic per channel/intent
+LANGUAGE_WEIGHTS = {"English": 40, "Hindi": 25, "Tamil": 20, "Odia": 15}
+WEB_WEIGHTS = {"greeting": 8, "vaccination": 8, "info_lookup": 40, "general_ai": 12, "unclear": 7}
+WHATSAPP_WEIGHTS = {"vaccination": 3, "info_lookup": 12, "general_ai": 4, "unclear": 3, "alerts": 3}
+
+GREETINGS = ["hello", "hi", "namaste", "vanakam", "how are you"]
+VACCINATION = ["vaccination schedule", "when is the next vaccine", "immunization for my baby"]
+TOPICS = ["dengue", "malaria", "typhoid", "chicken pox", "tuberculosis", "jaundice", "common cold", "pneumonia"]
+UNCLEAR = ["zxqv plorb", "ok thanks bye", "qwerty uiop"]
+# Native-script questions; the Translate stub's glossary maps them to English
+LOCAL_TOPICS = {
+    "Hindi": {"डेंगू": "dengue", "मलेरिया": "malaria", "टाइफाइड": "typhoid", "तपेदिक": "tuberculosis"},
+    "Tamil": {"டெங்கு": "dengue", "மலேரியா": "malaria", "டைபாய்டு": "typhoid", "காசநோய்": "tuberculosis"},
+    "Odia": {"ଡେଙ୍ଗୁ": "dengue", "ମ୍ୟାଲେରିଆ": "malaria", "ଟାଇଫଏଡ୍": "typhoid", "ଯକ୍ଷ୍ମା": "tuberculosis"},
+}
+GLOSSARY = {text: english for topics in LOCAL_TOPICS.values() for text, english in topics.items()}
+
+# Text each intent path's reply contains (the stubbed translations keep the English text)
+WEB_MARKERS = {
+    "greeting": lambda r: "Public Health Information Assistant" in r,
+    "vaccination": lambda r: "Immunization Schedule" in r,
+    "info_lookup": lambda r: "diagnosis-card" in r and "General Definition" not in r and "Immunization" not in r,
+    "general_ai": lambda r: "General Definition" in r,
+    "unclear": lambda r: "public health information guide" in r,
+}
+WHATSAPP_MARKERS = {
+    "vaccination": lambda r: "Immunization Schedule" in r,
+    "info_lookup": lambda r: "Information:" in r,
+    "general_ai": lambda r: "*Definition:*" in r,
+    "unclear": lambda r: "I am a Public Health Bot" in r,
+    "alerts": lambda r: "outbreak alerts" in r.lower(),
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a sorted list (0 for an empty one)."""
+    if not values:
+        return 0.0
+    return values[max(0, min(len(values) - 1, int(round(p / 100 * len(values))) - 1))]
+
+
+class Workload:
+    """Picks the next (channel, intent, language, message) for a simulated user."""
+
+    def __init__(self, rng, ai_distinct):
+        self.rng = rng
+        self.ai_distinct = ai_distinct
+        self.paths = [("web", intent) for intent in WEB_WEIGHTS] + [("whatsapp", intent) for intent in WHATSAPP_WEIGHTS]
+        self.weights = list(WEB_WEIGHTS.values()) + list(WHATSAPP_WEIGHTS.values())
+
+    def ai_question(self):
+        if self.ai_distinct:
+            return f"what is condition {self.rng.randrange(self.ai_distinct)}"
+        return f"what is condition {uuid.uuid4().hex[:10]}"
+
+    def next(self):
+        channel, intent = self.rng.choices(self.paths, self.weights)[0]
+        lang = "English"
+        if channel == "web":
+            lang = self.rng.choices(list(LANGUAGE_WEIGHTS), list(LANGUAGE_WEIGHTS.values()))[0]
+        if intent == "greeting":
+            msg = self.rng.choice(GREETINGS)
+        elif intent == "vaccination":
+            msg = self.rng.choice(VACCINATION)
+        elif intent == "info_lookup":
+            msg = self.rng.choice(list(LOCAL_TOPICS[lang]) if lang in LOCAL_TOPICS else TOPICS)
+        elif intent == "general_ai":
+            msg = self.ai_question()
+        elif intent == "alerts":
+            msg = "any outbreak alerts"
+        else:
+            msg = self.rng.choice(UNCLEAR)
+        return channel, intent, lang, msg
+
+
+async def send(client, base, channel, lang, msg, user_id):
+    if channel == "web":
+        response = await client.post(base + "/get_response", data={"msg": msg, "lang": lang},
+                                     headers={"X-Forwarded-For": user_id})
+        response.raise_for_status()
+        return response.json()["response"]
+    response = await client.post(base + "/whatsapp", data={
+        "Body": msg, "From": f"whatsapp:+91{user_id.replace('.', '')[-10:]}", "To": "whatsapp:+14155238886",
+        "MessageSid": "SM" + uuid.uuid4().hex, "NumMedia": "0",
+    }, headers={"X-Forwarded-For": user_id})
+    response.raise_for_status()
+    return response.text
+
+
+async def user(client, base, workload, deadline, record_from, samples, i):
+    user_id = f"10.0.{i // 250}.{i % 250 + 1}"
+    while time.time() < deadline:
+        channel, intent, lang, msg = workload.next()
+        markers = WEB_MARKERS if channel == "web" else WHATSAPP_MARKERS
+        started = time.perf_counter()
+        try:
+            reply = await send(client, base, channel, lang, msg, user_id)
+            outcome = "ok" if markers[intent](reply) else "wrong_path"
+        except (httpx.HTTPError, ValueError, KeyError):
+            outcome = "error"
+        if time.time() >= record_from:
+            samples.append((channel, intent, lang, outcome, (time.perf_counter() - started) * 1000))
+
+
+async def load(base, users, seconds, warmup, ai_distinct, seed):
+    samples = []
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        record_from = time.time() + warmup
+        deadline = record_from + seconds
+        await asyncio.gather(*(
+            user(client, base, Workload(random.Random(seed + i), ai_distinct), deadline, record_from, samples, i)
+            for i in range(users)
+        ))
+    return samples
+
+
+def start_server(server, port, workers, threads, env):
+    if server == "sync":
+        cmd = ["gunicorn", "benchmarks.stub_entry:application", "-w", str(workers), "--threads", str(threads),
+               "-b", f"127.0.0.1:{port}", "--log-level", "warning"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "asgi_entry:application", "--workers", str(workers),
+               "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    proc = subprocess.Popen(cmd, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/api/alerts/status", timeout=1)
+            return proc
+        except httpx.HTTPError:
+            if proc.poll() is not None:
+                break
+            time.sleep(0.5)
+    proc.kill()
+    raise RuntimeError(f"{server} server did not start")
+
+
+def summarize(samples, seconds):
+    """Throughput, percentiles and outcome counts for a group of samples."""
+    latencies = sorted(ms for *_, outcome, ms in samples if outcome == "ok")
+    return {
+        "requests": len(samples),
+        "ok": len(latencies),
+        "errors": sum(1 for s in samples if s[3] == "error"),
+        "wrong_path": sum(1 for s in samples if s[3] == "wrong_path"),
+        "throughput_rps": round(len(latencies) / seconds, 2),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "max_ms": round(latencies[-1], 1) if latencies else 0.0,
+    }
+
+
+def report(samples, seconds):
+    paths, languages = {}, {}
+    for sample in samples:
+        paths.setdefault(f"{sample[0]}/{sample[1]}", []).append(sample)
+        if sample[0] == "web":
+            languages.setdefault(sample[2], []).append(sample)
+    return {
+        "total": summarize(samples, seconds),
+        "paths": {key: summarize(group, seconds) for key, group in sorted(paths.items())},
+        "web_languages": {key: summarize(group, seconds) for key, group in sorted(languages.items())},
+    }
+
+
+def print_table(title, rows):
+    print(f"\n{title:24} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'wrong':>6}")
+    for key, r in rows.items():
+        print(f"{key:24} {r['throughput_rps']:8.1f} {r['p50_ms']:9.1f} {r['p95_ms']:9.1f} {r['p99_ms']:9.1f}"
+              f" {r['errors']:7} {r['wrong_path']:6}")
+
+
+def print_comparison(current, previous_path):
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nvs {os.path.basename(previous_path)} ({previous.get('started_at', '?')})")
+    print(f"{'':24} {'req/s':>16} {'p95 ms':>18}")
+    rows = {"total": (current["total"], previous["results"]["total"])}
+    for key, r in current["paths"].items():
+        if key in previous["results"]["paths"]:
+            rows[key] = (r, previous["results"]["paths"][key])
+    for key, (now, before) in rows.items():
+        rps = (now["throughput_rps"] / before["throughput_rps"] - 1) * 100 if before["throughput_rps"] else 0.0
+        p95 = (now["p95_ms"] / before["p95_ms"] - 1) * 100 if before["p95_ms"] else 0.0
+        print(f"{key:24} {now['throughput_rps']:8.1f} {rps:+6.1f}%  {now['p95_ms']:9.1f} {p95:+6.1f}%")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test of /get_response and /whatsapp")
+    parser.add_argument("--users", type=int, default=20, help="concurrent simulated users")
+    parser.add_argument("--seconds", type=float, default=20, help="measured duration")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before that")
+    parser.add_argument("--server", choices=["sync", "async"], default="sync",
+                        help="sync: gunicorn production_entry:application (via stub_entry.py), async: uvicorn asgi_entry:application")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=1, help="gunicorn threads per worker (sync only)")
+    parser.add_argument("--groq-latency", type=float, default=0.3, help="seconds")
+    parser.add_argument("--translate-latency", type=float, default=0.05, help="seconds")
+    parser.add_argument("--rss-latency", type=float, default=0.2, help="seconds")
+    parser.add_argument("--ai-distinct", type=int, default=0, help="distinct AI questions (0: every one new)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="results JSON (default benchmarks/results/load-<time>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to print deltas against")
+    args = parser.parse_args()
+
+    started_at = datetime.now()
+    tmp = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(tmp, "database.db")
+        shutil.copy(os.path.join(BASE_DIR, "database.db"), db_path)
+        with GroqStub(latency=args.groq_latency) as groq, \
+                TranslateStub(latency=args.translate_latency, glossary=GLOSSARY) as translate, \
+                RssStub(latency=args.rss_latency) as rss:
+            env = dict(os.environ,
+                       GROQ_API_URL=groq.url, GROQ_API_KEY="bench", GOOGLE_TRANSLATE_URL=translate.url,
+                       ALERT_FEEDS=rss.url, ALERT_EXTRA_FEEDS="",
+                       DATABASE_PATH=db_path, CACHE_DB_PATH=os.path.join(tmp, "cache.db"),
+                       KB_SNAPSHOT_PATH=os.path.join(tmp, "kb_snapshot.bin"),
+                       METRICS_DIR=os.path.join(tmp, "metrics"),
+                       LLM_MAX_CONCURRENCY=str(max(4, args.users)), LLM_ACQUIRE_TIMEOUT="30")
+            port = free_port()
+            proc = start_server(args.server, port, args.workers, args.threads, env)
+            print(f"{args.server} server, {args.workers} workers x {args.threads} threads, {args.users} users, "
+                  f"{args.seconds:.0f}s (+{args.warmup:.0f}s warmup)")
+            print(f"upstream latency: Groq {args.groq_latency * 1000:.0f} ms, Translate "
+                  f"{args.translate_latency * 1000:.0f} ms, RSS {args.rss_latency * 1000:.0f} ms")
+            try:
+                samples = asyncio.run(load(f"http://127.0.0.1:{port}", args.users, args.seconds, args.warmup,
+                                           args.ai_distinct, args.seed))
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+            upstream = {"groq": len(groq.requests), "translate": len(translate.requests), "rss": len(rss.requests)}
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    results = report(samples, args.seconds)
+    print_table("channel/intent", results["paths"])
+    print_table("web language", results["web_languages"])
+    print_table("", {"total": results["total"]})
+    print(f"\nupstream calls: {upstream}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"load-{started_at:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "host": {"python": platform.python_version(), "cpus": os.cpu_count(), "platform": platform.platform()},
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+            "workload": {"languages": LANGUAGE_WEIGHTS, "web": WEB_WEIGHTS, "whatsapp": WHATSAPP_WEIGHTS},
+            "upstream_calls": upstream,
+            "results": results,
+        }, f, indent=2)
+    print(f"saved {output}")
+
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+Microbenchmark and regression gate for the per-message retrieval hot path.
+
+Times each pure-Python stage of answering a message in isolation, over the
+query corpus in corpus/retrieval_queries.json (English, Hinglish/Tanglish,
+typos, long WhatsApp paragraphs, messages with no topic) and the knowledge
+base the app builds from MasterData and the translated CSVs:
+
+  prepare_message   cleaning + overrides
+  greeting          the greeting regex loop (is_greeting)
+  vaccination       the vaccination keyword check
+  topic_index       exact topic/alias match (TopicIndex.best_match)
+  fuzzy_index       typo fallback (FuzzyIndex.search)
+  find_topic_info   exact + fuzzy + description/precaution lookup
+  info_card         build_info_card for the matched topic
+  answer_locally    the whole local pipeline for an English message
+
+Reports ops/sec (best of several repeats), µs/op per corpus category and
+the transient memory allocated per op (tracemalloc peak). Each stage is
+also scored against a fixed pure-Python calibration loop measured in the
+same run, so the stored baseline carries over between machines. The run
+fails (exit 1) when a stage's score drops more than --threshold below the
+baseline and stays there in --confirm re-runs of that stage.
+
+    python benchmarks/bench_retrieval.py                  # compare with the baseline
+    python benchmarks/bench_retrieval.py --save-baseline  # after an intended change
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BASE_DIR)
+
+CORPUS_PATH = os.path.join(BENCH_DIR, "corpus", "retrieval_queries.json")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baselines", "retrieval.json")
+
+# Throwaway database/cache/snapshot: importing the app must not touch the real ones
+_tmp = tempfile.mkdtemp()
+shutil.copy(os.path.join(BASE_DIR, "database.db"), os.path.join(_tmp, "database.db"))
+os.environ["DATABASE_PATH"] = os.path.join(_tmp, "database.db")
+os.environ["CACHE_DB_PATH"] = os.path.join(_tmp, "cache.db")
+os.environ["KB_SNAPSHOT_PATH"] = os.path.join(_tmp, "kb_snapshot.bin")
+os.environ["METRICS_DIR"] = os.path.join(_tmp, "metrics")
+
+with contextlib.redirect_stdout(open(os.devnull, "w")):
+    import app
+
+
+def calibration():
+    """Fixed pure-Python work (string split/format, dict updates, sort) as the machine's yardstick."""
+    counts = {}
+    for i in range(500):
+        key = f"topic {i % 97} precaution"
+        counts[key] = counts.get(key, 0) + len(key.split())
+    return sorted(counts)
+
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build_stages(corpus):
+    """stage -> (fn, {category: [args, ...]})"""
+    kb = app.knowledge.current
+    labels = app.CARD_LABELS["English"]
+
+    def inputs(make):
+        return {category: [args for args in map(make, queries) if args is not None]
+                for category, queries in corpus.items()}
+
+    def cleaned(q):
+        return app.prepare_message(q, "English")[0]
+
+    def card_args(q):
+        info = app.find_topic_info(q, kb)
+        return (info[0], info[1], info[2], labels) if info else None
+
+    return {
+        "prepare_message": (app.prepare_message, inputs(lambda q: (q, "English"))),
+        "greeting": (app.is_greeting, inputs(lambda q: (cleaned(q),))),
+        "vaccination": (app.is_vaccination_question, inputs(lambda q: (q,))),
+        "topic_index": (kb.topic_index.best_match, inputs(lambda q: (q.lower(),))),
+        "fuzzy_index": (lambda text: kb.fuzzy_index.search(text, limit=1, cutoff=0.8), inputs(lambda q: (q.lower(),))),
+        "find_topic_info": (lambda text: app.find_topic_info(text, kb), inputs(lambda q: (q,))),
+        "info_card": (app.build_info_card, inputs(card_args)),
+        "answer_locally": (app.answer_locally, inputs(lambda q: (q, cleaned(q), "English"))),
+    }
+
+
+def best_time(fn, args_list, repeats, min_time):
+    """Best seconds per op over `repeats` runs of at least `min_time` seconds each."""
+    if not args_list:
+        return None
+    rounds = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for args in args_list:
+                fn(*args)
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / 4:
+            break
+        rounds *= 4
+    best = elapsed
+    for _ in range(repeats - 1):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for args in args_list:
+                fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best / (rounds * len(args_list))
+
+
+def peak_bytes(fn, args_list):
+    """Mean transient memory allocated per op (tracemalloc peak above the starting point)."""
+    tracemalloc.start()
+    total = 0
+    for args in args_list:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        fn(*args)
+        total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return total / len(args_list)
+
+
+def measure_stage(fn, by_category, repeats, min_time):
+    """Timings of one stage, scored against the calibration loop measured right before and after it."""
+    # The yardstick is taken next to each stage so CPU speed drift during the run cancels out
+    calib = best_time(calibration, [()], repeats, min_time)
+    per_category = {category: best_time(fn, args_list, repeats, min_time)
+                    for category, args_list in by_category.items()}
+    calib = min(calib, best_time(calibration, [()], repeats, min_time))
+    ops = sum(len(a) for a in by_category.values())
+    seconds = sum(t * len(by_category[c]) for c, t in per_category.items() if t is not None)
+    all_args = [args for args_list in by_category.values() for args in args_list]
+    return calib, {
+        "ops_per_sec": round(ops / seconds, 1),
+        "score": round((ops / seconds) * calib, 4),
+        "peak_bytes_per_op": round(peak_bytes(fn, all_args)),
+        "us_per_op": {c: round(t * 1e6, 2) for c, t in per_category.items() if t is not None},
+    }
+
+
+def measure(stages, repeats, min_time):
+    results = {}
+    calibrations = []
+    # find_topic_info / answer_locally print debug lines; keep them out of the timings' terminal I/O
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        best_time(calibration, [()], 1, min_time) # warm-up
+        for name, (fn, by_category) in stages.items():
+            calib, results[name] = measure_stage(fn, by_category, repeats, min_time)
+            calibrations.append(calib)
+    return round(1 / min(calibrations), 1), results
+
+
+def print_results(calibration_ops, results, categories):
+    print(f"calibration: {calibration_ops:,.0f} loops/s\n")
+    short = [c[:12] for c in categories]
+    print(f"{'stage':16} {'ops/s':>11} {'alloc/op':>10}   " + " ".join(f"{c:>12}" for c in short))
+    print(f"{'':16} {'':>11} {'':>10}   " + " ".join(f"{'µs/op':>12}" for _ in short))
+    for name, r in results.items():
+        cells = " ".join(f"{r['us_per_op'][c]:12.2f}" if c in r["us_per_op"] else f"{'-':>12}" for c in categories)
+        print(f"{name:16} {r['ops_per_sec']:11,.0f} {r['peak_bytes_per_op'] / 1024:8.1f}KB   {cells}")
+
+
+def check(results, baseline, threshold):
+    """Stages whose calibrated score fell more than `threshold` below the baseline."""
+    regressions = []
+    print(f"\nvs baseline {baseline.get('created_at', '?')} (commit {baseline.get('commit') or '?'}),"
+          f" threshold -{threshold:.0%}")
+    for name, r in results.items():
+        base = baseline["stages"].get(name)
+        if not base:
+            print(f"  {name:16} (new stage)")
+            continue
+        change = r["score"] / base["score"] - 1
+        flag = "REGRESSION" if change < -threshold else "ok"
+        print(f"  {name:16} {change:+7.1%}  {flag}")
+        if change < -threshold:
+            regressions.append(name)
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval hot-path microbenchmarks with a regression gate")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timed repeat")
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("RETRIEVAL_BENCH_THRESHOLD", "0.25")),
+                        help="allowed slowdown per stage (0.25 = 25%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--baseline-runs", type=int, default=3, help="runs a saved baseline is the median of")
+    parser.add_argument("--confirm", type=int, default=2, help="re-runs of a stage that looks slower before failing")
+    parser.add_argument("--json", help="also write this run's results here")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    kb = app.knowledge.current
+    print(f"corpus: {sum(map(len, corpus.values()))} queries in {len(corpus)} categories | "
+          f"knowledge base: {len(kb.topics)} topics, version {kb.version}")
+    calibration_ops, results = measure(build_stages(corpus), args.repeats, args.min_time)
+    if args.save_baseline and args.baseline_runs > 1:
+        # The baseline is each stage's median run, so one lucky (or unlucky) run doesn't set the bar
+        runs = [results] + [measure(build_stages(corpus), args.repeats, args.min_time)[1]
+                            for _ in range(args.baseline_runs - 1)]
+        results = {name: sorted((run[name] for run in runs), key=lambda r: r["score"])[len(runs) // 2]
+                   for name in results}
+    print_results(calibration_ops, results, list(corpus))
+
+    run = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "host": {"python": platform.python_version(), "platform": platform.platform()},
+        "calibration_ops_per_sec": calibration_ops,
+        "stages": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2, ensure_ascii=False)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2, ensure_ascii=False)
+        print(f"\nsaved baseline {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"\nno baseline at {args.baseline}; run with --save-baseline first")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = check(results, baseline, args.threshold)
+    if regressions and args.confirm:
+        # Timings on shared machines are noisy: a regression has to show up in every re-run
+        stages = build_stages(corpus)
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            for name in regressions:
+                for _ in range(args.confirm):
+                    rerun = measure_stage(*stages[name], args.repeats, args.min_time)[1]
+                    if rerun["score"] > results[name]["score"]:
+                        results[name] = rerun
+        print(f"\nre-measured {', '.join(regressions)} ({args.confirm}x, best kept):")
+        regressions = check({name: results[name] for name in regressions}, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} stage(s) slower than the baseline: {', '.join(regressions)}")
+        return 1
+    print("\n✅ No stage slower than the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    finally:
+        shutil.rmtree(_tmp, ignore_errors=True)
@@ -0,0 +1,135 @@
+"""
+Benchmark: concurrent SQLite writer/reader throughput per storage profile.
+
+Simulates several gunicorn workers: writer processes commit one Interaction
+per transaction (like a chat request would), reader processes run the admin
+dashboard / QC queries. Compares the legacy setup (rollback journal, driver
+default lock wait, no secondary indexes) with the tuned profiles.
+
+Usage: python benchmarks/bench_sqlite_profile.py [writers] [readers] [seconds] [seed_rows]
+"""
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from sqlalchemy import create_engine
+from shared.database import db, STORAGE_PROFILES, apply_storage_profile
+
+INTENTS = ["greeting", "vaccination", "info_lookup", "general_ai", "unclear", "whatsapp_info"]
+
+READ_QUERIES = [
+    "SELECT COUNT(*) FROM interaction",
+    "SELECT id FROM interaction ORDER BY timestamp DESC LIMIT 10",
+    "SELECT id FROM interaction WHERE confidence_score < 60 OR flagged_for_review = 1 ORDER BY timestamp DESC LIMIT 50",
+    "SELECT COUNT(*) FROM interaction WHERE intent_detected = 'general_ai'",
+    "SELECT COUNT(*) FROM interaction WHERE region = 'WhatsApp' AND timestamp > datetime('now', '-1 day')",
+]
+
+
+def connect(path, profile):
+    # Same lock wait init_db configures; pysqlite's default (5s) for the legacy profile
+    timeout = profile["busy_timeout"] / 1000.0 if profile["busy_timeout"] is not None else 5.0
+    conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+    apply_storage_profile(conn, profile)
+    return conn
+
+
+def setup(path, profile, indexes, seed_rows):
+    engine = create_engine(f"sqlite:///{path}")
+    db.metadata.create_all(engine)
+    engine.dispose()
+
+    conn = connect(path, profile)
+    if not indexes:
+        for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='index' AND name LIKE 'ix_interaction_%'").fetchall():
+            conn.execute(f"DROP INDEX {name}")
+    conn.execute("INSERT INTO user (user_identifier, first_seen, last_seen) VALUES ('bench', datetime('now'), datetime('now'))")
+    now = datetime.utcnow()
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO interaction (user_id, user_message, bot_response, intent_detected, confidence_score, region, sentiment, timestamp, flagged_for_review)"
+        " VALUES (1, ?, ?, ?, ?, ?, 'neutral', ?, ?)",
+        [
+            ("dengue", "<div>card</div>", random.choice(INTENTS), random.choice([0.0, 0.5, 1.0]),
+             random.choice([None, "WhatsApp"]), now - timedelta(seconds=i * 30), random.random() < 0.01)
+            for i in range(seed_rows)
+        ],
+    )
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def writer(path, profile, deadline, results):
+    ok = errors = 0
+    conn = connect(path, profile)
+    while time.time() < deadline:
+        try:
+            conn.execute(
+                "INSERT INTO interaction (user_id, user_message, bot_response, intent_detected, confidence_score, region, sentiment, timestamp, flagged_for_review)"
+                " VALUES (1, 'what is malaria', '<div>card</div>', ?, 1.0, NULL, 'neutral', ?, 0)",
+                (random.choice(INTENTS), datetime.utcnow()),
+            )
+            ok += 1
+        except sqlite3.OperationalError:
+            errors += 1 # "database is locked"
+    results.put(("write", ok, errors))
+
+
+def reader(path, profile, deadline, results):
+    conn = connect(path, profile)
+    ok = errors = 0
+    while time.time() < deadline:
+        try:
+            for q in READ_QUERIES:
+                conn.execute(q).fetchall()
+            ok += 1
+        except sqlite3.OperationalError:
+            errors += 1
+    results.put(("read", ok, errors))
+
+
+def run(label, profile, indexes, writers, readers, seconds, seed_rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        setup(path, profile, indexes, seed_rows)
+
+        results = multiprocessing.Queue()
+        deadline = time.time() + 1 + seconds # 1s for process start-up
+        procs = [multiprocessing.Process(target=writer, args=(path, profile, deadline, results)) for _ in range(writers)]
+        procs += [multiprocessing.Process(target=reader, args=(path, profile, deadline, results)) for _ in range(readers)]
+        for p in procs:
+            p.start()
+        totals = {"write": [0, 0], "read": [0, 0]}
+        for _ in procs:
+            kind, ok, errors = results.get()
+            totals[kind][0] += ok
+            totals[kind][1] += errors
+        for p in procs:
+            p.join()
+
+    print(f"{label:28} writes/s {totals['write'][0] / seconds:9.1f}  (locked {totals['write'][1]:6})"
+          f"   dashboard reads/s {totals['read'][0] / seconds:8.1f}  (locked {totals['read'][1]:6})")
+
+
+def main():
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+    seed_rows = int(sys.argv[4]) if len(sys.argv) > 4 else 100000
+
+    print(f"{writers} writer + {readers} reader processes, {seconds:.0f}s each, {seed_rows} seeded interactions\n")
+    run("before: legacy, no indexes", STORAGE_PROFILES["legacy"], False, writers, readers, seconds, seed_rows)
+    run("after: wal + indexes", STORAGE_PROFILES["wal"], True, writers, readers, seconds, seed_rows)
+    run("after: durable + indexes", STORAGE_PROFILES["durable"], True, writers, readers, seconds, seed_rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: worker start-up - knowledge-base load and `import app`.
+
+  legacy    pandas.read_csv + iterrows over every source file (the loader
+            knowledge_base.py used before the snapshot), including the
+            pandas import itself
+  cold      csv-module build of the KnowledgeBase + indexes (no snapshot yet)
+  warm      load of a current snapshot (the normal worker start-up)
+
+Every measurement runs in a fresh interpreter, like a freshly started
+gunicorn worker, against throwaway copies of the database and cache.
+
+Usage: python benchmarks/bench_startup.py [runs]
+"""
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+LANGUAGES = ["Hindi", "Tamil", "Odia"]
+
+LEGACY_LOAD = """
+import time
+started = time.perf_counter()
+import pandas as pd
+from knowledge_base import source_paths
+
+def read_descriptions(path):
+    df = pd.read_csv(path)
+    return [(str(row.iloc[0]).strip().lower(), str(row.iloc[1]) if pd.notna(row.iloc[1]) else None)
+            for index, row in df.iterrows()]
+
+def read_precautions(path):
+    df = pd.read_csv(path)
+    return [(str(row.iloc[0]).strip().lower(), [str(x) for x in row.iloc[1:] if pd.notna(x) and str(x).strip() != ""])
+            for index, row in df.iterrows()]
+
+for path in source_paths(%r):
+    if path.endswith(".csv"):
+        (read_precautions if "precaution" in path else read_descriptions)(path)
+from topic_index import TopicIndex, FuzzyIndex, TOPIC_ALIASES
+print((time.perf_counter() - started) * 1000)
+""" % (LANGUAGES,)
+
+KB_LOAD = """
+import time
+started = time.perf_counter()
+from knowledge_base import KnowledgeStore
+KnowledgeStore(%r).load()
+print((time.perf_counter() - started) * 1000)
+""" % (LANGUAGES,)
+
+IMPORT_APP = """
+import time
+started = time.perf_counter()
+import app
+print((time.perf_counter() - started) * 1000)
+"""
+
+
+def measure(code, env):
+    """(ms reported by the snippet, ms for the whole process incl. interpreter start)"""
+    started = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    total = (time.perf_counter() - started) * 1000
+    return float(out.strip().splitlines()[-1]), total
+
+
+def run(label, code, env, runs, snapshot=None, keep_snapshot=True):
+    inner, total = [], []
+    for _ in range(runs):
+        if snapshot and not keep_snapshot and os.path.exists(snapshot):
+            os.remove(snapshot)
+        i, t = measure(code, env)
+        inner.append(i)
+        total.append(t)
+    print(f"{label:28} {statistics.median(inner):8.1f} ms   process {statistics.median(total):8.1f} ms")
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    tmp = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(tmp, "database.db")
+        shutil.copy(os.path.join(BASE_DIR, "database.db"), db_path)
+        snapshot = os.path.join(tmp, "kb_snapshot.pickle")
+        env = dict(os.environ, DATABASE_PATH=db_path, CACHE_DB_PATH=os.path.join(tmp, "cache.db"),
+                   KB_SNAPSHOT_PATH=snapshot)
+
+        print(f"median of {runs} fresh interpreters\n")
+        print("knowledge base load")
+        run("  legacy (pandas iterrows)", LEGACY_LOAD, env, runs)
+        run("  cold (csv, no snapshot)", KB_LOAD, env, runs, snapshot, keep_snapshot=False)
+        run("  warm (snapshot)", KB_LOAD, env, runs, snapshot)
+        print("\nimport app")
+        run("  cold (no snapshot)", IMPORT_APP, env, runs, snapshot, keep_snapshot=False)
+        run("  warm (snapshot)", IMPORT_APP, env, runs, snapshot)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
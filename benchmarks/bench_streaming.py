@@ -0,0 +1,82 @@
+"""
+Benchmark: time to first visible text for an AI definition.
+
+Serves the chat app on a local port with Groq replaced by the streaming stub
+and compares /get_response (whole card after the completion finishes) with
+/get_response/stream (first token relayed over SSE). The AI cache is cleared
+before every request so each one goes upstream.
+
+Usage: python benchmarks/bench_streaming.py [requests] [first_byte_latency] [token_delay]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ["CACHE_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "cache.db")
+os.environ.setdefault("GROQ_API_KEY", "bench")
+
+import requests
+from werkzeug.serving import make_server
+
+import groq_service
+from stub_servers import GroqStub
+
+QUESTION = {"msg": "what is a virus", "lang": "English"}
+
+
+def time_json(base):
+    started = time.perf_counter()
+    requests.post(base + "/get_response", data=QUESTION).json()
+    elapsed = (time.perf_counter() - started) * 1000
+    return elapsed, elapsed
+
+
+def time_stream(base):
+    started = time.perf_counter()
+    first = None
+    with requests.post(base + "/get_response/stream", data=QUESTION, stream=True) as response:
+        for line in response.iter_lines(decode_unicode=True):
+            if first is None and line.startswith("event:") and line != "event: done":
+                first = (time.perf_counter() - started) * 1000
+    return first, (time.perf_counter() - started) * 1000
+
+
+def run(label, measure, base, n):
+    firsts, totals = [], []
+    for _ in range(n):
+        groq_service.ai_definition_cache.clear()
+        first, total = measure(base)
+        firsts.append(first)
+        totals.append(total)
+    print(f"{label:24} first text p50 {statistics.median(firsts):7.1f} ms   complete p50 {statistics.median(totals):7.1f} ms")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.25
+    token_delay = float(sys.argv[3]) if len(sys.argv) > 3 else 0.03
+
+    with GroqStub(latency=latency, token_delay=token_delay) as stub:
+        groq_service.API_KEY = groq_service.API_KEY or "bench"
+        groq_service.llm_client.api_url = stub.url
+        import app as chat_app
+
+        server = make_server("127.0.0.1", 0, chat_app.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_port}"
+
+        print(f"\n{n} requests, {latency * 1000:.0f} ms to first token, {token_delay * 1000:.0f} ms per word\n")
+        run("before: /get_response", time_json, base, n)
+        run("after: SSE stream", time_stream, base, n)
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: compiled TopicIndex vs the legacy alias-replace + linear scan
+that find_topic_info used, on the full symptom_Description.csv topic set.
+
+Usage: python benchmarks/bench_topic_index.py [rounds]
+"""
+import csv
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from topic_index import TopicIndex, TOPIC_ALIASES
+
+LEGACY_ALIASES = dict(TOPIC_ALIASES, **{"chicken pox": "chicken pox"})
+
+QUERIES = [
+    "dengue",
+    "what are the precautions for malaria",
+    "my child has chickenpox what to do",
+    "tell me about high bp and sugar",
+    "Chicken pox (Severe)",
+    "is madras eye contagious",
+    "hello doctor I have been having a headache and some body pain since two days, my neighbour had typhoid last week",
+    "what is a virus",
+    "i feel tired all the time and my legs hurt when i walk a long distance in the evening after work",
+    "piles",
+]
+
+
+def load_topics():
+    path = os.path.join(BASE_DIR, "MasterData", "symptom_Description.csv")
+    topics = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if len(row) >= 2:
+                topics[row[0].strip().lower()] = row[1]
+    return list(topics.keys())
+
+
+def legacy_match(text, disease_list):
+    text = text.lower()
+    for alias, canonical in LEGACY_ALIASES.items():
+        if alias in text:
+            text = text.replace(alias, canonical)
+    for disease in disease_list:
+        if disease in text:
+            return disease
+    return None
+
+
+def timeit(fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for q in QUERIES:
+            fn(q)
+    return (time.perf_counter() - start) / (rounds * len(QUERIES))
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    disease_list = load_topics()
+
+    start = time.perf_counter()
+    index = TopicIndex(disease_list, TOPIC_ALIASES)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    print(f"Topics: {len(disease_list)} | Patterns: {index.size} | Index build: {build_ms:.1f} ms")
+    print(f"{'Query':60} {'legacy':>22} {'indexed':>22}")
+    for q in QUERIES:
+        print(f"{q[:58]:60} {str(legacy_match(q, disease_list))[:22]:>22} {str(index.best_match(q))[:22]:>22}")
+
+    legacy = timeit(lambda q: legacy_match(q, disease_list), rounds)
+    indexed = timeit(index.best_match, rounds)
+    print()
+    print(f"Legacy scan : {legacy * 1e6:8.1f} us/lookup")
+    print(f"TopicIndex  : {indexed * 1e6:8.1f} us/lookup")
+    print(f"Speedup     : {legacy / indexed:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: generate_translations, legacy sequential loop vs the concurrent pipeline.
+
+Both translate the first N rows of symptom_precaution.csv into Hindi, Tamil
+and Odia against the local Google Translate stub (fixed latency per
+request), from an empty output directory.
+
+  legacy    one request per cell on a fresh connection (a new GoogleTranslator
+            per cell), the whole CSV rewritten every 5 translated rows
+  pipeline  TranslationPipeline: translation memory (each unique string once
+            per language), pooled client, batched requests, concurrent
+            languages/batches under the token bucket
+  cms edit  the pipeline again after one row of the source was edited: only
+            the new text goes upstream
+
+Usage: python benchmarks/bench_translation_pipeline.py [rows] [latency] [concurrency] [rate]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+
+from generate_translations import (
+    LANGUAGES, GoogleBackend, TranslationPipeline, read_csv, save_csv, needs_translation,
+)
+from stub_servers import TranslateStub
+
+FILENAME = "symptom_precaution.csv"
+COLS = [1, 2, 3, 4]
+
+
+def legacy(src_dir, out_dir, stub_url):
+    """The pre-pipeline process_file loop, with the translator pointed at the stub."""
+    header, rows = read_csv(os.path.join(src_dir, FILENAME))
+    for lang_name, lang_code in LANGUAGES.items():
+        target = [list(row) for row in rows]
+        save_path = os.path.join(out_dir, FILENAME.replace(".csv", f"_{lang_name}.csv"))
+        translated_rows = 0
+        for row in target:
+            row_changed = False
+            for c in COLS:
+                if needs_translation(row[c]):
+                    response = requests.get(stub_url, params={"sl": "auto", "tl": lang_code, "q": row[c]}, timeout=10)
+                    response.raise_for_status()
+                    row[c] = response.text
+                    row_changed = True
+            if row_changed:
+                translated_rows += 1
+                if translated_rows % 5 == 0:
+                    save_csv(header, target, save_path)
+        save_csv(header, target, save_path)
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.15
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    rate = float(sys.argv[4]) if len(sys.argv) > 4 else 10
+
+    tmp = tempfile.mkdtemp()
+    try:
+        src_dir = os.path.join(tmp, "src")
+        os.makedirs(src_dir)
+        header, rows = read_csv(os.path.join(BASE_DIR, "MasterData", FILENAME))
+        save_csv(header, rows[:n_rows], os.path.join(src_dir, FILENAME))
+        cells = sum(needs_translation(row[c]) for row in rows[:n_rows] for c in COLS) * len(LANGUAGES)
+
+        with TranslateStub(latency=latency) as stub:
+            print(f"{n_rows} rows x {len(LANGUAGES)} languages = {cells} cells, {latency * 1000:.0f} ms per request\n")
+
+            os.makedirs(os.path.join(tmp, "legacy"))
+            before = len(stub.requests)
+            started = time.perf_counter()
+            legacy(src_dir, os.path.join(tmp, "legacy"), stub.url)
+            elapsed = time.perf_counter() - started
+            print(f"legacy     {elapsed:7.1f} s   {len(stub.requests) - before:5} requests   {cells / elapsed:7.1f} cells/s")
+
+            before = len(stub.requests)
+            started = time.perf_counter()
+            pipeline = TranslationPipeline(GoogleBackend(url=stub.url), concurrency=concurrency, rate=rate,
+                                           source_dir=src_dir, target_dir=os.path.join(tmp, "pipeline"),
+                                           memory_dir=os.path.join(tmp, "memory"))
+            stats = pipeline.run([(FILENAME, COLS)])
+            elapsed = time.perf_counter() - started
+            print(f"\npipeline   {elapsed:7.1f} s   {len(stub.requests) - before:5} requests   {cells / elapsed:7.1f} cells/s"
+                  f"   ({stats['unique_strings']} unique strings, {concurrency} threads, {rate:.0f} req/s limit)\n")
+
+            rows = [list(row) for row in rows[:n_rows]]
+            rows[0][1] = "Wear a mask in crowded places"
+            save_csv(header, rows, os.path.join(src_dir, FILENAME))
+            before = len(stub.requests)
+            started = time.perf_counter()
+            stats = pipeline.run([(FILENAME, COLS)])
+            pipeline.translator.close()
+            elapsed = time.perf_counter() - started
+            print(f"\ncms edit   {elapsed:7.1f} s   {len(stub.requests) - before:5} requests   "
+                  f"{stats['to_translate']} strings translated")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+"""
+production_entry.application with deep-translator pointed at the Google
+Translate stub (GOOGLE_TRANSLATE_URL), for load tests; production keeps
+deep-translator's hardcoded endpoint.
+
+    GOOGLE_TRANSLATE_URL=http://127.0.0.1:8001/m gunicorn benchmarks.stub_entry:application
+"""
+import os
+
+from deep_translator.constants import BASE_URLS
+
+# GoogleTranslator reads its base URL from here each time one is created
+BASE_URLS["GOOGLE_TRANSLATE"] = os.environ["GOOGLE_TRANSLATE_URL"]
+
+from production_entry import application  # noqa: E402
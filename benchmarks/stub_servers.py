@@ -0,0 +1,256 @@
+"""
+Local stand-ins for the external services the chatbot calls, for benchmarks
+and manual testing without network access or API quota.
+
+    from stub_servers import GroqStub
+    with GroqStub(latency=0.2, fail_first=2, fail_status=429) as groq:
+        os.environ["GROQ_API_URL"] = groq.url   # before importing groq_service
+
+Run directly to serve a stub on a fixed port:
+    python benchmarks/stub_servers.py groq 8901
+    python benchmarks/stub_servers.py translate 8902
+    python benchmarks/stub_servers.py rss 8903
+"""
+import html
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_ANSWER = (
+    "**Virus** is a tiny infectious agent that multiplies only inside living cells.\n"
+    "1. Wash hands regularly.\n2. Stay up to date with vaccinations.\n"
+    "3. Avoid close contact with sick people.\nThis is for information only."
+)
+
+
+class StubServer:
+    """Threaded HTTP server on 127.0.0.1 with a random free port; usable as a context manager."""
+
+    handler_class = BaseHTTPRequestHandler
+
+    def __init__(self, latency=0.0, port=0):
+        self.latency = latency
+        self.requests = []  # (method, path, headers) in arrival order
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(self.handler_class):
+            server_stub = stub
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def record(self, handler):
+        with self._lock:
+            self.requests.append((handler.command, handler.path, dict(handler.headers)))
+            return len(self.requests)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _GroqHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # keep-alive, like the real endpoint
+
+    def do_POST(self):
+        stub = self.server_stub
+        n = stub.record(self)
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        payload = json.loads(body or b"{}")
+        time.sleep(stub.latency)
+
+        if n <= stub.fail_first:
+            data = json.dumps({"error": {"message": "stub failure"}}).encode()
+            self.send_response(stub.fail_status)
+            if stub.retry_after is not None:
+                self.send_header("Retry-After", str(stub.retry_after))
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        if payload.get("stream"):
+            self._stream(stub, payload, n)
+            return
+        time.sleep(stub.token_delay * len(stub.answer.split(" "))) # generation time
+
+        data = json.dumps({
+            "id": f"stub-{n}",
+            "object": "chat.completion",
+            "model": payload.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": stub.answer}, "finish_reason": "stop"}],
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+    def _stream(self, stub, payload, n):
+        """SSE chunks like Groq's "stream": true, one word per `token_delay` seconds."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        words = stub.answer.split(" ")
+        for i, word in enumerate(words):
+            chunk = {
+                "id": f"stub-{n}",
+                "object": "chat.completion.chunk",
+                "model": payload.get("model", "stub"),
+                "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(stub.token_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+class GroqStub(StubServer):
+    """
+    OpenAI-compatible /chat/completions stub.
+    `latency` is the time to first byte; the answer is then generated at one
+    word every `token_delay` seconds (streamed word by word with "stream": true).
+    The first `fail_first` requests get `fail_status` (with Retry-After if set).
+    """
+
+    handler_class = _GroqHandler
+
+    def __init__(self, latency=0.0, answer=DEFAULT_ANSWER, fail_first=0, fail_status=503, retry_after=None,
+                 token_delay=0.0, port=0):
+        super().__init__(latency, port)
+        self.answer = answer
+        self.token_delay = token_delay
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+
+    @property
+    def url(self):
+        return super().url + "/openai/v1/chat/completions"
+
+
+class _TranslateHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        stub = self.server_stub
+        stub.record(self)
+        params = parse_qs(urlparse(self.path).query)
+        time.sleep(stub.latency)
+        text = params.get("q", [""])[0]
+        target = params.get("tl", ["en"])[0]
+        # Same markup as translate.google.com/m; each line of the "translation" is tagged with the
+        # target language unless the glossary has a real translation for it
+        translated = "\n".join(stub.glossary.get(line) or f"[{target}] {line}" for line in text.split("\n"))
+        data = f'<html><body><div class="result-container">{html.escape(translated)}</div></body></html>'.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class TranslateStub(StubServer):
+    """
+    Google Translate mobile page (/m?sl=..&tl=..&q=..) stub; set GOOGLE_TRANSLATE_URL to .url.
+    `glossary` maps source lines to fixed translations (e.g. "डेंगू" -> "dengue").
+    """
+
+    handler_class = _TranslateHandler
+
+    def __init__(self, latency=0.0, glossary=None, port=0):
+        super().__init__(latency, port)
+        self.glossary = dict(glossary or {})
+
+    @property
+    def url(self):
+        return super().url + "/m"
+
+
+RSS_ITEMS = [
+    ("Dengue outbreak reported in coastal districts", "Tue, 14 Oct 2025 09:00:00 GMT"),
+    ("Malaria alert issued after heavy rains", "Mon, 13 Oct 2025 08:30:00 GMT"),
+    ("New vaccination drive announced", "Sun, 12 Oct 2025 07:15:00 GMT"),
+]
+
+
+class _RssHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        stub = self.server_stub
+        stub.record(self)
+        time.sleep(stub.latency)
+        if self.headers.get("If-None-Match") == stub.etag:
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        items = "".join(
+            f"<item><title>{html.escape(title)}</title><link>{stub.url}/{i}</link><pubDate>{published}</pubDate></item>"
+            for i, (title, published) in enumerate(stub.items)
+        )
+        data = (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>Stub Health Feed</title>'
+                f"<link>{stub.url}</link><description>stub</description>{items}</channel></rss>").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/rss+xml")
+        self.send_header("ETag", stub.etag)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class RssStub(StubServer):
+    """RSS 2.0 outbreak feed with an ETag (answers 304 to a matching If-None-Match); set ALERT_FEEDS to .url."""
+
+    handler_class = _RssHandler
+
+    def __init__(self, latency=0.0, items=RSS_ITEMS, port=0):
+        super().__init__(latency, port)
+        self.items = list(items)
+        self.etag = '"stub-feed-1"'
+
+    @property
+    def url(self):
+        return super().url + "/rss.xml"
+
+
+STUBS = {"groq": GroqStub, "translate": TranslateStub, "rss": RssStub}
+
+if __name__ == "__main__":
+    kind = sys.argv[1] if len(sys.argv) > 1 else "groq"
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8901
+    stub = STUBS[kind](port=port).start()
+    print(f"{kind} stub listening on {stub.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()
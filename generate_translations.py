@@ -1,7 +1,34 @@
+"""
+Builds the pre-translated knowledge-base CSVs in static/data.
+
+All languages and cells are translated concurrently by a thread pool that
+shares one token bucket (TRANSLATE_RATE requests/second), and short cells
+are sent in batches of newline-separated lines, so one request covers many
+cells. Translations live in a translation memory per language
+(translation_memory/<Language>.jsonl) keyed by a hash of the English text:
+each unique string is translated once and reused across rows, files and
+CMS uploads, and an interrupted run resumes from it. The CSVs are written
+from the memory once, at the end.
+
+    python generate_translations.py                  # Google Translate
+    python generate_translations.py --fake --target-dir /tmp/out   # local fake translator
+    python generate_translations.py --stats          # total cells vs unique strings
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
 import os
-import pandas as pd
-from deep_translator import GoogleTranslator
+import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import httpx
+from bs4 import BeautifulSoup
+
+from shared.rate_limit import TokenBucket
 
 # CONFIG
 LANGUAGES = {
@@ -13,100 +40,407 @@ LANGUAGES = {
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 SOURCE_DIR = os.path.join(BASE_DIR, "MasterData")
 TARGET_DIR = os.path.join(BASE_DIR, "static", "data")
+MEMORY_DIR = os.getenv("TRANSLATION_MEMORY_DIR", os.path.join(BASE_DIR, "translation_memory"))
 
-if not os.path.exists(TARGET_DIR):
-    os.makedirs(TARGET_DIR)
+GOOGLE_TRANSLATE_URL = os.getenv("GOOGLE_TRANSLATE_URL", "https://translate.google.com/m")
+TRANSLATE_TIMEOUT = float(os.getenv("TRANSLATE_TIMEOUT", "10"))
+TRANSLATE_CONCURRENCY = int(os.getenv("TRANSLATE_CONCURRENCY", "8"))
+TRANSLATE_RATE = float(os.getenv("TRANSLATE_RATE", "5"))          # Requests/second, all threads together
+TRANSLATE_BURST = int(os.getenv("TRANSLATE_BURST", "10"))
+TRANSLATE_BATCH_CHARS = int(os.getenv("TRANSLATE_BATCH_CHARS", "1800")) # Per request (the /m page is a GET)
+TRANSLATE_RETRIES = 3
 
-def translate_text(text, target_lang_code):
-    if not text or pd.isna(text): return ""
-    try:
-        # Retry logic
-        for attempt in range(3):
+
+class BatchMismatch(Exception):
+    """The backend didn't return one line per cell; the batch is retried cell by cell."""
+
+
+# --- BACKENDS (translate_batch(texts, target) -> translations, same order) ---
+class GoogleBackend:
+    """The translate.google.com/m page deep-translator scrapes, over one pooled HTTP client."""
+
+    def __init__(self, url=GOOGLE_TRANSLATE_URL, timeout=TRANSLATE_TIMEOUT, max_batch_chars=TRANSLATE_BATCH_CHARS):
+        self.url = url
+        self.max_batch_chars = max_batch_chars
+        self.requests = 0
+        self._client = httpx.Client(timeout=timeout, headers={"User-Agent": "Mozilla/5.0"})
+
+    def translate_batch(self, texts, target):
+        self.requests += 1
+        response = self._client.get(self.url, params={"sl": "en", "tl": target, "q": "\n".join(texts)})
+        response.raise_for_status()
+        soup = BeautifulSoup(response.text, "html.parser")
+        element = soup.find("div", {"class": "t0"}) or soup.find("div", {"class": "result-container"})
+        if element is None:
+            raise ValueError(f"No translation found for: {texts[0][:50]}")
+        text = element.get_text().strip()
+        if len(texts) == 1:
+            return [text]
+        lines = [line.strip() for line in text.split("\n")]
+        if len(lines) != len(texts):
+            raise BatchMismatch(f"{len(texts)} cells, {len(lines)} lines")
+        return lines
+
+    def close(self):
+        self._client.close()
+
+
+class FakeTranslator:
+    """Local stand-in for tests and benchmarks: "[<target>] text" after `latency` seconds per request."""
+
+    def __init__(self, latency=0.0, max_batch_chars=TRANSLATE_BATCH_CHARS, fail_rate=0.0):
+        self.latency = latency
+        self.max_batch_chars = max_batch_chars
+        self.fail_rate = fail_rate
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def translate_batch(self, texts, target):
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency)
+        if self.fail_rate and random.random() < self.fail_rate:
+            raise ConnectionError("fake translator failure")
+        return [f"[{target}] {text}" for text in texts]
+
+    def close(self):
+        pass
+
+
+# --- CSV ---
+def read_csv(path):
+    """(header, rows) with every row padded to the header width."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        rows = [row + [""] * (len(header) - len(row)) for row in reader if row]
+    return header, rows
+
+def save_csv(header, rows, path):
+    """Write-then-rename, so the chatbot's knowledge-base reload never reads a partial file."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(header)
+    writer.writerows(rows)
+    with open(path + ".tmp", "w", newline="", encoding="utf-8") as f:
+        f.write(buffer.getvalue())
+    os.replace(path + ".tmp", path)
+
+def needs_translation(text):
+    return len(text) > 1 and not text.isdigit()
+
+def normalize_source(text):
+    return " ".join(text.split())
+
+def source_key(text):
+    """Translation-memory key: hash of the English text, whitespace-normalized."""
+    return hashlib.sha1(normalize_source(text).encode("utf-8")).hexdigest()[:16]
+
+
+# --- TRANSLATION MEMORY ---
+class TranslationMemory:
+    """
+    Append-only store of one language's translations, keyed by a hash of the
+    English source text: one JSON line {"h": key, "t": translation} each.
+    Every file, row and upload with the same text shares one entry, so a
+    phrase is translated once per language and after a CMS edit only new or
+    changed text goes upstream. Later lines win; a torn last line (an
+    interrupted run) is ignored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._file = None
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        self.entries = {}
+        if self.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.entries[entry["h"]] = entry["t"]
+        return self
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def add(self, entries):
+        """entries: [(key, translation)], appended and flushed together."""
+        lines = "".join(json.dumps({"h": h, "t": t}, ensure_ascii=False) + "\n" for h, t in entries)
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(lines)
+            self._file.flush()
+            self.entries.update(entries)
+
+    def compact(self):
+        """Rewrites the file with one line per key (atomically)."""
+        self.close()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            for h, t in self.entries.items():
+                f.write(json.dumps({"h": h, "t": t}, ensure_ascii=False) + "\n")
+        os.replace(self.path + ".tmp", self.path)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class _Source:
+    """One MasterData CSV and the columns to translate."""
+
+    def __init__(self, filename, path, cols):
+        self.filename, self.cols = filename, cols
+        self.header, self.rows = read_csv(path)
+
+    def cells(self):
+        """(row, col, text) of every cell that needs a translation."""
+        for r, row in enumerate(self.rows):
+            for c in self.cols:
+                if c < len(row) and needs_translation(row[c]):
+                    yield r, c, row[c]
+
+    def output_path(self, target_dir, lang_name):
+        return os.path.join(target_dir, self.filename.replace(".csv", f"_{lang_name}.csv"))
+
+    def seed_memory(self, memory, target_dir, lang_name):
+        """First run with a memory: keep what the old script already translated into the CSV."""
+        path = self.output_path(target_dir, lang_name)
+        if not os.path.exists(path):
+            return
+        _, existing = read_csv(path)
+        if len(existing) != len(self.rows):
+            print(f"    (Length mismatch in {os.path.basename(path)}, starting over)")
+            return
+        seeded = {}
+        for r, c, text in self.cells():
+            old = existing[r][c] if c < len(existing[r]) else ""
+            if old not in ("", text):
+                seeded.setdefault(source_key(text), old)
+        if seeded:
+            memory.add(seeded.items())
+            print(f"  > {lang_name}: {len(seeded)} translations imported from {os.path.basename(path)}")
+
+    def write(self, memory, target_dir, lang_name):
+        """Source rows with every remembered translation filled in; the rest stays English."""
+        rows = [list(row) for row in self.rows]
+        for r, c, text in self.cells():
+            translated = memory.get(source_key(text))
+            if translated is not None:
+                rows[r][c] = translated
+        save_csv(self.header, rows, self.output_path(target_dir, lang_name))
+
+
+def batches(items, max_chars):
+    """Groups (key, text) items into requests of up to max_chars; multi-line texts always go alone."""
+    batch, size = [], 0
+    for item in items:
+        text = item[1]
+        if "\n" in text:
+            yield [item]
+            continue
+        if batch and size + len(text) + 1 > max_chars:
+            yield batch
+            batch, size = [], 0
+        batch.append(item)
+        size += len(text) + 1
+    if batch:
+        yield batch
+
+
+# --- PIPELINE ---
+class TranslationPipeline:
+    """
+    Translates CSV columns into every language concurrently. Each unique
+    source string is looked up in the language's TranslationMemory and only
+    the missing ones are sent. Requests from all threads share one token
+    bucket; failures are retried with backoff and strings that still fail
+    stay English (and are retried on the next run).
+    """
+
+    def __init__(self, translator=None, languages=LANGUAGES, concurrency=TRANSLATE_CONCURRENCY,
+                 rate=TRANSLATE_RATE, burst=TRANSLATE_BURST, source_dir=SOURCE_DIR, target_dir=TARGET_DIR,
+                 memory_dir=MEMORY_DIR):
+        self.translator = translator or GoogleBackend()
+        self.languages = languages
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate, burst)
+        self.source_dir = source_dir
+        self.target_dir = target_dir
+        self.memory_dir = memory_dir
+        self._stats_lock = threading.Lock()
+        self.stats = {}
+
+    def _count(self, stat, n=1):
+        with self._stats_lock:
+            self.stats[stat] += n
+
+    def memory(self, lang_name):
+        return TranslationMemory(os.path.join(self.memory_dir, f"{lang_name}.jsonl")).load()
+
+    def _request(self, texts, target):
+        for attempt in range(TRANSLATE_RETRIES):
+            self.bucket.acquire()
+            self._count("requests")
             try:
-                translator = GoogleTranslator(source='auto', target=target_lang_code)
-                res = translator.translate(str(text))
-                return res
-            except Exception as e:
-                time.sleep(1)
-                if attempt == 2: print(f"Failed to translate '{text[:20]}...': {e}")
-        return text
-    except Exception as e:
-        return text
-
-def process_file(filename, cols_to_translate):
-    src_path = os.path.join(SOURCE_DIR, filename)
-    if not os.path.exists(src_path):
-        print(f"Skipping {filename} (Not found)")
-        return
-
-    print(f"Processing {filename}...")
-    df = pd.read_csv(src_path)
-
-    for lang_name, lang_code in LANGUAGES.items():
-        output_filename = filename.replace(".csv", f"_{lang_name}.csv")
-        save_path = os.path.join(TARGET_DIR, output_filename)
-        
-        # RESUME LOGIC: Load existing if matches source length, else start fresh/copy
-        target_df = df.copy() # Start with fresh copy
-        
-        # Check if we already have a partial file? 
-        # For simplicity in this script: We will load the EXISTING file if it exists, 
-        # and only translate rows that are still English (or identical to source).
-        # But determining "still English" is tricky. Use a simple checkpoint file or just check equality.
-        
-        if os.path.exists(save_path):
-            print(f"  > Resuming {lang_name}...")
-            existing_df = pd.read_csv(save_path)
-            if len(existing_df) == len(df):
-                target_df = existing_df
-            else:
-                print("    (Length mismatch, starting over)")
-
-        print(f"  > Translating to {lang_name} ({lang_code})...")
-        
-        # Counters
-        translated_count = 0
-        skipped_count = 0
-        
-        for index, row in target_df.iterrows():
-            row_changed = False
-            for col_idx in cols_to_translate:
-                if col_idx < len(row):
-                    original_en = str(df.iat[index, col_idx]) # Source Truth
-                    current_val = str(target_df.iat[index, col_idx])
-                    
-                    # If current value is same as English source (and source isn't empty), it needs translation
-                    # (Unless the word is actually same in both langs, but we assume it needs translation)
-                    if current_val == original_en and len(original_en) > 1 and not current_val.isdigit():
-                        translated = translate_text(original_en, lang_code)
-                        if translated != current_val:
-                            target_df.iat[index, col_idx] = translated
-                            row_changed = True
-                    else:
-                        pass # Already translated or empty
-
-            if row_changed:
-                translated_count += 1
-                # Save every 5 rows to prevent data loss
-                if translated_count % 5 == 0:
-                    target_df.to_csv(save_path, index=False)
-                    print(f"    Translated {index}/{len(df)} rows... (Saved)", end='\r')
-            else:
-                skipped_count += 1
-                if index % 50 == 0:
-                     print(f"    Skipping {index}/{len(df)} (Already done)...", end='\r')
-
-        target_df.to_csv(save_path, index=False)
-        print(f"\n    Finished {output_filename}. (Translated: {translated_count}, Skipped: {skipped_count})")
+                return self.translator.translate_batch(texts, target)
+            except BatchMismatch:
+                raise
+            except Exception:
+                if attempt == TRANSLATE_RETRIES - 1:
+                    raise
+                self._count("retries")
+                time.sleep(2 ** attempt + random.random()) # Backoff with jitter
 
-if __name__ == "__main__":
-    # Symptom Description: Col 0 = Disease, Col 1 = Description
-    # We only translate Description (Col 1) usually, but for offline lookup we might want Disease name too?
-    # Actually, for lookup, we still search by English name usually (or we need a map).
-    # Let's translate Description (1)
-    process_file("symptom_Description.csv", [1])
+    def _translate_batch(self, memory, lang_code, batch):
+        """Translates one batch of (key, text) into the memory; returns how many strings were done."""
+        texts = [text for _, text in batch]
+        try:
+            try:
+                results = self._request(texts, lang_code)
+            except BatchMismatch:
+                self._count("batch_splits")
+                results = [self._request([text], lang_code)[0] for text in texts]
+        except Exception as e:
+            self._count("failed", len(batch))
+            print(f"Failed to translate {len(batch)} strings into {lang_code} ('{texts[0][:20]}...'): {e}")
+            return 0
+        memory.add([(key, translated) for (key, _), translated in zip(batch, results)])
+        self._count("translated", len(batch))
+        return len(batch)
 
+    def _sources(self, jobs):
+        sources = []
+        for filename, cols in jobs:
+            src_path = os.path.join(self.source_dir, filename)
+            if not filename.endswith(".csv"):
+                print(f"Skipping {filename} (Nothing to translate)")
+                continue
+            if not os.path.exists(src_path):
+                print(f"Skipping {filename} (Not found)")
+                continue
+            print(f"Processing {filename}...")
+            sources.append(_Source(filename, src_path, cols))
+        return sources
+
+    def run(self, jobs, progress=None):
+        """
+        jobs: [(filename in MasterData, [column indexes])]. Returns the stats.
+        progress(done, total) is called as strings finish (from this thread).
+        """
+        started = time.perf_counter()
+        self.stats = {"cells": 0, "unique_strings": 0, "from_memory": 0, "to_translate": 0, "translated": 0,
+                      "failed": 0, "requests": 0, "batch_splits": 0, "retries": 0}
+        sources = self._sources(jobs)
+        memories, work = {}, []
+        for lang_name, lang_code in self.languages.items():
+            memory = memories[lang_name] = self.memory(lang_name)
+            if not memory.exists():
+                for source in sources:
+                    source.seed_memory(memory, self.target_dir, lang_name)
+            cells = [text for source in sources for _, _, text in source.cells()]
+            unique = {source_key(text): normalize_source(text) for text in cells}
+            todo = [(key, text) for key, text in unique.items() if memory.get(key) is None]
+            print(f"  > {lang_name} ({lang_code}): {len(cells)} cells, {len(unique)} unique strings, "
+                  f"{len(unique) - len(todo)} from memory, {len(todo)} to translate")
+            self._count("cells", len(cells))
+            self._count("unique_strings", len(unique))
+            self._count("from_memory", len(unique) - len(todo))
+            self._count("to_translate", len(todo))
+            work.extend((memory, lang_code, batch) for batch in batches(todo, self.translator.max_batch_chars))
+
+        os.makedirs(self.target_dir, exist_ok=True)
+        if progress:
+            progress(0, self.stats["to_translate"])
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                futures = [pool.submit(self._translate_batch, *item) for item in work]
+                for n, future in enumerate(as_completed(futures), 1):
+                    future.result()
+                    if progress:
+                        progress(self.stats["translated"] + self.stats["failed"], self.stats["to_translate"])
+                    if n % 10 == 0 or n == len(futures):
+                        print(f"    Translated {self.stats['translated']}/{self.stats['to_translate']} strings "
+                              f"({self.stats['requests']} requests)...", end='\r')
+        finally:
+            # Whatever finished is written out, even after an error or Ctrl-C
+            for lang_name, memory in memories.items():
+                for source in sources:
+                    source.write(memory, self.target_dir, lang_name)
+                memory.compact()
+
+        self.stats["seconds"] = round(time.perf_counter() - started, 2)
+        self.stats["rate_limited_seconds"] = self.bucket.stats()["waited_seconds"] # Since the pipeline was created
+        print(f"\n    Finished {len(sources) * len(memories)} files: {self.stats}")
+        return self.stats
+
+
+def dedup_report(jobs, source_dir=SOURCE_DIR):
+    """Per file and overall: cells to translate vs unique strings (what one language costs)."""
+    report, all_keys, total = {}, set(), 0
+    for filename, cols in jobs:
+        path = os.path.join(source_dir, filename)
+        if not os.path.exists(path):
+            continue
+        keys = [source_key(text) for _, _, text in _Source(filename, path, cols).cells()]
+        report[filename] = {"cells": len(keys), "unique_strings": len(set(keys))}
+        all_keys.update(keys)
+        total += len(keys)
+    report["all files"] = {"cells": total, "unique_strings": len(all_keys)}
+    return report
+
+
+def process_file(filename, cols_to_translate, translator=None, progress=None, **options):
+    """Translates one MasterData CSV into every language (the CMS translate job, see job_worker.py)."""
+    pipeline = TranslationPipeline(translator, **options)
+    try:
+        return pipeline.run([(filename, cols_to_translate)], progress)
+    finally:
+        pipeline.translator.close()
+
+
+JOBS = [
+    # Symptom Description: Col 0 = Disease, Col 1 = Description (lookups stay by English name)
+    ("symptom_Description.csv", [1]),
     # Symptom Precaution: Col 0 = Disease, Col 1..4 = Precautions
-    process_file("symptom_precaution.csv", [1, 2, 3, 4])
-    
+    ("symptom_precaution.csv", [1, 2, 3, 4]),
+]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fake", action="store_true", help="use the local fake translator")
+    parser.add_argument("--stats", action="store_true", help="only report total cells vs unique strings")
+    parser.add_argument("--target-dir", default=TARGET_DIR)
+    parser.add_argument("--memory-dir", default=None, help="default: translation_memory, or <target-dir>/memory with --fake")
+    parser.add_argument("--concurrency", type=int, default=TRANSLATE_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=TRANSLATE_RATE)
+    args = parser.parse_args()
+
+    if args.stats:
+        for name, counts in dedup_report(JOBS).items():
+            saved = 1 - counts["unique_strings"] / counts["cells"] if counts["cells"] else 0
+            print(f"{name:26} {counts['cells']:6} cells  {counts['unique_strings']:6} unique strings  ({saved:.0%} fewer translations)")
+        raise SystemExit
+    if args.fake and os.path.abspath(args.target_dir) == TARGET_DIR:
+        parser.error("--fake needs a --target-dir, so it can't overwrite the real translations")
+    memory_dir = args.memory_dir or (os.path.join(args.target_dir, "memory") if args.fake else MEMORY_DIR)
+
+    pipeline = TranslationPipeline(FakeTranslator(latency=0.2) if args.fake else None, concurrency=args.concurrency,
+                                   rate=args.rate, target_dir=args.target_dir, memory_dir=memory_dir)
+    pipeline.run(JOBS)
+    pipeline.translator.close()
+
     print("All translations completed.")
@@ -1,16 +1,92 @@
 
 import os
-import json
-import requests
+import re
+import asyncio
+import hashlib
+import httpx
+from bs4 import BeautifulSoup
 from deep_translator import GoogleTranslator
 from dotenv import load_dotenv
 
+from shared.cache_store import TieredCache
+from shared.single_flight import SingleFlight, AsyncSingleFlight
+from shared import metrics
+from llm_client import LLMClient, AsyncLLMClient
+
 # Load environment variables
 load_dotenv()
 
 # API CONFIG
 API_KEY = os.getenv("GROQ_API_KEY")
-API_URL = "https://api.groq.com/openai/v1/chat/completions"
+API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+
+# Shared, pooled client (timeouts, retries, concurrency limit - see llm_client.py)
+llm_client = LLMClient(API_URL, API_KEY)
+
+# TRANSLATION CACHE (LRU per worker + SQLite shared by all workers)
+translation_cache = TieredCache(
+    "translation",
+    memory_size=int(os.getenv("TRANSLATION_CACHE_MEMORY_SIZE", "2048")),
+    disk_size=int(os.getenv("TRANSLATION_CACHE_DISK_SIZE", "100000")),
+)
+
+# REQUEST COALESCING: identical cache misses in flight at once share one upstream call
+upstream_flight = SingleFlight()
+
+# AI DEFINITION CACHE (same two tiers; entries expire, admin corrections invalidate)
+ai_definition_cache = TieredCache(
+    "ai_definition",
+    memory_size=int(os.getenv("AI_CACHE_MEMORY_SIZE", "512")),
+    disk_size=int(os.getenv("AI_CACHE_DISK_SIZE", "20000")),
+    ttl=int(os.getenv("AI_CACHE_TTL", str(7 * 24 * 3600))),
+    # Other workers see a QC invalidation within this many seconds
+    memory_ttl=int(os.getenv("AI_CACHE_MEMORY_TTL", "60")),
+)
+
+# Question phrasing that doesn't change the answer ("What is a virus?" == "define virus")
+_QUESTION_FILLER = re.compile(r"\b(what is|what's|whats|what are|define|definition of|meaning of|tell me about|please|a|an|the)\b")
+
+# Languages an answer may have been cached in (see translate_message)
+AI_CACHE_LANGUAGES = ["English", "Tamil", "Hindi", "Odia", "Telugu", "Malayalam", "Kannada"]
+
+def normalize_question(text):
+    text = re.sub(r"[^\w\s]", " ", str(text).lower())
+    text = _QUESTION_FILLER.sub(" ", text)
+    return " ".join(text.split())
+
+def _ai_definition_key(question, language):
+    return f"{language.lower()}|{normalize_question(question)}"
+
+def invalidate_ai_definition(question):
+    """
+    Drops the cached AI answer for `question` in every language (used by the QC page).
+    Non-English questions were looked up by their English translation, so that
+    form is dropped too when we still have it cached.
+    """
+    questions = {question}
+    english = translation_cache.get(_translation_key(question, "auto", "en"))
+    if english:
+        questions.add(english)
+    for q in questions:
+        for language in AI_CACHE_LANGUAGES:
+            ai_definition_cache.delete(_ai_definition_key(q, language))
+
+def _translation_key(text, source, target):
+    """Cache key for (normalized text, source language, target language)."""
+    normalized = " ".join(str(text).split())
+    return hashlib.sha256(f"{source.lower()}|{target.lower()}|{normalized}".encode("utf-8")).hexdigest()
+
+def get_translation_cache_stats():
+    return translation_cache.stats()
+
+def get_ai_cache_stats():
+    return ai_definition_cache.stats()
+
+def get_coalescing_stats():
+    return upstream_flight.stats()
+
+def get_async_coalescing_stats():
+    return async_flight.stats()
 
 def get_ai_explanation(disease_name, language="English"):
     """
@@ -23,11 +99,58 @@ def get_ai_explanation(disease_name, language="English"):
         print("Error: GROQ_API_KEY not found in environment variables.")
         return None
 
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
+    cache_key = _ai_definition_key(disease_name, language)
+    cached = ai_definition_cache.get(cache_key)
+    if cached is not None:
+        metrics.cache_hit()
+        return cached
+    return upstream_flight.do(("ai_definition", cache_key), _fetch_ai_explanation, disease_name, language, cache_key)
+
+def get_cached_ai_explanation(disease_name, language="English"):
+    """The cached answer for this question, or None (never calls Groq)."""
+    cached = ai_definition_cache.get(_ai_definition_key(disease_name, language))
+    if cached is not None:
+        metrics.cache_hit()
+    return cached
+
+def stream_ai_explanation(disease_name, language="English"):
+    """
+    Streaming variant of get_ai_explanation: yields the answer as Groq generates it.
+    A cached answer comes out as one chunk; a completed stream is cached.
+    Raises LLMError if the stream can't be started or breaks off.
+    """
+    if not API_KEY:
+        print("Error: GROQ_API_KEY not found in environment variables.")
+        return
+
+    cache_key = _ai_definition_key(disease_name, language)
+    cached = ai_definition_cache.get(cache_key)
+    if cached is not None:
+        metrics.cache_hit()
+        yield cached
+        return
+
+    parts = []
+    with metrics.upstream_call("groq"):
+        for chunk in llm_client.stream_chat_completion(build_explanation_payload(disease_name, language)):
+            parts.append(chunk)
+            yield chunk
+    if parts:
+        ai_definition_cache.set(cache_key, "".join(parts))
+
+def _fetch_ai_explanation(disease_name, language, cache_key):
+    try:
+        with metrics.upstream_call("groq"):
+            answer = llm_client.chat_completion(build_explanation_payload(disease_name, language))
+    except Exception as e:
+        print(f"Groq API Error: {e}")
+        return None
+    if answer:
+        ai_definition_cache.set(cache_key, answer)
+    return answer
+
+def build_explanation_payload(disease_name, language="English"):
+    """Chat-completions request body for a general health definition."""
     prompt = f"""You are Swasthya Sahayak, a public health informational AI.
     The user asked: "{disease_name}".
 
@@ -58,19 +181,32 @@ def get_ai_explanation(disease_name, language="English"):
         "max_tokens": 200
     }
     
-    try:
-        response = requests.post(API_URL, headers=headers, json=data)
-        if response.status_code == 400:
-             print(f"Groq 400 Error Details: {response.text}")
-        response.raise_for_status()
-        result = response.json()
-        return result['choices'][0]['message']['content']
-            
-    except Exception as e:
-        print(f"Groq API Error: {e}")
-        return None
+    return data
+
 
 
+LOCAL_TRANSLATIONS = {
+    "kaichal": "fever",
+    "juram": "fever",
+    "bukhar": "fever",
+    "sardi": "cold",
+    "irumal": "cough",
+    "khansi": "cough",
+    "pet dard": "stomach pain",
+    "vayitru vali": "stomach pain",
+    "sar dard": "headache",
+    "thalai vali": "headache"
+}
+
+# Map friendly names to ISO codes
+LANGUAGE_CODES = {
+    "Tamil": "ta",
+    "Hindi": "hi",
+    "Odia": "or",
+    "Telugu": "te",
+    "Malayalam": "ml",
+    "Kannada": "kn"
+}
 
 def translate_to_english(text, source_language="auto"):
     """
@@ -79,27 +215,25 @@ def translate_to_english(text, source_language="auto"):
     print(f"Translating ({source_language}): {text}...")
     
     # 0. Local Map (Expanded for common tanglish/hinglish)
-    local_map = {
-        "kaichal": "fever",
-        "juram": "fever",
-        "bukhar": "fever",
-        "sardi": "cold",
-        "irumal": "cough",
-        "khansi": "cough",
-        "pet dard": "stomach pain",
-        "vayitru vali": "stomach pain",
-        "sar dard": "headache",
-        "thalai vali": "headache"
-    }
-    
-    if text.lower() in local_map:
-        return local_map[text.lower()]
-        
+    if text.lower() in LOCAL_TRANSLATIONS:
+        return LOCAL_TRANSLATIONS[text.lower()]
+
+    cache_key = _translation_key(text, source_language, "en")
+    cached = translation_cache.get(cache_key)
+    if cached is not None:
+        metrics.cache_hit()
+        return cached
+    return upstream_flight.do(("translation", cache_key), _fetch_translation_to_english, text, cache_key)
+
+def _fetch_translation_to_english(text, cache_key):
     try:
         # Google Translate
         translator = GoogleTranslator(source='auto', target='en')
-        translation = translator.translate(text)
+        with metrics.upstream_call("translate"):
+            translation = translator.translate(text)
         print(f"Google Translated: '{text}' -> '{translation}'")
+        if translation:
+            translation_cache.set(cache_key, translation)
         return translation
     except Exception as e:
         print(f"Translation Error: {e}")
@@ -111,22 +245,140 @@ def translate_message(text, target_lang):
     """
     if target_lang == "English": return text
     
-    # Map friendly names to ISO codes
-    lang_map = {
-        "Tamil": "ta",
-        "Hindi": "hi",
-        "Odia": "or",
-        "Telugu": "te",
-        "Malayalam": "ml",
-        "Kannada": "kn"
-    }
-    iso_code = lang_map.get(target_lang, "en")
-    
+    iso_code = LANGUAGE_CODES.get(target_lang, "en")
+
+    cache_key = _translation_key(text, "en", iso_code)
+    cached = translation_cache.get(cache_key)
+    if cached is not None:
+        metrics.cache_hit()
+        return cached
+    return upstream_flight.do(("translation", cache_key), _fetch_translation, text, iso_code, cache_key)
+
+def _fetch_translation(text, iso_code, cache_key):
     try:
         translator = GoogleTranslator(source='en', target=iso_code)
         # Handle HTML tags loosely (deep-translator maintains them mostly)
-        translation = translator.translate(text)
+        with metrics.upstream_call("translate"):
+            translation = translator.translate(text)
+        if translation:
+            translation_cache.set(cache_key, translation)
         return translation
     except Exception as e:
         print(f"Response Translation Error: {e}")
         return text
+
+
+# --- ASYNC VARIANTS (used by asgi_entry.py) ---
+# Same caches and keys as the sync functions above; upstream calls use
+# non-blocking httpx clients, and SQLite cache reads and writes run in a thread.
+# Google Translate mobile page (the endpoint deep-translator scrapes); overridable for local stubs
+GOOGLE_TRANSLATE_URL = os.getenv("GOOGLE_TRANSLATE_URL", "https://translate.google.com/m")
+TRANSLATE_TIMEOUT = float(os.getenv("TRANSLATE_TIMEOUT", "5"))
+
+async_llm_client = AsyncLLMClient(API_URL, API_KEY)
+async_flight = AsyncSingleFlight()
+_translate_http = None
+
+def _get_translate_http():
+    global _translate_http
+    if _translate_http is None or _translate_http.is_closed:
+        _translate_http = httpx.AsyncClient(timeout=TRANSLATE_TIMEOUT, headers={"User-Agent": "Mozilla/5.0"})
+    return _translate_http
+
+async def close_async_clients():
+    global _translate_http
+    await async_llm_client.aclose()
+    if _translate_http is not None:
+        await _translate_http.aclose()
+        _translate_http = None
+
+async def _google_translate_async(text, source, target):
+    """Same endpoint and result markup deep-translator's GoogleTranslator scrapes."""
+    text = text.strip()
+    if not text or source == target:
+        return text
+    response = await _get_translate_http().get(GOOGLE_TRANSLATE_URL, params={"tl": target, "sl": source, "q": text})
+    response.raise_for_status()
+    soup = BeautifulSoup(response.text, "html.parser")
+    element = soup.find("div", {"class": "t0"}) or soup.find("div", {"class": "result-container"})
+    if element is None:
+        raise ValueError(f"No translation found for: {text[:50]}")
+    return element.get_text(strip=True)
+
+async def _translate_cached_async(text, source, target, cache_key):
+    try:
+        with metrics.upstream_call("translate"):
+            translation = await _google_translate_async(text, source, target)
+    except Exception as e:
+        print(f"Translation Error: {e}")
+        return text
+    if translation:
+        await asyncio.to_thread(translation_cache.set, cache_key, translation)
+    return translation
+
+async def translate_to_english_async(text, source_language="auto"):
+    if text.lower() in LOCAL_TRANSLATIONS:
+        return LOCAL_TRANSLATIONS[text.lower()]
+    cache_key = _translation_key(text, source_language, "en")
+    cached = await translation_cache.get_async(cache_key)
+    if cached is not None:
+        metrics.cache_hit()
+        return cached
+    return await async_flight.do(("translation", cache_key), _translate_cached_async, text, "auto", "en", cache_key)
+
+async def translate_message_async(text, target_lang):
+    if target_lang == "English": return text
+    iso_code = LANGUAGE_CODES.get(target_lang, "en")
+    cache_key = _translation_key(text, "en", iso_code)
+    cached = await translation_cache.get_async(cache_key)
+    if cached is not None:
+        metrics.cache_hit()
+        return cached
+    return await async_flight.do(("translation", cache_key), _translate_cached_async, text, "en", iso_code, cache_key)
+
+async def _fetch_ai_explanation_async(disease_name, language, cache_key):
+    try:
+        with metrics.upstream_call("groq"):
+            answer = await async_llm_client.chat_completion(build_explanation_payload(disease_name, language))
+    except Exception as e:
+        print(f"Groq API Error: {e}")
+        return None
+    if answer:
+        await asyncio.to_thread(ai_definition_cache.set, cache_key, answer)
+    return answer
+
+async def get_ai_explanation_async(disease_name, language="English"):
+    if not API_KEY:
+        print("Error: GROQ_API_KEY not found in environment variables.")
+        return None
+    cache_key = _ai_definition_key(disease_name, language)
+    cached = await ai_definition_cache.get_async(cache_key)
+    if cached is not None:
+        metrics.cache_hit()
+        return cached
+    return await async_flight.do(("ai_definition", cache_key), _fetch_ai_explanation_async, disease_name, language, cache_key)
+
+async def get_cached_ai_explanation_async(disease_name, language="English"):
+    cached = await ai_definition_cache.get_async(_ai_definition_key(disease_name, language))
+    if cached is not None:
+        metrics.cache_hit()
+    return cached
+
+async def stream_ai_explanation_async(disease_name, language="English"):
+    """Async stream_ai_explanation: yields the answer as Groq generates it (cached answer as one chunk)."""
+    if not API_KEY:
+        print("Error: GROQ_API_KEY not found in environment variables.")
+        return
+    cache_key = _ai_definition_key(disease_name, language)
+    cached = await ai_definition_cache.get_async(cache_key)
+    if cached is not None:
+        metrics.cache_hit()
+        yield cached
+        return
+    parts = []
+    with metrics.upstream_call("groq"):
+        async for chunk in async_llm_client.stream_chat_completion(build_explanation_payload(disease_name, language)):
+            parts.append(chunk)
+            yield chunk
+    if parts:
+        await asyncio.to_thread(ai_definition_cache.set, cache_key, "".join(parts))
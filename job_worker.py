@@ -0,0 +1,188 @@
+"""
+Background job worker for the admin CMS.
+
+Runs the jobs the CMS queues in the shared database (shared/job_queue.py)
+one at a time: translation of an uploaded CSV and the knowledge-base
+rebuild. Progress and a heartbeat are written back every few seconds for
+the CMS page. If this process dies mid-job, the next start requeues the
+job and it resumes from the translation memory.
+
+    python job_worker.py          (Procfile: worker)
+
+Only one worker runs per node (a file lock); a second copy exits. Hosts that
+start only the web process (Azure Web App) need no separate worker: every
+web worker calls start_in_process(), and whichever one gets the lock runs
+the jobs in a background thread while the others wait to take over.
+"""
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+
+# Add the project root to path so imports work correctly
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import fcntl
+except ImportError: # Windows dev machines: no single-instance guard
+    fcntl = None
+
+from dotenv import load_dotenv
+from flask import Flask
+
+load_dotenv()
+
+from shared.database import init_db
+from shared.job_queue import enqueue, claim_next, heartbeat, finish, recover_stale
+from generate_translations import process_file
+from knowledge_base import compile_snapshot
+
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "3"))
+JOB_STANDBY_INTERVAL = float(os.getenv("JOB_STANDBY_INTERVAL", "30"))  # Web workers re-try the lock this often
+LOCK_PATH = os.getenv("JOB_WORKER_LOCK", os.path.join(os.path.dirname(os.path.abspath(__file__)), "job_worker.lock"))
+
+app = Flask(__name__)
+init_db(app)
+
+
+# --- JOB HANDLERS: (payload, progress(done, total)) -> JSON-able result ---
+def run_translate(payload, progress):
+    stats = process_file(payload["filename"], payload["cols"], progress=progress)
+    if stats is not None:
+        # Translated CSVs rewritten: recompile the snapshot once more
+        with app.app_context():
+            enqueue("reindex", "reindex", {"reason": f"translated {payload['filename']}"})
+    return stats
+
+def run_reindex(payload, progress):
+    started = time.perf_counter()
+    kb = compile_snapshot()
+    return {"version": kb.version, "topics": len(kb.topics), "build_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+HANDLERS = {"translate": run_translate, "reindex": run_reindex}
+
+
+class _Progress:
+    """Latest progress of the running job; a thread flushes it with the heartbeat."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.done, self.total = None, None
+        self.stopped = threading.Event()
+
+    def __call__(self, done, total):
+        self.done, self.total = done, total
+
+    def run(self):
+        while not self.stopped.wait(JOB_HEARTBEAT_INTERVAL):
+            try:
+                with app.app_context():
+                    heartbeat(self.job_id, self.done, self.total)
+            except Exception as e:
+                print(f"⚠️ Job heartbeat failed: {e}")
+
+
+def run_job(job_id, kind, payload):
+    progress = _Progress(job_id)
+    beat = threading.Thread(target=progress.run, name=f"job-{job_id}-heartbeat", daemon=True)
+    beat.start()
+    result, error = None, None
+    started = time.perf_counter()
+    try:
+        result = HANDLERS[kind](payload, progress)
+    except Exception as e:
+        traceback.print_exc()
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        progress.stopped.set()
+        beat.join()
+    with app.app_context():
+        if progress.done is not None:
+            heartbeat(job_id, progress.done, progress.total)
+        finish(job_id, result, error)
+    status = f"failed: {error}" if error else "done"
+    print(f"{'⚠️' if error else '✅'} Job #{job_id} {kind} {status} in {time.perf_counter() - started:.1f}s")
+
+
+def acquire_lock():
+    """The node's worker lock file, locked; None while another worker holds it."""
+    lock = open(LOCK_PATH, "a")
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            return None
+    return lock
+
+
+def work(lock):
+    """Runs queued jobs forever; `lock` must stay open (and held) meanwhile."""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"🛠️ Job worker {worker_id} started (polling every {JOB_POLL_INTERVAL}s)")
+    with app.app_context():
+        # Holding the lock means no other worker is alive: anything "running" was interrupted
+        requeued = recover_stale(0) if fcntl is not None else recover_stale()
+    if requeued:
+        print(f"🔁 Requeued {requeued} job(s) interrupted by the last shutdown")
+    while True:
+        with app.app_context():
+            requeued = recover_stale()
+            if requeued:
+                print(f"🔁 Requeued {requeued} job(s) left running by a stopped worker")
+            job = claim_next(worker_id)
+            if job is not None:
+                job_id, kind, payload, attempts = job.id, job.kind, json.loads(job.payload or "{}"), job.attempts
+        if job is None:
+            time.sleep(JOB_POLL_INTERVAL)
+            continue
+        print(f"▶️ Job #{job_id} {kind} (attempt {attempts}) {payload}")
+        run_job(job_id, kind, payload)
+
+
+def main():
+    lock = acquire_lock()
+    if lock is None:
+        print("Another job worker is already running; exiting.")
+        return
+    work(lock)
+
+
+# --- IN-PROCESS FALLBACK (web workers) ---
+_standby_pid = None
+_standby_lock = threading.Lock()
+
+def _standby():
+    lock = acquire_lock()
+    while lock is None:
+        time.sleep(JOB_STANDBY_INTERVAL)
+        lock = acquire_lock()
+    try:
+        work(lock)
+    except Exception:
+        traceback.print_exc()
+        lock.close() # Let another web worker take over
+
+def start_in_process():
+    """
+    Runs the job worker in a daemon thread of this process once it gets the
+    node's lock (idempotent). Keyed on PID so each forked gunicorn worker
+    gets its own thread. Needs fcntl: without the lock every process would
+    run jobs.
+    """
+    global _standby_pid
+    if fcntl is None:
+        return
+    with _standby_lock:
+        if _standby_pid == os.getpid():
+            return
+        _standby_pid = os.getpid()
+    threading.Thread(target=_standby, name="job-worker", daemon=True).start()
+
+
+if __name__ == "__main__":
+    main()
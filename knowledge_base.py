@@ -0,0 +1,450 @@
+"""
+Versioned Information Knowledge Base.
+
+A KnowledgeBase is built off to the side from MasterData (plus the
+pre-translated CSVs in static/data), validated, and only then published by
+swapping a single reference, so a request sees either the old or the new
+version - never a half-loaded one.
+
+Each worker notices CMS uploads / finished translations on its own: every
+KB_CHECK_INTERVAL seconds it stats the source files and, if any changed,
+rebuilds in a background thread. Rows parsed from unchanged files are
+reused. The match indexes (TopicIndex, FuzzyIndex) are reused only when the
+topic list is exactly the same: they have no add/remove deltas, so adding,
+removing or renaming even one topic rebuilds both from scratch (~15 ms for
+500 topics, in that background thread).
+
+Workers don't keep their own copy of the text. Every built version is
+compiled into one read-only snapshot file (KB_SNAPSHOT_PATH, see
+shared/mapped_tables.py) that all workers memory-map: descriptions and
+precautions are read straight from the OS page cache, so the node holds a
+single copy however many workers and languages there are. The snapshot
+carries the content hashes of its sources; a worker maps it only while they
+still match the files on disk, and the first worker to see a change
+recompiles it under a file lock while the others wait and then map the new
+file. `python knowledge_base.py` compiles it ahead of time (deploy step).
+"""
+import contextlib
+import csv
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError: # Windows dev machines: no cross-process lock, workers may each compile
+    fcntl = None
+
+from topic_index import TopicIndex, FuzzyIndex, TOPIC_ALIASES
+from shared.mapped_tables import open_tables, write_tables
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "MasterData")
+TRANSLATED_DIR = os.path.join(BASE_DIR, "static", "data") # Output of generate_translations.py
+
+# Seconds between source-file checks per worker (a handful of stat() calls)
+KB_CHECK_INTERVAL = float(os.getenv("KB_CHECK_INTERVAL", "5"))
+
+# Compiled knowledge base; empty string disables the snapshot
+KB_SNAPSHOT_PATH = os.getenv("KB_SNAPSHOT_PATH", os.path.join(BASE_DIR, "kb_snapshot.bin"))
+SNAPSHOT_FORMAT = 3 # Bump when KnowledgeBase / the indexes change shape
+
+# Cells pandas.read_csv treats as missing - kept so the CSVs parse exactly as before
+NA_VALUES = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+})
+
+
+class KnowledgeBaseError(Exception):
+    """The source files don't make a usable knowledge base."""
+
+
+class KnowledgeBase:
+    """One immutable version of the knowledge base. Never modified after build."""
+
+    def __init__(self, descriptions, precautions, localized_descriptions, localized_precautions,
+                 vaccine_schedule, topic_index, fuzzy_index, sources, fingerprints, parsed, topics=None):
+        self.descriptions = descriptions                        # {topic: desc} (a MappedTable when loaded from the snapshot)
+        self.precautions = precautions                          # {topic: [precs]}
+        self.localized_descriptions = localized_descriptions    # {"Hindi": {topic: desc}} - only rows that are actually translated
+        self.localized_precautions = localized_precautions      # {"Hindi": {topic: [precs]}}
+        self.vaccine_schedule = vaccine_schedule
+        self.topics = list(descriptions.keys()) if topics is None else topics
+        self.topic_index = topic_index
+        self.fuzzy_index = fuzzy_index
+        self.sources = sources            # path -> (mtime_ns, size) or None when missing
+        self.fingerprints = fingerprints  # path -> sha1 of the content or None when missing
+        self._parsed = parsed   # path -> parsed rows, reused by the next build (empty when mapped)
+        self.version = hashlib.sha1(repr(sorted(fingerprints.items())).encode()).hexdigest()[:12]
+        self.loaded_at = time.time()
+
+
+def source_paths(languages):
+    paths = [
+        os.path.join(DATA_DIR, "symptom_Description.csv"),
+        os.path.join(DATA_DIR, "symptom_precaution.csv"),
+        os.path.join(DATA_DIR, "vaccination_schedule.json"),
+    ]
+    for lang in languages:
+        paths.append(os.path.join(TRANSLATED_DIR, f"symptom_Description_{lang}.csv"))
+        paths.append(os.path.join(TRANSLATED_DIR, f"symptom_precaution_{lang}.csv"))
+    return paths
+
+
+def source_signature(languages):
+    signature = {}
+    for path in source_paths(languages):
+        try:
+            st = os.stat(path)
+            signature[path] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            signature[path] = None
+    return signature
+
+
+# --- PARSING (one file -> plain rows) ---
+def _read_file(path):
+    """(bytes, sha1) of a source file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    return data, hashlib.sha1(data).hexdigest()
+
+
+def _csv_rows(data):
+    """Header width and data rows of a CSV file (blank lines skipped, like pandas)."""
+    reader = csv.reader(io.StringIO(data.decode("utf-8-sig"), newline=""))
+    header = next(reader, [])
+    return len(header), [row for row in reader if row]
+
+
+def _cell(row, i):
+    """Cell i of a row, or None if it is absent or one of the NA markers."""
+    if i >= len(row) or row[i] in NA_VALUES:
+        return None
+    return row[i]
+
+
+def _read_descriptions(data):
+    """[(topic, desc or None)] in file order."""
+    width, rows = _csv_rows(data)
+    # Normalize column names if needed, assume 0=Disease, 1=Description
+    if width < 2:
+        return []
+    return [(str(_cell(row, 0)).strip().lower(), _cell(row, 1)) for row in rows]
+
+
+def _read_precautions(data):
+    """[(topic, [precs])] in file order."""
+    width, rows = _csv_rows(data)
+    # Assume 0=Disease, 1..N=Precautions
+    if width < 2:
+        return []
+    parsed = []
+    for row in rows:
+        # Filter out NaN or empty
+        cells = (_cell(row, i) for i in range(1, max(width, len(row))))
+        precs = [x for x in cells if x is not None and x.strip() != ""]
+        parsed.append((str(_cell(row, 0)).strip().lower(), precs))
+    return parsed
+
+
+def _read_schedule(data):
+    return json.loads(data.decode("utf-8"))
+
+
+def _parse(path, data):
+    if path.endswith(".json"):
+        return _read_schedule(data)
+    if os.path.basename(path).startswith("symptom_precaution"):
+        return _read_precautions(data)
+    return _read_descriptions(data)
+
+
+# --- BUILD ---
+def build_knowledge_base(languages, previous=None):
+    """
+    Builds and validates a new KnowledgeBase.
+    Raises KnowledgeBaseError if the English sources are missing or unusable.
+    """
+    desc_path, prec_path, vac_path = source_paths([])
+    sources = source_signature(languages)
+    fingerprints = dict.fromkeys(sources)
+    parsed = {}
+    for path, sig in sources.items():
+        if sig is None:
+            continue
+        # Unchanged file: reuse the rows parsed for the previous version
+        if previous is not None and previous.sources.get(path) == sig and path in previous._parsed:
+            parsed[path] = previous._parsed[path]
+            fingerprints[path] = previous.fingerprints.get(path)
+            continue
+        try:
+            data, fingerprints[path] = _read_file(path)
+            parsed[path] = _parse(path, data)
+        except Exception as e:
+            if path in (desc_path, prec_path):
+                raise KnowledgeBaseError(f"Cannot read {os.path.basename(path)}: {e}")
+            print(f"Error loading {os.path.basename(path)}: {e}")
+
+    if desc_path not in parsed:
+        raise KnowledgeBaseError("symptom_Description.csv is missing")
+
+    # 1. Descriptions & 2. Precautions
+    descriptions = {topic: desc or "No description available." for topic, desc in parsed[desc_path]}
+    if not descriptions:
+        raise KnowledgeBaseError("symptom_Description.csv has no topics")
+    precautions = dict(parsed.get(prec_path, []))
+
+    # 2b. Pre-translated variants (static/data/*_<Language>.csv)
+    localized_descriptions, localized_precautions = {}, {}
+    for lang in languages:
+        localized_descriptions[lang], localized_precautions[lang] = _translated_variants(
+            parsed, lang, descriptions, precautions
+        )
+
+    # 3. Vaccination schedule
+    vaccine_schedule = parsed.get(vac_path, [])
+    if not isinstance(vaccine_schedule, list):
+        raise KnowledgeBaseError("vaccination_schedule.json must be a list")
+
+    # Matching indexes depend only on the topic names: reuse them for content-only edits,
+    # rebuild them whole on any topic change (no incremental add/remove)
+    if previous is not None and previous.topics == list(descriptions.keys()):
+        topic_index, fuzzy_index = previous.topic_index, previous.fuzzy_index
+    else:
+        topic_index = TopicIndex(descriptions.keys(), TOPIC_ALIASES)
+        fuzzy_index = FuzzyIndex(descriptions.keys())
+
+    return KnowledgeBase(descriptions, precautions, localized_descriptions, localized_precautions,
+                         vaccine_schedule, topic_index, fuzzy_index, sources, fingerprints, parsed)
+
+
+def empty_knowledge_base(languages):
+    """A valid KnowledgeBase with no topics, stamped with the current (broken) sources."""
+    return KnowledgeBase({}, {}, {}, {}, [], TopicIndex([], TOPIC_ALIASES), FuzzyIndex([]),
+                         source_signature(languages), {}, {})
+
+
+def _translated_variants(parsed, lang, descriptions, precautions):
+    """
+    Rows of symptom_Description_<lang>.csv / symptom_precaution_<lang>.csv.
+    A row is kept only if it differs from the English source (generate_translations
+    leaves untranslated cells in English), so missing rows fall back to live translation.
+    """
+    descs, precs = {}, {}
+    for d_name, d_desc in parsed.get(os.path.join(TRANSLATED_DIR, f"symptom_Description_{lang}.csv"), []):
+        if d_desc is not None and d_desc != descriptions.get(d_name):
+            descs[d_name] = d_desc
+    for d_name, row_precs in parsed.get(os.path.join(TRANSLATED_DIR, f"symptom_precaution_{lang}.csv"), []):
+        english = precautions.get(d_name, [])
+        # Any cell still equal to the English source means this row wasn't translated
+        if row_precs and not any(p in english for p in row_precs):
+            precs[d_name] = row_precs
+    return descs, precs
+
+
+# --- SNAPSHOT (memory-mapped, shared by every worker) ---
+def source_fingerprints(languages):
+    fingerprints = {}
+    for path in source_paths(languages):
+        try:
+            fingerprints[path] = _read_file(path)[1]
+        except OSError:
+            fingerprints[path] = None
+    return fingerprints
+
+
+def load_snapshot(languages, path=KB_SNAPSHOT_PATH):
+    """
+    The snapshot as a KnowledgeBase if it was compiled from the current sources,
+    else None. Its text tables are MappedTables reading from the shared mapping.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    sources = source_signature(languages) # Taken first: a later edit is still seen by maybe_reload
+    try:
+        meta, tables = open_tables(path, SNAPSHOT_FORMAT)
+    except Exception as e:
+        print(f"⚠️ Ignoring unreadable knowledge base snapshot: {e}")
+        return None
+    if meta.get("languages") != sorted(languages):
+        return None
+    # Content hashes, not mtimes: a fresh checkout of the same data still matches
+    if meta["fingerprints"] != source_fingerprints(languages):
+        return None
+    return KnowledgeBase(
+        tables["descriptions"], tables["precautions"],
+        {lang: tables[f"descriptions:{lang}"] for lang in languages},
+        {lang: tables[f"precautions:{lang}"] for lang in languages},
+        meta["vaccine_schedule"], meta["topic_index"], meta["fuzzy_index"],
+        sources, meta["fingerprints"], {}, topics=meta["topics"],
+    )
+
+
+def write_snapshot(kb, languages, path=KB_SNAPSHOT_PATH):
+    """Atomically replaces the snapshot with `kb` (write-then-rename)."""
+    if not path:
+        return
+    tables = {"descriptions": kb.descriptions, "precautions": kb.precautions}
+    for lang in languages:
+        tables[f"descriptions:{lang}"] = kb.localized_descriptions.get(lang, {})
+        tables[f"precautions:{lang}"] = kb.localized_precautions.get(lang, {})
+    meta = {
+        "languages": sorted(languages), "fingerprints": kb.fingerprints, "topics": kb.topics,
+        "vaccine_schedule": kb.vaccine_schedule, "topic_index": kb.topic_index, "fuzzy_index": kb.fuzzy_index,
+    }
+    try:
+        write_tables(path, tables, meta, SNAPSHOT_FORMAT)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Knowledge base snapshot not written: {e}")
+
+
+@contextlib.contextmanager
+def _compile_lock(path):
+    """Cross-process lock, so only one worker compiles a new snapshot and the rest map it."""
+    if not path or fcntl is None:
+        yield
+        return
+    try:
+        f = open(f"{path}.lock", "a")
+    except OSError as e:
+        # Missing or read-only snapshot directory: no snapshot is written, each worker builds in memory
+        print(f"⚠️ Knowledge base snapshot lock unavailable, building without it: {e}")
+        yield
+        return
+    with f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class KnowledgeStore:
+    """
+    Holds the live KnowledgeBase of this worker and swaps in new versions.
+    Read `store.current` once per request and use that object throughout.
+    """
+
+    def __init__(self, languages, check_interval=KB_CHECK_INTERVAL):
+        self.languages = list(languages)
+        self.check_interval = check_interval
+        self.current = None
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._last_check = 0.0
+        self._stats = {"reloads": 0, "failed_reloads": 0, "last_error": None, "last_build_ms": None, "source": None}
+
+    def load(self):
+        """
+        Synchronous first load (worker start-up): the snapshot if it is current, else a full build.
+        If the sources are unusable an empty knowledge base is published, so requests never see
+        None; it is replaced as soon as maybe_reload sees the files change.
+        """
+        print("Loading Information Knowledge Base...")
+        self._build()
+        if self.current is None:
+            self.current = empty_knowledge_base(self.languages)
+            print("⚠️ Serving an empty knowledge base until the source files are fixed")
+        return self.current
+
+    def maybe_reload(self):
+        """
+        Cheap per-request check: at most every check_interval seconds, stat the
+        sources and start a background rebuild if any of them changed.
+        """
+        now = time.time()
+        if now - self._last_check < self.check_interval:
+            return
+        with self._lock:
+            if self._reloading or now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+            current = self.current
+            if current is not None and source_signature(self.languages) == current.sources:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, name="kb-reload", daemon=True).start()
+
+    def _reload(self):
+        try:
+            self._build()
+        finally:
+            with self._lock:
+                self._reloading = False
+
+    def _build(self):
+        started = time.perf_counter()
+        previous = self.current
+        try:
+            with _compile_lock(KB_SNAPSHOT_PATH):
+                # Another worker may already have compiled these sources
+                kb, source = load_snapshot(self.languages), "snapshot"
+                if kb is None:
+                    kb, source = build_knowledge_base(self.languages, previous), "csv"
+                    write_snapshot(kb, self.languages)
+                    # Publish the mapped copy, so this worker shares its pages with the others
+                    kb = load_snapshot(self.languages) or kb
+        except Exception as e:
+            self._stats["failed_reloads"] += 1
+            self._stats["last_error"] = str(e)
+            print(f"⚠️ Knowledge base not reloaded, keeping version {previous.version if previous else None}: {e}")
+            return
+        # Matching indexes depend only on the topic names
+        indexes_reused = previous is not None and previous.topics == kb.topics
+        if indexes_reused:
+            kb.topic_index, kb.fuzzy_index = previous.topic_index, previous.fuzzy_index
+        self.current = kb # The swap: one reference assignment
+        self._stats["last_build_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        self._stats["last_error"] = None
+        self._stats["source"] = source
+        if previous is not None:
+            self._stats["reloads"] += 1
+            print(f"🔄 Knowledge base reloaded: {previous.version} -> {kb.version} ({len(kb.topics)} topics, "
+                  f"indexes {'reused' if indexes_reused else 'rebuilt'})")
+        else:
+            if source == "snapshot":
+                print(f"⚡ Knowledge base {kb.version} mapped from snapshot in {self._stats['last_build_ms']} ms")
+            self._print_summary(kb)
+
+    def _print_summary(self, kb):
+        print(f"DEBUG: Pre-translated topics: { {l: len(d) for l, d in kb.localized_descriptions.items()} }")
+        print(f"DEBUG: Loaded {len(kb.vaccine_schedule)} vaccination records.")
+        print(f"System Ready. Information available for {len(kb.topics)} topics.")
+
+    def status(self):
+        kb = self.current
+        data = dict(self._stats)
+        data.update({
+            "version": kb.version if kb else None,
+            "loaded_at": kb.loaded_at if kb else None,
+            "topics": len(kb.topics) if kb else 0,
+            "reloading": self._reloading,
+        })
+        return data
+
+
+def compile_snapshot(languages=None):
+    """
+    Builds the knowledge base and writes the snapshot, so chat workers map it
+    instead of each rebuilding (deploy step, CMS reindex job). Languages
+    default to those with pre-translated CSVs.
+    """
+    if languages is None:
+        prefix = "symptom_Description_"
+        languages = sorted(f[len(prefix):-4] for f in os.listdir(TRANSLATED_DIR) if f.startswith(prefix) and f.endswith(".csv"))
+    with _compile_lock(KB_SNAPSHOT_PATH):
+        kb = build_knowledge_base(languages)
+        write_snapshot(kb, languages)
+    return kb
+
+
+if __name__ == "__main__":
+    started = time.perf_counter()
+    kb = compile_snapshot()
+    print(f"Knowledge base {kb.version} ({len(kb.topics)} topics, {', '.join(sorted(kb.localized_descriptions))}) "
+          f"compiled to {KB_SNAPSHOT_PATH} in {(time.perf_counter() - started) * 1000:.0f} ms")
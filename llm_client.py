@@ -0,0 +1,324 @@
+import asyncio
+import os
+import json
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- CONFIG ---
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "3"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "15"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_CAP = float(os.getenv("LLM_BACKOFF_CAP", "4"))
+# Seconds from the first attempt within which a retry must start; a longer Retry-After gives up at once
+LLM_RETRY_BUDGET = float(os.getenv("LLM_RETRY_BUDGET", "6"))
+# Max concurrent upstream calls per worker, and how long a caller waits for a slot
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_ACQUIRE_TIMEOUT = float(os.getenv("LLM_ACQUIRE_TIMEOUT", "2"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """Raised when a chat completion could not be obtained."""
+
+
+class LLMBusyError(LLMError):
+    """All concurrency slots were taken for longer than the acquire timeout."""
+
+
+def _stream_content(line):
+    """(done, content) of one SSE line of a streamed completion; content is None for lines without text."""
+    if not line or not line.startswith("data:"):
+        return False, None
+    data = line[5:].strip()
+    if data == "[DONE]":
+        return True, None
+    try:
+        delta = json.loads(data)["choices"][0].get("delta", {})
+    except (ValueError, KeyError, IndexError, TypeError):
+        raise LLMError(f"Unexpected LLM stream chunk: {data[:200]}")
+    return False, delta.get("content")
+
+
+class LLMClient:
+    """
+    Shared HTTP client for an OpenAI-compatible chat-completions endpoint (Groq).
+    - One keep-alive Session/connection pool per worker process (no TLS handshake per call)
+    - Connect and read timeouts on every request
+    - Capped exponential backoff with jitter on 429/5xx and connection errors,
+      honoring Retry-After in full; when the wait would overrun the retry
+      budget it gives up right away, so the caller falls back instead
+    - A semaphore bounding concurrent upstream calls, so a burst of slow
+      completions can't tie up every worker thread
+    """
+
+    def __init__(self, api_url, api_key=None, connect_timeout=LLM_CONNECT_TIMEOUT,
+                 read_timeout=LLM_READ_TIMEOUT, max_retries=LLM_MAX_RETRIES,
+                 backoff_base=LLM_BACKOFF_BASE, backoff_cap=LLM_BACKOFF_CAP, retry_budget=LLM_RETRY_BUDGET,
+                 max_concurrency=LLM_MAX_CONCURRENCY, acquire_timeout=LLM_ACQUIRE_TIMEOUT):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.retry_budget = retry_budget
+        self.acquire_timeout = acquire_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._pool_size = max_concurrency
+        self._session = None
+        self._session_pid = None
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "errors": 0, "rejected": 0}
+
+    def _get_session(self):
+        # Sockets must not be shared across gunicorn's fork
+        if self._session is None or self._session_pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._session_pid != os.getpid():
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session, self._session_pid = session, os.getpid()
+        return self._session
+
+    def _headers(self):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def _backoff(self, attempt, response=None):
+        """Seconds to wait before the next attempt (Retry-After wins if present)."""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    delay = None
+            if delay is not None:
+                return max(delay, 0.0)
+        delay = min(self.backoff_cap, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _retry_delay(self, attempt, response, deadline):
+        """_backoff(), or None when waiting that long would pass `deadline` (give up now)."""
+        delay = self._backoff(attempt, response)
+        return delay if time.monotonic() + delay <= deadline else None
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def post(self, payload, stream=False):
+        """
+        POSTs `payload` and returns the successful requests.Response.
+        Holds a concurrency slot for the whole call (including retries).
+        Raises LLMBusyError / LLMError.
+        """
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            self._count("rejected")
+            raise LLMBusyError("LLM concurrency limit reached")
+        try:
+            return self._post_with_retries(payload, stream)
+        finally:
+            self._slots.release()
+
+    def _post_with_retries(self, payload, stream):
+        session = self._get_session()
+        deadline = time.monotonic() + self.retry_budget
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._count("retries")
+            self._count("requests")
+            response = None
+            try:
+                response = session.post(self.api_url, headers=self._headers(), json=payload,
+                                        timeout=self.timeout, stream=stream)
+            except requests.exceptions.ConnectionError as e:
+                last_error = e
+            except requests.exceptions.Timeout as e:
+                # Read timeout: the worker already waited its budget, don't double it
+                self._count("errors")
+                raise LLMError(f"LLM request timed out: {e}")
+
+            if response is not None:
+                if response.status_code not in RETRY_STATUSES:
+                    if response.status_code == 400:
+                        print(f"Groq 400 Error Details: {response.text}")
+                    try:
+                        response.raise_for_status()
+                    except requests.exceptions.HTTPError as e:
+                        self._count("errors")
+                        raise LLMError(str(e))
+                    return response
+                last_error = LLMError(f"HTTP {response.status_code}")
+                response.close()
+
+            if attempt < self.max_retries:
+                delay = self._retry_delay(attempt, response, deadline)
+                if delay is None:
+                    last_error = LLMError(f"{last_error}, retry not before the {self.retry_budget:g}s budget runs out")
+                    break
+                time.sleep(delay)
+
+        self._count("errors")
+        raise LLMError(f"LLM request failed after {attempt + 1} attempts: {last_error}")
+
+    def chat_completion(self, payload):
+        """Returns the first choice's message content."""
+        result = self.post(payload).json()
+        try:
+            return result['choices'][0]['message']['content']
+        except (KeyError, IndexError, TypeError):
+            raise LLMError(f"Unexpected LLM response: {str(result)[:200]}")
+
+    def stream_chat_completion(self, payload):
+        """
+        Yields content chunks of a streamed completion ("stream": true, SSE).
+        The concurrency slot is held until the stream ends or the caller stops iterating.
+        """
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            self._count("rejected")
+            raise LLMBusyError("LLM concurrency limit reached")
+        response = None
+        try:
+            response = self._post_with_retries(dict(payload, stream=True), stream=True)
+            for line in response.iter_lines(decode_unicode=True):
+                done, content = _stream_content(line)
+                if done:
+                    return
+                if content:
+                    yield content
+        except requests.exceptions.RequestException as e:
+            self._count("errors")
+            raise LLMError(f"LLM stream interrupted: {e}")
+        finally:
+            if response is not None:
+                response.close()
+            self._slots.release()
+
+
+class AsyncLLMClient(LLMClient):
+    """
+    asyncio counterpart of LLMClient for the ASGI entry point (asgi_entry.py).
+    Same timeouts, retry/backoff policy and per-worker concurrency limit,
+    on a pooled httpx.AsyncClient; waiting never blocks the event loop.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._async_slots = asyncio.Semaphore(self._pool_size)
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+                limits=httpx.Limits(max_connections=self._pool_size, max_keepalive_connections=self._pool_size),
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def post(self, payload):
+        """POSTs `payload` and returns the successful httpx.Response. Raises LLMBusyError / LLMError."""
+        try:
+            await asyncio.wait_for(self._async_slots.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self._count("rejected")
+            raise LLMBusyError("LLM concurrency limit reached")
+        try:
+            return await self._post_with_retries(payload)
+        finally:
+            self._async_slots.release()
+
+    async def _post_with_retries(self, payload, stream=False):
+        client = self._get_client()
+        deadline = time.monotonic() + self.retry_budget
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._count("retries")
+            self._count("requests")
+            response = None
+            try:
+                request = client.build_request("POST", self.api_url, headers=self._headers(), json=payload)
+                response = await client.send(request, stream=stream)
+            except httpx.TimeoutException as e:
+                if not isinstance(e, httpx.ConnectTimeout):
+                    self._count("errors")
+                    raise LLMError(f"LLM request timed out: {e}")
+                last_error = e
+            except httpx.TransportError as e:
+                last_error = e
+
+            if response is not None:
+                if response.status_code not in RETRY_STATUSES:
+                    if response.is_error:
+                        if response.status_code == 400:
+                            await response.aread()
+                            print(f"Groq 400 Error Details: {response.text}")
+                        await response.aclose()
+                        self._count("errors")
+                        raise LLMError(f"HTTP {response.status_code}")
+                    return response
+                last_error = LLMError(f"HTTP {response.status_code}")
+                await response.aclose()
+
+            if attempt < self.max_retries:
+                delay = self._retry_delay(attempt, response, deadline)
+                if delay is None:
+                    last_error = LLMError(f"{last_error}, retry not before the {self.retry_budget:g}s budget runs out")
+                    break
+                await asyncio.sleep(delay)
+
+        self._count("errors")
+        raise LLMError(f"LLM request failed after {attempt + 1} attempts: {last_error}")
+
+    async def chat_completion(self, payload):
+        """Returns the first choice's message content."""
+        result = (await self.post(payload)).json()
+        try:
+            return result['choices'][0]['message']['content']
+        except (KeyError, IndexError, TypeError):
+            raise LLMError(f"Unexpected LLM response: {str(result)[:200]}")
+
+    async def stream_chat_completion(self, payload):
+        """Async LLMClient.stream_chat_completion: the slot is held until the stream ends or iteration stops."""
+        try:
+            await asyncio.wait_for(self._async_slots.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self._count("rejected")
+            raise LLMBusyError("LLM concurrency limit reached")
+        response = None
+        try:
+            response = await self._post_with_retries(dict(payload, stream=True), stream=True)
+            async for line in response.aiter_lines():
+                done, content = _stream_content(line)
+                if done:
+                    return
+                if content:
+                    yield content
+        except httpx.HTTPError as e:
+            self._count("errors")
+            raise LLMError(f"LLM stream interrupted: {e}")
+        finally:
+            if response is not None:
+                await response.aclose()
+            self._async_slots.release()
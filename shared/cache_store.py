@@ -0,0 +1,195 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Separate file from database.db so cache writes never contend with interaction logging
+DEFAULT_CACHE_PATH = os.getenv(
+    "CACHE_DB_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache.db"),
+)
+
+# How many disk writes between size checks
+_EVICT_EVERY = 100
+
+
+class TieredCache:
+    """
+    Two-tier string cache.
+    Tier 1: in-process LRU (per gunicorn worker).
+    Tier 2: SQLite table shared by every worker on the node; survives restarts.
+    Both tiers are size-bounded (least recently used goes first) and entries
+    can optionally expire after `ttl` seconds. With `memory_ttl`, a worker
+    re-checks the shared tier after that many seconds, so deletes made by
+    another process (e.g. the admin portal) reach every worker.
+    """
+
+    def __init__(self, namespace, memory_size=1024, disk_size=50000, ttl=None, memory_ttl=None, path=None):
+        self.namespace = namespace
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.ttl = ttl
+        self.memory_ttl = memory_ttl
+        self.path = path or DEFAULT_CACHE_PATH
+
+        self._memory = OrderedDict()  # key -> (value, created_at, remembered_at)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0, "errors": 0}
+
+    # --- SQLITE (one connection per thread, re-opened after fork) ---
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " created_at REAL NOT NULL, accessed_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_accessed ON cache_entries (namespace, accessed_at)")
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _expired(self, created_at, now):
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def _remember(self, key, value, created_at):
+        with self._lock:
+            self._memory[key] = (value, created_at, time.time())
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _count(self, stat, n=1):
+        with self._lock:
+            self._stats[stat] += n
+
+    # --- PUBLIC API ---
+    def get(self, key):
+        """Returns the cached value or None."""
+        now = time.time()
+        found, value = self._get_memory(key, now)
+        if found:
+            return value
+        return self._get_disk(key, now)
+
+    async def get_async(self, key):
+        """get() for the event loop: memory hits inline, the SQLite tier in a thread."""
+        now = time.time()
+        found, value = self._get_memory(key, now)
+        if found:
+            return value
+        return await asyncio.to_thread(self._get_disk, key, now)
+
+    def _get_memory(self, key, now):
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                fresh = self.memory_ttl is None or now - item[2] <= self.memory_ttl
+                if fresh and not self._expired(item[1], now):
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return True, item[0]
+                del self._memory[key]
+        return False, None
+
+    def _get_disk(self, key, now):
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT value, created_at FROM cache_entries WHERE namespace=? AND key=?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is not None:
+                if self._expired(row[1], now):
+                    conn.execute("DELETE FROM cache_entries WHERE namespace=? AND key=?", (self.namespace, key))
+                else:
+                    conn.execute(
+                        "UPDATE cache_entries SET accessed_at=? WHERE namespace=? AND key=?",
+                        (now, self.namespace, key),
+                    )
+                    self._remember(key, row[0], row[1])
+                    self._count("disk_hits")
+                    return row[0]
+        except sqlite3.Error as e:
+            self._count("errors")
+            print(f"Cache Read Error ({self.namespace}): {e}")
+
+        self._count("misses")
+        return None
+
+    def set(self, key, value):
+        now = time.time()
+        self._remember(key, value, now)
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, value, now, now),
+            )
+            with self._lock:
+                self._stats["writes"] += 1
+                self._writes += 1
+                evict = self._writes % _EVICT_EVERY == 0
+            if evict:
+                self._evict(conn)
+        except sqlite3.Error as e:
+            self._count("errors")
+            print(f"Cache Write Error ({self.namespace}): {e}")
+
+    def _evict(self, conn):
+        cur = conn.execute(
+            "DELETE FROM cache_entries WHERE namespace=? AND key IN ("
+            " SELECT key FROM cache_entries WHERE namespace=?"
+            " ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.disk_size),
+        )
+        if self.ttl is not None:
+            cur2 = conn.execute(
+                "DELETE FROM cache_entries WHERE namespace=? AND created_at < ?",
+                (self.namespace, time.time() - self.ttl),
+            )
+            self._count("evictions", max(cur2.rowcount, 0))
+        self._count("evictions", max(cur.rowcount, 0))
+
+    def delete(self, key):
+        """Drops one entry from this worker's memory tier and the shared disk tier."""
+        with self._lock:
+            self._memory.pop(key, None)
+        try:
+            self._conn().execute("DELETE FROM cache_entries WHERE namespace=? AND key=?", (self.namespace, key))
+        except sqlite3.Error as e:
+            self._count("errors")
+            print(f"Cache Delete Error ({self.namespace}): {e}")
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        try:
+            self._conn().execute("DELETE FROM cache_entries WHERE namespace=?", (self.namespace,))
+        except sqlite3.Error as e:
+            self._count("errors")
+            print(f"Cache Clear Error ({self.namespace}): {e}")
+
+    def stats(self):
+        """Hit/miss counters for this worker plus current tier sizes."""
+        with self._lock:
+            data = dict(self._stats)
+            data["memory_entries"] = len(self._memory)
+        try:
+            data["disk_entries"] = self._conn().execute(
+                "SELECT COUNT(*) FROM cache_entries WHERE namespace=?", (self.namespace,)
+            ).fetchone()[0]
+        except sqlite3.Error:
+            data["disk_entries"] = None
+        lookups = data["memory_hits"] + data["disk_hits"] + data["misses"]
+        data["hit_rate"] = round((data["memory_hits"] + data["disk_hits"]) / lookups, 3) if lookups else None
+        return data
@@ -1,7 +1,48 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from datetime import datetime
 import os
 
+# --- STORAGE PROFILES ---
+# PRAGMAs applied to every SQLite connection (chatbot, admin portal, scripts).
+# Pick one with DB_STORAGE_PROFILE; individual settings can be overridden with
+# DB_JOURNAL_MODE, DB_SYNCHRONOUS, DB_BUSY_TIMEOUT (ms), DB_CACHE_SIZE (pages,
+# negative = KiB) and DB_MMAP_SIZE (bytes).
+STORAGE_PROFILES = {
+    # What we ran before: SQLite/pysqlite defaults, rollback journal
+    "legacy": {"journal_mode": "DELETE", "synchronous": "FULL", "busy_timeout": None, "cache_size": -2000, "mmap_size": 0},
+    # Concurrent readers alongside one writer; fsync only at checkpoints
+    "wal": {"journal_mode": "WAL", "synchronous": "NORMAL", "busy_timeout": 5000, "cache_size": -20000, "mmap_size": 268435456},
+    # WAL, but every commit is fsynced
+    "durable": {"journal_mode": "WAL", "synchronous": "FULL", "busy_timeout": 5000, "cache_size": -20000, "mmap_size": 268435456},
+}
+
+def get_storage_profile(name=None):
+    """Resolved PRAGMA settings for a profile (env overrides applied)."""
+    name = name or os.getenv("DB_STORAGE_PROFILE", "wal")
+    profile = dict(STORAGE_PROFILES.get(name, STORAGE_PROFILES["wal"]))
+    for key in profile:
+        override = os.getenv(f"DB_{key.upper()}")
+        if override:
+            profile[key] = override if key in ("journal_mode", "synchronous") else int(override)
+    return profile
+
+def apply_storage_profile(dbapi_connection, profile):
+    """Runs the profile's PRAGMAs on a raw sqlite3 connection."""
+    cursor = dbapi_connection.cursor()
+    # busy_timeout first so the journal_mode switch can wait for other connections
+    if profile["busy_timeout"] is not None:
+        cursor.execute(f"PRAGMA busy_timeout={int(profile['busy_timeout'])}")
+    # Switching journal mode needs an exclusive lock: only do it when it differs
+    current = cursor.execute("PRAGMA journal_mode").fetchone()[0]
+    if current.lower() != profile["journal_mode"].lower():
+        cursor.execute(f"PRAGMA journal_mode={profile['journal_mode']}")
+    cursor.execute(f"PRAGMA synchronous={profile['synchronous']}")
+    cursor.execute(f"PRAGMA cache_size={int(profile['cache_size'])}")
+    cursor.execute(f"PRAGMA mmap_size={int(profile['mmap_size'])}")
+    cursor.close()
+
 # Initialize SQLAlchemy with no settings (will be configured by the app)
 db = SQLAlchemy()
 
@@ -23,17 +64,62 @@ class Interaction(db.Model):
     user_message = db.Column(db.Text, nullable=False)
     bot_response = db.Column(db.Text, nullable=False)
     
-    intent_detected = db.Column(db.String(50), nullable=True) # e.g., "symptom_check", "general_chat"
-    confidence_score = db.Column(db.Float, nullable=True)
-    region = db.Column(db.String(50), nullable=True) # Geo-Spatial Logging
+    intent_detected = db.Column(db.String(50), nullable=True, index=True) # e.g., "symptom_check", "general_chat"
+    confidence_score = db.Column(db.Float, nullable=True, index=True)
+    region = db.Column(db.String(50), nullable=True, index=True) # Geo-Spatial Logging
     sentiment = db.Column(db.String(20), nullable=True) # "Positive", "Neutral", "Negative"
     
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     # Flags for Admin Review
-    flagged_for_review = db.Column(db.Boolean, default=False)
+    flagged_for_review = db.Column(db.Boolean, default=False, index=True)
     admin_correction = db.Column(db.Text, nullable=True) # If admin overrides the answer
 
+    # Cost of answering (from the request's stage timing; empty for untimed endpoints)
+    language = db.Column(db.String(20), nullable=True, index=True)  # Language the answer was given in
+    channel = db.Column(db.String(20), nullable=True, index=True)   # "web" / "whatsapp"
+    latency_ms = db.Column(db.Float, nullable=True, index=True)     # Request start to the answer being logged
+    stage_timings = db.Column(db.Text, nullable=True)               # JSON {stage: ms}
+    translate_calls = db.Column(db.Integer, nullable=True)          # Google Translate requests made
+    llm_calls = db.Column(db.Integer, nullable=True)                # Groq requests made
+    cache_served = db.Column(db.Boolean, nullable=True)             # Upstream answer came from the cache, no call made
+
+class InteractionRollup(db.Model):
+    """Interaction counts per hour x intent x region x channel (maintained by the log writer)."""
+    id = db.Column(db.Integer, primary_key=True)
+    hour = db.Column(db.DateTime, nullable=False, index=True) # Truncated to the hour (UTC)
+    intent = db.Column(db.String(50), nullable=False, default="")
+    region = db.Column(db.String(50), nullable=False, default="")
+    channel = db.Column(db.String(20), nullable=False, default="web") # "web" / "whatsapp"
+    interactions = db.Column(db.Integer, nullable=False, default=0)
+
+    # "" instead of NULL so the upsert key always conflicts
+    __table_args__ = (db.UniqueConstraint("hour", "intent", "region", "channel", name="uq_interaction_rollup_key"),)
+
+class UserRollup(db.Model):
+    """New users per hour (maintained by the log writer)."""
+    id = db.Column(db.Integer, primary_key=True)
+    hour = db.Column(db.DateTime, nullable=False, unique=True)
+    new_users = db.Column(db.Integer, nullable=False, default=0)
+
+class BackgroundJob(db.Model):
+    """Durable job queue for CMS work (translation, knowledge-base rebuild); see shared/job_queue.py."""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)                 # "translate" / "reindex"
+    dedupe_key = db.Column(db.String(200), nullable=False, index=True) # A newer job with the same key supersedes a queued one
+    payload = db.Column(db.Text, nullable=False, default="{}")      # JSON arguments
+    status = db.Column(db.String(20), nullable=False, default="queued", index=True) # queued/running/done/failed/superseded
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    progress_done = db.Column(db.Integer, nullable=False, default=0)
+    progress_total = db.Column(db.Integer, nullable=True)
+    result = db.Column(db.Text, nullable=True)                      # JSON stats of the finished run
+    error = db.Column(db.Text, nullable=True)
+    worker = db.Column(db.String(100), nullable=True)               # host:pid that claimed it
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)            # Stale while "running" = the worker died
+    finished_at = db.Column(db.DateTime, nullable=True)
+
 class Admin(db.Model):
     """Admin users for the portal."""
     id = db.Column(db.Integer, primary_key=True)
@@ -41,11 +127,45 @@ class Admin(db.Model):
     password_hash = db.Column(db.String(200), nullable=False)
     role = db.Column(db.String(20), default="superadmin")
 
+def upsert_user_ids(identifiers, seen_at=None):
+    """
+    Returns ({user_identifier: User.id}, number of users created), creating
+    missing users with one INSERT OR IGNORE so concurrent workers can't race
+    on the unique constraint. Runs in the current session/transaction (caller commits).
+    """
+    identifiers = list(set(identifiers))
+    if not identifiers:
+        return {}, 0
+    now = seen_at or datetime.utcnow()
+    result = db.session.execute(
+        sqlite_insert(User)
+        .values([{"user_identifier": i, "first_seen": now, "last_seen": now} for i in identifiers])
+        .on_conflict_do_nothing(index_elements=["user_identifier"])
+    )
+    rows = db.session.execute(
+        db.select(User.user_identifier, User.id).where(User.user_identifier.in_(identifiers))
+    ).all()
+    return {identifier: user_id for identifier, user_id in rows}, max(result.rowcount, 0)
+
+def missing_columns(engine):
+    """(table, column) pairs the models have but the database file doesn't yet (see shared/migrate.py)."""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {c["name"] for c in inspector.get_columns(table.name)}
+        missing.extend((table, column) for column in table.columns if column.name not in present)
+    return missing
+
 def init_db(app, db_path="database.db"):
     """
     Initializes the database with the given Flask app.
     Ensures the DB file is created in the shared directory.
+    DATABASE_PATH overrides the location (benchmarks, staging copies).
     """
+    db_path = os.getenv("DATABASE_PATH", db_path)
     if not os.path.isabs(db_path):
         # Default to a 'storage' folder in the parent directory or same directory
         base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -55,11 +175,24 @@ def init_db(app, db_path="database.db"):
         project_root = os.path.dirname(base_dir) 
         db_path = os.path.join(project_root, "database.db")
 
+    profile = get_storage_profile()
+
     app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if profile["busy_timeout"] is not None:
+        app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {
+            # pysqlite's own lock wait, kept in line with PRAGMA busy_timeout
+            "connect_args": {"timeout": profile["busy_timeout"] / 1000.0},
+        })
     
     db.init_app(app)
     
     with app.app_context():
+        event.listen(db.engine, "connect", lambda conn, record: apply_storage_profile(conn, profile))
         db.create_all()
-        print(f"✅ Database initialized at: {db_path}")
+        # create_all skips tables that already exist; columns added later need the migration
+        missing = missing_columns(db.engine)
+        if missing:
+            names = ", ".join(f"{table.name}.{column.name}" for table, column in missing)
+            print(f"⚠️ Database is missing {names}: run python -m shared.migrate")
+        print(f"✅ Database initialized at: {db_path} (journal={profile['journal_mode']}, synchronous={profile['synchronous']})")
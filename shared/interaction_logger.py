@@ -0,0 +1,288 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from shared.database import db, User, Interaction, upsert_user_ids
+from shared import metrics
+from shared.rollups import record_interactions, record_new_users, channel_for
+
+# --- CONFIG ---
+LOG_QUEUE_SIZE = int(os.getenv("INTERACTION_LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("INTERACTION_LOG_BATCH_SIZE", "200"))
+LOG_FLUSH_INTERVAL = float(os.getenv("INTERACTION_LOG_FLUSH_INTERVAL", "1.0"))
+# "drop": never wait, count the message as dropped when the queue is full
+# "block": wait up to LOG_BLOCK_TIMEOUT seconds for space, then drop
+LOG_FULL_POLICY = os.getenv("INTERACTION_LOG_FULL_POLICY", "drop")
+LOG_BLOCK_TIMEOUT = float(os.getenv("INTERACTION_LOG_BLOCK_TIMEOUT", "0.05"))
+# identifier -> user id cache size, and how stale User.last_seen may get (seconds)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "50000"))
+LAST_SEEN_RESOLUTION = float(os.getenv("LAST_SEEN_RESOLUTION", "60"))
+
+
+class UserIdentityCache:
+    """
+    Bounded LRU of user_identifier -> (User.id, last_seen we last wrote).
+    Returning users skip the User lookup entirely; last_seen is only
+    re-written once it's LAST_SEEN_RESOLUTION seconds behind.
+    """
+
+    def __init__(self, max_size=USER_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, identifier):
+        with self._lock:
+            entry = self._entries.get(identifier)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(identifier)
+            self.hits += 1
+            return entry
+
+    def put(self, identifier, user_id, last_seen):
+        with self._lock:
+            self._entries[identifier] = (user_id, last_seen)
+            self._entries.move_to_end(identifier)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class InteractionLogger:
+    """
+    Write-behind logging of chat interactions.
+    Requests only put a plain dict on a bounded in-memory queue; a background
+    writer drains it and commits whole batches in one transaction (flushed by
+    size or after `flush_interval` seconds), so chat latency never waits on
+    SQLite fsyncs or the single-writer lock.
+    """
+
+    def __init__(self, app, queue_size=LOG_QUEUE_SIZE, batch_size=LOG_BATCH_SIZE,
+                 flush_interval=LOG_FLUSH_INTERVAL, full_policy=LOG_FULL_POLICY):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.full_policy = full_policy
+        self._queue = queue.Queue(maxsize=queue_size)
+        self.user_cache = UserIdentityCache()
+        self._writer_pid = None
+        self._writer = None
+        self._start_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0,
+            "last_flush_ms": None, "max_flush_ms": 0.0, "total_flush_ms": 0.0,
+        }
+        atexit.register(self.stop)
+
+    # --- PRODUCER SIDE (request thread) ---
+    def log(self, user_identifier, user_message, bot_response, intent, confidence, region=None, channel=None,
+            language=None, timing=None):
+        """
+        Queues one interaction. Returns False if it was dropped.
+        timing: metrics.request_summary() of the request that answered it.
+        """
+        self._ensure_writer()
+        timing = timing or {}
+        record = {
+            "user_identifier": user_identifier,
+            "user_message": user_message,
+            "bot_response": bot_response,
+            "intent_detected": intent,
+            "confidence_score": float(confidence),
+            "region": region,
+            "channel": channel or channel_for(region),
+            "language": language,
+            "latency_ms": timing.get("latency_ms"),
+            "stage_timings": json.dumps(timing["stage_timings"]) if timing.get("stage_timings") else None,
+            "translate_calls": timing.get("translate_calls"),
+            "llm_calls": timing.get("llm_calls"),
+            "cache_served": timing.get("cache_served"),
+            "timestamp": datetime.utcnow(),
+        }
+        try:
+            if self.full_policy == "block":
+                self._queue.put(record, timeout=LOG_BLOCK_TIMEOUT)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("enqueued")
+        return True
+
+    def _ensure_writer(self):
+        # Threads don't survive gunicorn's fork: start one per worker process
+        if self._writer_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._writer_pid = os.getpid()
+            self._stop.clear()
+            self._writer = threading.Thread(target=self._run, name="interaction-writer", daemon=True)
+            self._writer.start()
+
+    # --- CONSUMER SIDE (writer thread) ---
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._write(batch)
+
+    def _collect(self):
+        """Blocks for the first record, then gathers until batch_size or flush_interval."""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _resolve_user_ids(self, batch):
+        """
+        identifier -> User.id for a batch, in the current transaction.
+        Cached users cost no query; unknown ones are upserted in one statement.
+        last_seen is bumped with one bulk UPDATE for users whose value is stale.
+        Also returns the cache entries to store once the transaction commits.
+        """
+        latest = {}
+        for r in batch:
+            ts = r["timestamp"]
+            if ts > latest.get(r["user_identifier"], datetime.min):
+                latest[r["user_identifier"]] = ts
+
+        user_ids = {}
+        missing = []
+        last_seen_updates = []
+        cache_puts = []
+        for identifier, ts in latest.items():
+            cached = self.user_cache.get(identifier)
+            if cached is None:
+                missing.append(identifier)
+                continue
+            user_id, written = cached
+            user_ids[identifier] = user_id
+            if (ts - written).total_seconds() >= LAST_SEEN_RESOLUTION:
+                last_seen_updates.append({"id": user_id, "last_seen": ts})
+                cache_puts.append((identifier, user_id, ts))
+
+        if missing:
+            first_seen = min(latest[i] for i in missing)
+            created_ids, created = upsert_user_ids(missing, seen_at=first_seen)
+            record_new_users(first_seen, created)
+            for identifier, user_id in created_ids.items():
+                user_ids[identifier] = user_id
+                last_seen_updates.append({"id": user_id, "last_seen": latest[identifier]})
+                cache_puts.append((identifier, user_id, latest[identifier]))
+
+        if last_seen_updates:
+            db.session.execute(db.update(User), last_seen_updates)
+        return user_ids, cache_puts
+
+    def _write(self, batch):
+        started = time.perf_counter()
+        with self._flush_lock, self.app.app_context():
+            try:
+                user_ids, cache_puts = self._resolve_user_ids(batch)
+                db.session.add_all([
+                    Interaction(
+                        user_id=user_ids[r["user_identifier"]],
+                        user_message=r["user_message"],
+                        bot_response=r["bot_response"],
+                        intent_detected=r["intent_detected"],
+                        confidence_score=r["confidence_score"],
+                        region=r["region"], # Store simulated or real region
+                        sentiment="neutral",
+                        language=r["language"],
+                        channel=r["channel"],
+                        latency_ms=r["latency_ms"],
+                        stage_timings=r["stage_timings"],
+                        translate_calls=r["translate_calls"],
+                        llm_calls=r["llm_calls"],
+                        cache_served=r["cache_served"],
+                        timestamp=r["timestamp"],
+                    )
+                    for r in batch
+                ])
+                # Dashboard counters move in the same transaction as the rows
+                record_interactions(batch)
+                db.session.commit()
+                for entry in cache_puts:
+                    self.user_cache.put(*entry)
+                self._count("written", len(batch))
+            except Exception as e:
+                db.session.rollback()
+                self._count("failed", len(batch))
+                print(f"⚠️ DB LOGGING FAILED ({len(batch)} interactions): {e}")
+            finally:
+                db.session.remove()
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        metrics.observe("chatbot_db_flush_seconds", elapsed_ms / 1000)
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["last_flush_ms"] = round(elapsed_ms, 2)
+            self._stats["max_flush_ms"] = max(self._stats["max_flush_ms"], round(elapsed_ms, 2))
+            self._stats["total_flush_ms"] += elapsed_ms
+
+    # --- CONTROL ---
+    def flush(self):
+        """Synchronously writes everything currently queued (used on shutdown and in scripts)."""
+        batch = self._drain()
+        while batch:
+            self._write(batch[:self.batch_size])
+            batch = batch[self.batch_size:]
+
+    def stop(self):
+        """Stops the writer (letting it finish its current batch) and flushes the rest."""
+        self._stop.set()
+        if self._writer is not None and self._writer_pid == os.getpid() and self._writer.is_alive():
+            self._writer.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def _count(self, stat, n=1):
+        with self._stats_lock:
+            self._stats[stat] += n
+
+    def stats(self):
+        """Queue depth, throughput counters and flush latency for this worker."""
+        with self._stats_lock:
+            data = dict(self._stats)
+        data["user_cache_size"] = len(self.user_cache)
+        data["user_cache_hits"] = self.user_cache.hits
+        data["user_cache_misses"] = self.user_cache.misses
+        data["queue_depth"] = self._queue.qsize()
+        data["queue_capacity"] = self._queue.maxsize
+        data["avg_flush_ms"] = round(data["total_flush_ms"] / data["batches"], 2) if data["batches"] else None
+        data["total_flush_ms"] = round(data["total_flush_ms"], 2)
+        return data
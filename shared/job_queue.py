@@ -0,0 +1,134 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+from shared.database import db, BackgroundJob
+
+# A running job whose worker hasn't written a heartbeat for this long is considered dead
+JOB_STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "60"))
+# Crashes survived before a job is marked failed
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+
+# --- PRODUCERS (admin portal) ---
+def enqueue(kind, dedupe_key, payload=None):
+    """
+    Queues a job and returns it. A job with the same dedupe_key that is still
+    queued is superseded (a newer upload of the same file replaces it); one
+    that is already running finishes and the new job runs after it.
+    """
+    now = datetime.utcnow()
+    BackgroundJob.query.filter_by(dedupe_key=dedupe_key, status="queued").update(
+        {"status": "superseded", "finished_at": now}, synchronize_session=False
+    )
+    job = BackgroundJob(kind=kind, dedupe_key=dedupe_key, payload=json.dumps(payload or {}), status="queued", created_at=now)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+# --- CONSUMER (job_worker.py) ---
+def claim_next(worker_id):
+    """Marks the oldest queued job as running for this worker and returns it, or None."""
+    while True:
+        job = BackgroundJob.query.filter_by(status="queued").order_by(BackgroundJob.id).first()
+        if job is None:
+            return None
+        now = datetime.utcnow()
+        # Conditional update: only one claimant can move it out of "queued"
+        claimed = BackgroundJob.query.filter_by(id=job.id, status="queued").update({
+            "status": "running", "worker": worker_id, "started_at": now, "heartbeat_at": now,
+            "attempts": BackgroundJob.attempts + 1, "progress_done": 0, "progress_total": None, "error": None,
+        }, synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            db.session.refresh(job)
+            return job
+
+
+def heartbeat(job_id, done=None, total=None):
+    values = {"heartbeat_at": datetime.utcnow()}
+    if done is not None:
+        values["progress_done"] = done
+    if total is not None:
+        values["progress_total"] = total
+    BackgroundJob.query.filter_by(id=job_id, status="running").update(values, synchronize_session=False)
+    db.session.commit()
+
+
+def finish(job_id, result=None, error=None):
+    """Records the outcome of a running job (error -> "failed")."""
+    BackgroundJob.query.filter_by(id=job_id, status="running").update({
+        "status": "failed" if error else "done",
+        "result": json.dumps(result) if result is not None else None,
+        "error": error,
+        "finished_at": datetime.utcnow(),
+    }, synchronize_session=False)
+    db.session.commit()
+
+
+def recover_stale(stale_after=JOB_STALE_AFTER):
+    """
+    Requeues running jobs whose worker stopped sending heartbeats (crash,
+    restart, OOM kill). Their work resumes from what was already saved - for
+    translations the translation memory. Returns the number requeued.
+    stale_after=0 takes over every running job (the worker is known to be alone).
+    """
+    now = datetime.utcnow()
+    stale = BackgroundJob.query.filter(
+        BackgroundJob.status == "running",
+        BackgroundJob.heartbeat_at <= now - timedelta(seconds=stale_after),
+    ).all()
+    requeued = 0
+    for job in stale:
+        newer = BackgroundJob.query.filter(
+            BackgroundJob.dedupe_key == job.dedupe_key, BackgroundJob.status == "queued", BackgroundJob.id > job.id
+        ).count()
+        if newer:
+            job.status, job.finished_at = "superseded", now
+        elif job.attempts >= JOB_MAX_ATTEMPTS:
+            job.status, job.finished_at = "failed", now
+            job.error = f"Worker stopped {job.attempts} times while running this job"
+        else:
+            job.status, job.worker = "queued", None
+            requeued += 1
+    db.session.commit()
+    return requeued
+
+
+# --- CMS PAGE ---
+def recent_jobs(limit=15):
+    """Latest jobs as plain dicts, with progress and throughput for the CMS page."""
+    now = datetime.utcnow()
+    jobs = []
+    for job in BackgroundJob.query.order_by(BackgroundJob.id.desc()).limit(limit):
+        payload = json.loads(job.payload or "{}")
+        end = job.finished_at or now
+        elapsed = (end - job.started_at).total_seconds() if job.started_at else None
+        percent = None
+        if job.progress_total:
+            percent = round(100 * job.progress_done / job.progress_total)
+        elif job.status == "done":
+            percent = 100
+        jobs.append({
+            "id": job.id,
+            "kind": job.kind,
+            "target": payload.get("filename", "knowledge base"),
+            "status": job.status,
+            "attempts": job.attempts,
+            "progress_done": job.progress_done,
+            "progress_total": job.progress_total,
+            "percent": percent,
+            "per_second": round(job.progress_done / elapsed, 1) if elapsed and job.progress_done else None,
+            "elapsed_seconds": round(elapsed, 1) if elapsed is not None else None,
+            "created_at": job.created_at.strftime("%Y-%m-%d %H:%M:%S") if job.created_at else None,
+            "result": json.loads(job.result) if job.result else None,
+            "error": job.error,
+        })
+    return jobs
+
+
+def queue_stalled():
+    """True if a job has waited longer than JOB_STALE_AFTER to start (is job_worker.py running?)."""
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_STALE_AFTER)
+    return BackgroundJob.query.filter(BackgroundJob.status == "queued", BackgroundJob.created_at < cutoff).count() > 0
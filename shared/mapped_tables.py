@@ -0,0 +1,146 @@
+import mmap
+import os
+import pickle
+import struct
+from collections.abc import Mapping
+
+# File layout:
+#   header   magic, format, offset/length of the trailer
+#   heap     UTF-8 strings, each distinct string stored once
+#   tables   per table, entries sorted by key bytes: (key_off, key_len, val_off, val_len)
+#   trailer  pickle of {"meta": ..., "tables": {name: (entries_off, count, kind)}}
+_MAGIC = b"MTB1"
+_HEADER = struct.Struct("<4sIQQ")
+_ENTRY = struct.Struct("<IIII")
+_LIST_SEP = "\x1f" # Unit separator between the items of a list value
+
+
+class MappedTable(Mapping):
+    """
+    Read-only {str: str} or {str: [str]} view over a memory-mapped file.
+    Lookups binary-search the sorted entries and decode only the value asked
+    for, so nothing is copied into per-process dicts; the pages live in the
+    OS page cache and are shared by every process mapping the same file.
+    """
+
+    __slots__ = ("_buf", "_offset", "_count", "_is_list")
+
+    def __init__(self, buf, offset, count, kind):
+        self._buf = buf
+        self._offset = offset
+        self._count = count
+        self._is_list = kind == "list"
+
+    def _entry(self, i):
+        return _ENTRY.unpack_from(self._buf, self._offset + i * _ENTRY.size)
+
+    def _find(self, key):
+        if not isinstance(key, str):
+            return None
+        target = key.encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry = self._entry(mid)
+            probe = self._buf[entry[0]:entry[0] + entry[1]]
+            if probe == target:
+                return entry
+            if probe < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def _value(self, entry):
+        text = self._buf[entry[2]:entry[2] + entry[3]].decode("utf-8")
+        if self._is_list:
+            return text.split(_LIST_SEP) if text else []
+        return text
+
+    def get(self, key, default=None):
+        entry = self._find(key)
+        return default if entry is None else self._value(entry)
+
+    def __getitem__(self, key):
+        entry = self._find(key)
+        if entry is None:
+            raise KeyError(key)
+        return self._value(entry)
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for i in range(self._count):
+            key_off, key_len = self._entry(i)[:2]
+            yield self._buf[key_off:key_off + key_len].decode("utf-8")
+
+
+def write_tables(path, tables, meta=None, format_version=1):
+    """
+    Writes {name: {key: str | [str]}} plus a picklable `meta` object to `path`
+    atomically (write-then-rename, so readers never map a partial file).
+    """
+    heap = bytearray()
+    positions = {}
+
+    def intern(text):
+        data = text.encode("utf-8")
+        if data not in positions:
+            positions[data] = _HEADER.size + len(heap)
+            heap.extend(data)
+        return positions[data], len(data)
+
+    encoded = {}
+    for name, table in tables.items():
+        kind = "str"
+        rows = []
+        for key, value in table.items():
+            if isinstance(value, (list, tuple)):
+                kind = "list"
+                if any(_LIST_SEP in item for item in value):
+                    raise ValueError(f"{name}[{key!r}] contains the list separator")
+                value = _LIST_SEP.join(value)
+            rows.append((key.encode("utf-8"), intern(key), intern(value)))
+        rows.sort(key=lambda row: row[0])
+        encoded[name] = (kind, rows)
+
+    body = bytearray(heap)
+    directory = {}
+    for name, (kind, rows) in encoded.items():
+        directory[name] = (_HEADER.size + len(body), len(rows), kind)
+        for _, (key_off, key_len), (val_off, val_len) in rows:
+            body.extend(_ENTRY.pack(key_off, key_len, val_off, val_len))
+    trailer = pickle.dumps({"meta": meta, "tables": directory}, protocol=pickle.HIGHEST_PROTOCOL)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, format_version, _HEADER.size + len(body), len(trailer)))
+            f.write(body)
+            f.write(trailer)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def open_tables(path, format_version=1):
+    """
+    (meta, {name: MappedTable}) for a file written by write_tables.
+    Raises ValueError if the file isn't one, or was written with another format.
+    The mapping is released once nothing references the tables any more.
+    """
+    with open(path, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(buf) < _HEADER.size:
+        raise ValueError("truncated table file")
+    magic, version, trailer_off, trailer_len = _HEADER.unpack_from(buf, 0)
+    if magic != _MAGIC or version != format_version:
+        raise ValueError(f"not a format {format_version} table file")
+    trailer = pickle.loads(buf[trailer_off:trailer_off + trailer_len])
+    tables = {name: MappedTable(buf, offset, count, kind) for name, (offset, count, kind) in trailer["tables"].items()}
+    return trailer["meta"], tables
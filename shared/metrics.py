@@ -0,0 +1,373 @@
+"""
+Latency histograms and counters for /metrics (Prometheus text format).
+
+Each worker process keeps its samples in memory and writes a snapshot to
+METRICS_DIR/<pid>-<start>.json every METRICS_FLUSH_INTERVAL seconds;
+/metrics (served by whichever worker gets the scrape) adds up all of them.
+Counters and histograms of workers that have exited stay in the sum, so
+totals never go backwards across worker restarts: a scrape folds the
+files of dead pids into METRICS_DIR/retired.json and deletes them. Gauges
+only count workers that flushed recently. The default METRICS_DIR is one
+per deployment (app directory + DATABASE_PATH), so staging and production
+on one host don't mix.
+
+    with stage("translate_in"):      # per-request stage, also sent as Server-Timing
+        ...
+    with upstream_call("groq"):      # external call latency, requests and errors
+        ...
+"""
+import atexit
+import contextvars
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError: # Windows dev machines: dead workers' files are never folded
+    fcntl = None
+
+# --- CONFIG ---
+_deployment = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + "|" + os.getenv("DATABASE_PATH", "")
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(
+    tempfile.gettempdir(), f"health_chatbot_metrics-{hashlib.sha1(_deployment.encode()).hexdigest()[:10]}"))
+RETIRED_FILE = "retired.json" # Summed counters and histograms of exited workers
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# name -> (type, help); collectors may only report names listed here
+METRICS = {
+    "chatbot_request_seconds": ("histogram", "Chat request latency, first byte of handling to response"),
+    "chatbot_stage_seconds": ("histogram", "Latency of one stage of a chat request"),
+    "chatbot_upstream_seconds": ("histogram", "Latency of calls to external services"),
+    "chatbot_upstream_requests_total": ("counter", "Calls to external services"),
+    "chatbot_upstream_errors_total": ("counter", "Failed calls to external services"),
+    "chatbot_alert_refresh_seconds": ("histogram", "Duration of a refresh of all RSS alert feeds"),
+    "chatbot_cache_lookups_total": ("counter", "Translation / AI answer cache lookups by result"),
+    "chatbot_coalesced_calls_total": ("counter", "Upstream calls saved by request coalescing"),
+    "chatbot_llm_client_events_total": ("counter", "Groq client requests, retries, errors and rejections"),
+    "chatbot_interactions_total": ("counter", "Interactions queued, written, dropped or failed by the DB writer"),
+    "chatbot_interaction_queue_depth": ("gauge", "Interactions waiting for the background DB writer"),
+    "chatbot_db_flush_seconds": ("histogram", "Duration of one batch commit of the interaction writer"),
+    "chatbot_metrics_workers": ("gauge", "Worker processes that reported metrics recently"),
+}
+
+_lock = threading.Lock()
+_state = {"pid": None, "started": None, "counters": {}, "histograms": {}, "flusher": False}
+_collectors = []
+_request = contextvars.ContextVar("chatbot_request_timing", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    """Prometheus label string: endpoint="whatsapp_reply",stage="groq" """
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items()))
+
+
+def _current_state():
+    """This process's samples (a forked worker starts from zero) - call with _lock held."""
+    if _state["pid"] != os.getpid():
+        _state.update(pid=os.getpid(), started=time.time(), counters={}, histograms={}, flusher=False)
+    return _state
+
+
+def _ensure_flusher(state):
+    # Threads don't survive gunicorn's fork: one flusher per worker process
+    if not state["flusher"]:
+        state["flusher"] = True
+        threading.Thread(target=_flush_loop, name="metrics-flusher", daemon=True).start()
+
+
+def inc(name, value=1, **labels):
+    key = _labels(labels)
+    with _lock:
+        state = _current_state()
+        series = state["counters"].setdefault(name, {})
+        series[key] = series.get(key, 0) + value
+        _ensure_flusher(state)
+
+
+def observe(name, seconds, **labels):
+    key = _labels(labels)
+    with _lock:
+        state = _current_state()
+        series = state["histograms"].setdefault(name, {})
+        hist = series.get(key)
+        if hist is None:
+            # Per-bucket counts (the last one is +Inf), then sum and count
+            hist = series[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0, 0]
+        hist[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        hist[-2] += seconds
+        hist[-1] += 1
+        _ensure_flusher(state)
+
+
+def register_collector(fn):
+    """
+    fn() -> [(name, labels_dict, value)], called at every flush. For this
+    worker's own running totals (cache stats, queue depth...) that already
+    live elsewhere; counters must be totals since the process started.
+    """
+    _collectors.append(fn)
+
+
+# --- PER-REQUEST TIMING ---
+def begin_request(endpoint):
+    _request.set({"endpoint": endpoint, "started": time.perf_counter(), "stages": [], "upstream": {}, "cache_hits": 0})
+
+
+def end_request():
+    """Records the request's total latency and returns its Server-Timing header value (None if not timed)."""
+    timing = _request.get()
+    if timing is None:
+        return None
+    _request.set(None)
+    total = time.perf_counter() - timing["started"]
+    observe("chatbot_request_seconds", total, endpoint=timing["endpoint"])
+    durations = {}
+    for name, seconds in timing["stages"]:
+        durations[name] = durations.get(name, 0.0) + seconds
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in durations.items()]
+    return ", ".join(entries + [f"total;dur={total * 1000:.1f}"])
+
+
+def clear_request():
+    _request.set(None)
+
+
+def detach_request():
+    """
+    Takes the current request's timing away from after_request, for a streamed
+    body that finishes later: it calls resume_request() and end_request() itself.
+    """
+    timing = _request.get()
+    _request.set(None)
+    return timing
+
+
+def resume_request(timing):
+    _request.set(timing)
+
+
+def request_summary():
+    """
+    Cost of the current request so far, for its Interaction row (None if not timed):
+    latency_ms, stage_timings {stage: ms}, translate_calls, llm_calls, cache_served.
+    cache_served: an upstream answer came from the cache and nothing was called.
+    """
+    timing = _request.get()
+    if timing is None:
+        return None
+    stages = {}
+    for name, seconds in timing["stages"]:
+        stages[name] = round(stages.get(name, 0.0) + seconds * 1000, 2)
+    upstream = timing["upstream"]
+    return {
+        "latency_ms": round((time.perf_counter() - timing["started"]) * 1000, 2),
+        "stage_timings": stages,
+        "translate_calls": upstream.get("translate", 0),
+        "llm_calls": upstream.get("groq", 0),
+        "cache_served": timing["cache_hits"] > 0 and not upstream,
+    }
+
+
+def cache_hit():
+    """Marks the current request as having been answered (in part) from the translation / AI cache."""
+    timing = _request.get()
+    if timing is not None:
+        timing["cache_hits"] += 1
+
+
+@contextmanager
+def stage(name):
+    """Times a stage of the current chat request (endpoint "other" outside of one, e.g. a status page)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        timing = _request.get()
+        if timing is not None:
+            timing["stages"].append((name, elapsed))
+        observe("chatbot_stage_seconds", elapsed, endpoint=timing["endpoint"] if timing else "other", stage=name)
+
+
+@contextmanager
+def upstream_call(service):
+    """Times one call to an external service; an exception counts as an error and is re-raised."""
+    started = time.perf_counter()
+    inc("chatbot_upstream_requests_total", service=service)
+    timing = _request.get()
+    if timing is not None:
+        timing["upstream"][service] = timing["upstream"].get(service, 0) + 1
+    try:
+        yield
+    except Exception:
+        inc("chatbot_upstream_errors_total", service=service)
+        raise
+    finally:
+        observe("chatbot_upstream_seconds", time.perf_counter() - started, service=service)
+
+
+# --- CROSS-WORKER AGGREGATION ---
+def _snapshot():
+    with _lock:
+        state = _current_state()
+        counters = {name: dict(series) for name, series in state["counters"].items()}
+        histograms = {name: {k: list(h) for k, h in series.items()} for name, series in state["histograms"].items()}
+        started = state["started"]
+    gauges = {}
+    for collector in list(_collectors):
+        try:
+            for name, labels, value in collector():
+                kind = METRICS[name][0]
+                target = gauges if kind == "gauge" else counters
+                target.setdefault(name, {})[_labels(labels)] = value
+        except Exception as e:
+            print(f"⚠️ Metrics collector failed: {e}")
+    return {"pid": os.getpid(), "written_at": time.time(), "counters": counters, "gauges": gauges,
+            "histograms": histograms}, started
+
+
+def flush():
+    """Writes this worker's snapshot to METRICS_DIR (atomically)."""
+    snapshot, started = _snapshot()
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, f"{os.getpid()}-{int(started)}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+
+
+def _flush_loop():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception as e:
+            print(f"⚠️ Metrics flush failed: {e}")
+
+
+def _flush_at_exit():
+    if _state["pid"] == os.getpid() and (_state["counters"] or _state["histograms"]):
+        try:
+            flush()
+        except Exception:
+            pass
+
+atexit.register(_flush_at_exit)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True # Someone else's process
+    return True
+
+
+def _read_snapshot(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None # being replaced, or truncated by a crash
+
+
+def _add_snapshot(counters, histograms, snapshot):
+    for name, series in snapshot["counters"].items():
+        for key, value in series.items():
+            counters.setdefault(name, {})[key] = counters.get(name, {}).get(key, 0) + value
+    for name, series in snapshot["histograms"].items():
+        for key, hist in series.items():
+            total = histograms.setdefault(name, {}).setdefault(key, [0] * len(hist))
+            for i, value in enumerate(hist):
+                total[i] += value
+
+
+def _retire_dead_workers():
+    """Folds the files of workers that have exited into RETIRED_FILE, so the directory doesn't grow with restarts."""
+    if fcntl is None:
+        return
+    dead = []
+    for filename in os.listdir(METRICS_DIR):
+        pid = filename.split("-", 1)[0]
+        if filename.endswith(".json") and pid.isdigit() and not _pid_alive(int(pid)):
+            dead.append(filename)
+    if not dead:
+        return
+    # One scraper at a time, or two workers could add the same dead file twice
+    with open(os.path.join(METRICS_DIR, ".retire.lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        retired_path = os.path.join(METRICS_DIR, RETIRED_FILE)
+        retired = _read_snapshot(retired_path) or {"counters": {}, "histograms": {}}
+        folded = []
+        for filename in dead:
+            snapshot = _read_snapshot(os.path.join(METRICS_DIR, filename))
+            if snapshot is not None: # gone: already folded by another scraper
+                _add_snapshot(retired["counters"], retired["histograms"], snapshot)
+                folded.append(filename)
+        if folded:
+            tmp = f"{retired_path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(retired, f)
+            os.replace(tmp, retired_path)
+            for filename in folded:
+                os.remove(os.path.join(METRICS_DIR, filename))
+
+
+def render():
+    """All workers' metrics, summed, in the Prometheus text exposition format."""
+    flush()
+    try:
+        _retire_dead_workers()
+    except OSError as e:
+        print(f"⚠️ Metrics cleanup failed: {e}")
+    counters, gauges, histograms = {}, {}, {}
+    live = 0
+    fresh_after = time.time() - 3 * METRICS_FLUSH_INTERVAL
+    for filename in os.listdir(METRICS_DIR):
+        if not filename.endswith(".json"):
+            continue
+        snapshot = _read_snapshot(os.path.join(METRICS_DIR, filename))
+        if snapshot is None:
+            continue
+        _add_snapshot(counters, histograms, snapshot)
+        if filename != RETIRED_FILE and snapshot["written_at"] >= fresh_after:
+            live += 1
+            for name, series in snapshot["gauges"].items():
+                for key, value in series.items():
+                    gauges.setdefault(name, {})[key] = gauges.get(name, {}).get(key, 0) + value
+    gauges["chatbot_metrics_workers"] = {"": live}
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        source = {"counter": counters, "gauge": gauges, "histogram": histograms}[kind].get(name)
+        if not source:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for key, value in sorted(source.items()):
+            if kind != "histogram":
+                lines.append(f"{name}{{{key}}} {value}" if key else f"{name} {value}")
+                continue
+            sep = "," if key else ""
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), value[:-2]):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{key}{sep}le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{key}}} {value[-2]:.6f}" if key else f"{name}_sum {value[-2]:.6f}")
+            lines.append(f"{name}_count{{{key}}} {value[-1]}" if key else f"{name}_count {value[-1]}")
+    return "\n".join(lines) + "\n"
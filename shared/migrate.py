@@ -0,0 +1,53 @@
+"""
+Schema migration for an existing database file.
+
+db.create_all() (run by init_db) only creates missing tables. Columns and
+indexes added to existing tables since the file was created are added here,
+explicitly, never at import, and dashboard rollups are backfilled from the
+existing history:
+
+    python -m shared.migrate                              # database.db
+    DATABASE_PATH=/home/data/database.db python -m shared.migrate
+
+Every added column is nullable, and running it twice is harmless.
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import OperationalError
+
+from shared.database import db, missing_columns
+
+
+def migrate(engine):
+    """ALTER TABLE ... ADD COLUMN for every missing column, then creates missing indexes. Returns the columns added."""
+    added = []
+    for table, column in missing_columns(engine):
+        column_type = column.type.compile(dialect=engine.dialect)
+        try:
+            with engine.begin() as conn:
+                conn.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}')
+            added.append(f"{table.name}.{column.name}")
+        except OperationalError as e:
+            # Another migration running at the same time got there first
+            if "duplicate column" not in str(e):
+                raise
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    return added
+
+
+if __name__ == "__main__":
+    from flask import Flask
+    from shared.database import init_db
+    from shared.rollups import ensure_rollups
+
+    app = Flask(__name__)
+    init_db(app)
+    with app.app_context():
+        added = migrate(db.engine)
+        ensure_rollups()
+    print(f"🔧 Added {', '.join(added)}" if added else "Schema already up to date")
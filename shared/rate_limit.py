@@ -0,0 +1,38 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, at most `capacity`
+    saved up for bursts. acquire() blocks until a token is available, so any
+    number of threads together stay under the upstream's request rate.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._waited = 0.0
+
+    def acquire(self, tokens=1):
+        """Takes `tokens`, sleeping as long as needed. Returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    self._waited += waited
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def stats(self):
+        with self._lock:
+            return {"rate": self.rate, "capacity": self.capacity, "waited_seconds": round(self._waited, 3)}
@@ -0,0 +1,166 @@
+import os
+import sys
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+if __name__ == "__main__":
+    # Allow `python shared/rollups.py` from the project root
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.database import db, Interaction, User, InteractionRollup, UserRollup
+
+# Dashboard time ranges: (lookback, bucket size)
+RANGES = {
+    "24h": (timedelta(hours=24), timedelta(hours=1)),
+    "7d": (timedelta(days=7), timedelta(days=1)),
+    "30d": (timedelta(days=30), timedelta(days=1)),
+}
+
+
+def hour_bucket(ts):
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def channel_for(region):
+    """Interactions logged with region "WhatsApp" came in through Twilio."""
+    return "whatsapp" if region == "WhatsApp" else "web"
+
+
+# --- INCREMENTAL MAINTENANCE (called by the log writer, inside its transaction) ---
+def record_interactions(records):
+    """Adds a batch of logged interactions to the hourly rollups with one upsert."""
+    counts = Counter(
+        (hour_bucket(r["timestamp"]), r["intent_detected"] or "", r["region"] or "",
+         r.get("channel") or channel_for(r["region"]))
+        for r in records
+    )
+    if not counts:
+        return
+    stmt = sqlite_insert(InteractionRollup).values([
+        {"hour": hour, "intent": intent, "region": region, "channel": channel, "interactions": n}
+        for (hour, intent, region, channel), n in counts.items()
+    ])
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=["hour", "intent", "region", "channel"],
+        set_={"interactions": InteractionRollup.interactions + stmt.excluded.interactions},
+    ))
+
+
+def record_new_users(hour, count):
+    if count <= 0:
+        return
+    stmt = sqlite_insert(UserRollup).values(hour=hour_bucket(hour), new_users=count)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=["hour"],
+        set_={"new_users": UserRollup.new_users + stmt.excluded.new_users},
+    ))
+
+
+# --- CATCH-UP JOB ---
+def backfill_rollups():
+    """
+    Rebuilds both rollup tables from the raw Interaction / User history.
+    Runs as one write transaction (the delete comes first to take the write
+    lock), so the log writer can't interleave a batch between the aggregate
+    reads and the re-insert.
+    """
+    db.session.query(InteractionRollup).delete()
+    db.session.query(UserRollup).delete()
+
+    hour_expr = func.strftime("%Y-%m-%d %H:00:00", Interaction.timestamp)
+    rows = db.session.query(
+        hour_expr, Interaction.intent_detected, Interaction.region, func.count(Interaction.id)
+    ).filter(Interaction.timestamp.isnot(None)).group_by(
+        hour_expr, Interaction.intent_detected, Interaction.region
+    ).all()
+
+    user_hour = func.strftime("%Y-%m-%d %H:00:00", User.first_seen)
+    user_rows = db.session.query(user_hour, func.count(User.id)).filter(
+        User.first_seen.isnot(None)
+    ).group_by(user_hour).all()
+
+    counts = Counter()
+    for hour, intent, region, n in rows:
+        counts[(datetime.strptime(hour, "%Y-%m-%d %H:%M:%S"), intent or "", region or "", channel_for(region))] += n
+
+    db.session.add_all([
+        InteractionRollup(hour=hour, intent=intent, region=region, channel=channel, interactions=n)
+        for (hour, intent, region, channel), n in counts.items()
+    ])
+    db.session.add_all([
+        UserRollup(hour=datetime.strptime(hour, "%Y-%m-%d %H:%M:%S"), new_users=n)
+        for hour, n in user_rows
+    ])
+    db.session.commit()
+    return sum(counts.values()), sum(n for _, n in user_rows)
+
+
+def ensure_rollups():
+    """Runs the catch-up job once if there is history but no rollups yet."""
+    if InteractionRollup.query.first() is None and Interaction.query.first() is not None:
+        interactions, users = backfill_rollups()
+        print(f"✅ Rollups backfilled: {interactions} interactions, {users} users")
+
+
+# --- DASHBOARD READS ---
+def dashboard_summary(range_key="24h", now=None):
+    """Totals and chart series for the admin dashboard, read only from rollups."""
+    lookback, bucket = RANGES.get(range_key, RANGES["24h"])
+    now = now or datetime.utcnow()
+    since = hour_bucket(now - lookback) + timedelta(hours=1)
+
+    total_interactions = db.session.query(func.coalesce(func.sum(InteractionRollup.interactions), 0)).scalar()
+    total_users = db.session.query(func.coalesce(func.sum(UserRollup.new_users), 0)).scalar()
+
+    rows = db.session.query(
+        InteractionRollup.hour, InteractionRollup.intent, InteractionRollup.channel,
+        func.sum(InteractionRollup.interactions)
+    ).filter(InteractionRollup.hour >= since).group_by(
+        InteractionRollup.hour, InteractionRollup.intent, InteractionRollup.channel
+    ).all()
+
+    # Empty buckets still show on the chart
+    if bucket == timedelta(days=1):
+        start = since.replace(hour=0)
+        key = lambda ts: ts.replace(hour=0)
+        label = lambda ts: ts.strftime("%d %b")
+    else:
+        start = since
+        key = hour_bucket
+        label = lambda ts: ts.strftime("%H:00")
+    series = {}
+    ts = start
+    while ts <= now:
+        series[ts] = 0
+        ts += bucket
+
+    by_intent = Counter()
+    by_channel = Counter()
+    for hour, intent, channel, n in rows:
+        series[key(hour)] = series.get(key(hour), 0) + n
+        by_intent[intent or "unknown"] += n
+        by_channel[channel] += n
+
+    return {
+        "range": range_key if range_key in RANGES else "24h",
+        "total_interactions": total_interactions,
+        "total_users": total_users,
+        "range_interactions": sum(by_intent.values()),
+        "series": [(label(ts), n) for ts, n in sorted(series.items())],
+        "by_intent": by_intent.most_common(),
+        "by_channel": by_channel.most_common(),
+    }
+
+
+if __name__ == "__main__":
+    from flask import Flask
+    from shared.database import init_db
+
+    app = Flask(__name__)
+    init_db(app)
+    with app.app_context():
+        interactions, users = backfill_rollups()
+        print(f"Rollups rebuilt: {interactions} interactions, {users} users")
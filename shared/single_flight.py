@@ -0,0 +1,93 @@
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls within a worker process.
+    The first caller for a key runs the function; callers arriving while it
+    is still running wait for that result instead of repeating the upstream
+    request. Nothing is remembered once the call finishes - caching is the
+    caller's job (see shared/cache_store.py).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "executed": 0, "deduplicated": 0, "errors": 0, "max_waiters": 0}
+
+    def do(self, key, fn, *args, **kwargs):
+        """Returns fn(*args, **kwargs), sharing the result with concurrent callers of `key`."""
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._stats["deduplicated"] += 1
+                self._stats["max_waiters"] = max(self._stats["max_waiters"], call.waiters)
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._stats["executed"] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data["in_flight"] = len(self._calls)
+        data["dedup_rate"] = round(data["deduplicated"] / data["calls"], 3) if data["calls"] else None
+        return data
+
+
+class AsyncSingleFlight(SingleFlight):
+    """SingleFlight for coroutines: concurrent awaiters of a key share one task's result."""
+
+    async def do(self, key, fn, *args, **kwargs):
+        """Returns await fn(*args, **kwargs), sharing it with concurrent callers of `key`."""
+        with self._lock:
+            self._stats["calls"] += 1
+            task = self._calls.get(key)
+            if task is not None:
+                self._stats["deduplicated"] += 1
+            else:
+                task = self._calls[key] = asyncio.ensure_future(fn(*args, **kwargs))
+                self._stats["executed"] += 1
+                task.add_done_callback(lambda t: self._finish(key, t))
+        # shield: one caller giving up (client disconnect) doesn't cancel the others
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        with self._lock:
+            if self._calls.get(key) is task:
+                del self._calls[key]
+            if not task.cancelled() and task.exception() is not None:
+                self._stats["errors"] += 1
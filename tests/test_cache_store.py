@@ -0,0 +1,18 @@
+import asyncio
+
+from shared.cache_store import TieredCache
+
+
+def test_get_async_reads_both_tiers(tmp_path):
+    path = str(tmp_path / "cache.db")
+    writer = TieredCache("t", path=path)
+    writer.set("k", "v")
+    assert asyncio.run(writer.get_async("k")) == "v"
+    assert writer.stats()["memory_hits"] == 1
+
+    reader = TieredCache("t", path=path)  # another worker: empty memory tier
+    assert asyncio.run(reader.get_async("k")) == "v"
+    assert asyncio.run(reader.get_async("k")) == "v"
+    assert asyncio.run(reader.get_async("missing")) is None
+    stats = reader.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
@@ -0,0 +1,74 @@
+import generate_translations as gt
+from benchmarks.stub_servers import TranslateStub
+from generate_translations import BatchMismatch, FakeTranslator, GoogleBackend, TranslationPipeline, read_csv
+
+ROWS = [
+    ["Disease", "Precaution_1", "Precaution_2"],
+    ["dengue", "use mosquito nets", "drink fluids"],
+    ["malaria", "use mosquito nets", "see a doctor"],
+    ["cholera", "drink fluids", "5"],
+]
+
+
+class MergingTranslator(FakeTranslator):
+    """Merges the lines of any multi-cell batch, like the real page sometimes does."""
+
+    def translate_batch(self, texts, target):
+        if len(texts) > 1:
+            self.requests += 1
+            raise BatchMismatch(f"{len(texts)} cells, 1 lines")
+        return super().translate_batch(texts, target)
+
+
+def pipeline(tmp_path, translator):
+    source_dir = tmp_path / "MasterData"
+    source_dir.mkdir(exist_ok=True)
+    (source_dir / "symptom_precaution.csv").write_text("\n".join(",".join(r) for r in ROWS) + "\n", encoding="utf-8")
+    return TranslationPipeline(translator, languages={"Hindi": "hi"}, rate=1000, burst=1000,
+                               source_dir=str(source_dir), target_dir=str(tmp_path / "out"),
+                               memory_dir=str(tmp_path / "memory"))
+
+
+def translated_rows(tmp_path):
+    return read_csv(str(tmp_path / "out" / "symptom_precaution_Hindi.csv"))[1]
+
+
+def test_translates_each_unique_string_once_and_reuses_the_memory(tmp_path):
+    stats = pipeline(tmp_path, FakeTranslator()).run([("symptom_precaution.csv", [1, 2])])
+    assert (stats["cells"], stats["unique_strings"], stats["translated"], stats["requests"]) == (5, 3, 3, 1)
+    assert translated_rows(tmp_path) == [
+        ["dengue", "[hi] use mosquito nets", "[hi] drink fluids"],
+        ["malaria", "[hi] use mosquito nets", "[hi] see a doctor"],
+        ["cholera", "[hi] drink fluids", "5"],
+    ]
+
+    again = FakeTranslator()
+    stats = pipeline(tmp_path, again).run([("symptom_precaution.csv", [1, 2])])
+    assert (stats["from_memory"], stats["to_translate"], again.requests) == (3, 0, 0)
+
+
+def test_mismatched_batch_is_retried_cell_by_cell(tmp_path):
+    stats = pipeline(tmp_path, MergingTranslator()).run([("symptom_precaution.csv", [1, 2])])
+    assert (stats["batch_splits"], stats["translated"], stats["failed"]) == (1, 3, 0)
+    assert translated_rows(tmp_path)[1][2] == "[hi] see a doctor"
+
+
+def test_failed_strings_stay_english_and_are_retried_next_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(gt, "TRANSLATE_RETRIES", 1)
+    stats = pipeline(tmp_path, FakeTranslator(fail_rate=1.0)).run([("symptom_precaution.csv", [1, 2])])
+    assert (stats["translated"], stats["failed"]) == (0, 3)
+    assert translated_rows(tmp_path) == [row for row in ROWS[1:]]
+
+    stats = pipeline(tmp_path, FakeTranslator()).run([("symptom_precaution.csv", [1, 2])])
+    assert stats["to_translate"] == 3 and stats["translated"] == 3
+
+
+def test_google_backend_against_the_translate_stub():
+    with TranslateStub(glossary={"fever": "बुखार"}) as stub:
+        backend = GoogleBackend(url=stub.url)
+        try:
+            assert backend.translate_batch(["fever", "use mosquito nets"], "hi") == ["बुखार", "[hi] use mosquito nets"]
+            assert backend.translate_batch(["drink fluids"], "ta") == ["[ta] drink fluids"]
+        finally:
+            backend.close()
+    assert len(stub.requests) == 2
@@ -0,0 +1,35 @@
+import pytest
+
+import groq_service
+from benchmarks.stub_servers import GroqStub, DEFAULT_ANSWER
+from llm_client import LLMClient, LLMError
+from shared.cache_store import TieredCache
+
+
+@pytest.fixture
+def groq(tmp_path, monkeypatch):
+    """groq_service wired to a GroqStub and an empty cache."""
+    with GroqStub(token_delay=0.001) as stub:
+        llm = LLMClient(stub.url, "test-key", backoff_base=0.01, backoff_cap=0.05, read_timeout=5)
+        monkeypatch.setattr(groq_service, "API_KEY", "test-key")
+        monkeypatch.setattr(groq_service, "llm_client", llm)
+        monkeypatch.setattr(groq_service, "ai_definition_cache", TieredCache("ai_definition", path=str(tmp_path / "cache.db")))
+        yield stub
+
+
+def test_stream_relays_chunks_and_caches_the_answer(groq):
+    chunks = list(groq_service.stream_ai_explanation("dengue"))
+    assert len(chunks) == len(DEFAULT_ANSWER.split(" "))
+    assert "".join(chunks) == DEFAULT_ANSWER
+
+    # Cached now: one chunk, no second upstream call, and the JSON route sees it too
+    assert list(groq_service.stream_ai_explanation("what is dengue?")) == [DEFAULT_ANSWER]
+    assert groq_service.get_cached_ai_explanation("Dengue") == DEFAULT_ANSWER
+    assert len(groq.requests) == 1
+
+
+def test_broken_stream_raises_and_caches_nothing(groq):
+    groq.fail_first, groq.fail_status = 10, 500
+    with pytest.raises(LLMError):
+        list(groq_service.stream_ai_explanation("dengue"))
+    assert groq_service.get_cached_ai_explanation("dengue") is None
@@ -0,0 +1,99 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+from shared import job_queue
+from shared.database import db, init_db, BackgroundJob
+from shared.job_queue import enqueue, claim_next, heartbeat, finish, recover_stale
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_PATH", str(tmp_path / "jobs.db"))
+    app = Flask(__name__)
+    init_db(app)
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+def age(job, seconds):
+    """Moves a running job's last heartbeat into the past."""
+    BackgroundJob.query.filter_by(id=job.id).update({"heartbeat_at": datetime.utcnow() - timedelta(seconds=seconds)})
+    db.session.commit()
+
+
+def test_newer_upload_supersedes_the_queued_job(app):
+    old = enqueue("translate", "translate:a.csv", {"filename": "a.csv"})
+    other = enqueue("translate", "translate:b.csv", {"filename": "b.csv"})
+    new = enqueue("translate", "translate:a.csv", {"filename": "a.csv", "cols": [1]})
+    assert db.session.get(BackgroundJob, old.id).status == "superseded"
+    assert (other.status, new.status) == ("queued", "queued")
+
+    assert claim_next("w1").id == other.id
+    job = claim_next("w1")
+    assert (job.id, job.status, job.worker, job.attempts) == (new.id, "running", "w1", 1)
+    assert json.loads(job.payload)["cols"] == [1]
+    assert claim_next("w1") is None
+
+
+def test_running_job_is_not_superseded(app):
+    running = enqueue("reindex", "reindex")
+    claim_next("w1")
+    queued = enqueue("reindex", "reindex")
+    assert db.session.get(BackgroundJob, running.id).status == "running"
+    assert queued.status == "queued"
+
+
+def test_heartbeat_and_finish(app):
+    job = enqueue("translate", "translate:a.csv")
+    claim_next("w1")
+    heartbeat(job.id, done=40, total=100)
+    db.session.refresh(job)
+    assert (job.progress_done, job.progress_total) == (40, 100)
+
+    finish(job.id, result={"translated": 100})
+    db.session.refresh(job)
+    assert (job.status, json.loads(job.result)) == ("done", {"translated": 100})
+    # Late writes from a worker that lost the job change nothing
+    heartbeat(job.id, done=1)
+    finish(job.id, error="too late")
+    db.session.refresh(job)
+    assert (job.status, job.progress_done, job.error) == ("done", 40, None)
+
+    failed = enqueue("reindex", "reindex")
+    claim_next("w1")
+    finish(failed.id, error="boom")
+    db.session.refresh(failed)
+    assert (failed.status, failed.error) == ("failed", "boom")
+
+
+def test_recover_stale_requeues_only_dead_workers(app):
+    dead = enqueue("translate", "translate:a.csv")
+    alive = enqueue("translate", "translate:b.csv")
+    claim_next("w1"), claim_next("w2")
+    age(dead, 120)
+
+    assert recover_stale(stale_after=60) == 1
+    db.session.refresh(dead), db.session.refresh(alive)
+    assert (dead.status, dead.worker) == ("queued", None)
+    assert alive.status == "running"
+
+    job = claim_next("w3")
+    assert (job.id, job.attempts) == (dead.id, 2)
+
+
+def test_recover_stale_supersedes_or_gives_up(app, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_MAX_ATTEMPTS", 1)
+    crashing = enqueue("reindex", "reindex")
+    claim_next("w1")
+    replaced = enqueue("translate", "translate:a.csv")
+    claim_next("w1")
+    newer = enqueue("translate", "translate:a.csv")
+
+    assert recover_stale(stale_after=0) == 0
+    statuses = {job.id: job.status for job in BackgroundJob.query}
+    assert statuses == {crashing.id: "failed", replaced.id: "superseded", newer.id: "queued"}
+    assert "stopped 1 times" in db.session.get(BackgroundJob, crashing.id).error
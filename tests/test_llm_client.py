@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+import pytest
+
+from benchmarks.stub_servers import GroqStub, DEFAULT_ANSWER
+from llm_client import LLMClient, AsyncLLMClient, LLMError, LLMBusyError
+
+PAYLOAD = {"model": "stub", "messages": [{"role": "user", "content": "what is a virus"}]}
+
+
+def client(groq, cls=LLMClient, **kwargs):
+    kwargs = dict(dict(backoff_base=0.01, backoff_cap=0.05, read_timeout=5), **kwargs)
+    return cls(groq.url, "test-key", **kwargs)
+
+
+def test_retries_5xx_then_succeeds():
+    with GroqStub(fail_first=2, fail_status=503) as groq:
+        llm = client(groq)
+        assert llm.chat_completion(PAYLOAD) == DEFAULT_ANSWER
+    assert len(groq.requests) == 3
+    assert llm.stats["retries"] == 2
+
+
+def test_gives_up_after_max_retries():
+    with GroqStub(fail_first=10, fail_status=502) as groq:
+        llm = client(groq, max_retries=2)
+        with pytest.raises(LLMError, match="after 3 attempts"):
+            llm.chat_completion(PAYLOAD)
+    assert len(groq.requests) == 3
+
+
+def test_client_errors_are_not_retried():
+    with GroqStub(fail_first=1, fail_status=401) as groq:
+        with pytest.raises(LLMError):
+            client(groq).chat_completion(PAYLOAD)
+    assert len(groq.requests) == 1
+
+
+def test_retry_after_is_honored_past_the_backoff_cap():
+    with GroqStub(fail_first=1, fail_status=429, retry_after=1) as groq:
+        started = time.monotonic()
+        assert client(groq, retry_budget=5).chat_completion(PAYLOAD) == DEFAULT_ANSWER
+    assert time.monotonic() - started >= 1.0
+    assert len(groq.requests) == 2
+
+
+def test_retry_after_beyond_the_budget_gives_up_at_once():
+    with GroqStub(fail_first=1, fail_status=429, retry_after=30) as groq:
+        started = time.monotonic()
+        with pytest.raises(LLMError, match="budget"):
+            client(groq, retry_budget=2).chat_completion(PAYLOAD)
+    assert time.monotonic() - started < 1.0
+    assert len(groq.requests) == 1
+
+
+def test_stream_yields_the_answer():
+    with GroqStub() as groq:
+        assert "".join(client(groq).stream_chat_completion(PAYLOAD)) == DEFAULT_ANSWER
+
+
+def test_busy_when_every_slot_is_taken():
+    with GroqStub() as groq:
+        llm = client(groq, max_concurrency=1, acquire_timeout=0.05)
+        assert llm._slots.acquire(timeout=1)
+        with pytest.raises(LLMBusyError):
+            llm.chat_completion(PAYLOAD)
+        llm._slots.release()
+    assert groq.requests == []
+
+
+def test_async_client_retries_and_streams():
+    async def run(llm):
+        try:
+            answer = await llm.chat_completion(PAYLOAD)
+            streamed = "".join([chunk async for chunk in llm.stream_chat_completion(PAYLOAD)])
+            return answer, streamed
+        finally:
+            await llm.aclose()
+
+    with GroqStub(fail_first=1, fail_status=503) as groq:
+        assert asyncio.run(run(client(groq, AsyncLLMClient))) == (DEFAULT_ANSWER, DEFAULT_ANSWER)
+    assert len(groq.requests) == 3
+
+
+def test_async_retry_after_beyond_the_budget_gives_up_at_once():
+    async def run(llm):
+        try:
+            await llm.chat_completion(PAYLOAD)
+        finally:
+            await llm.aclose()
+
+    with GroqStub(fail_first=1, fail_status=503, retry_after=30) as groq:
+        with pytest.raises(LLMError, match="budget"):
+            asyncio.run(run(client(groq, AsyncLLMClient, retry_budget=2)))
+    assert len(groq.requests) == 1
@@ -0,0 +1,62 @@
+import pytest
+
+from knowledge_base import build_knowledge_base, load_snapshot, write_snapshot
+from shared.mapped_tables import open_tables, write_tables
+
+TABLES = {
+    "descriptions": {"dengue": "Viral fever spread by Aedes mosquitoes.", "malaria": "Parasite spread by Anopheles.",
+                     "டெங்கு": "கொசு மூலம் பரவும் காய்ச்சல்", "empty": ""},
+    "precautions": {"dengue": ["use nets", "drain standing water"], "malaria": ["use nets"], "none": []},
+}
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "tables.bin")
+    write_tables(path, TABLES, meta={"version": 7})
+    meta, tables = open_tables(path)
+
+    assert meta == {"version": 7}
+    for name, expected in TABLES.items():
+        table = tables[name]
+        assert dict(table.items()) == expected
+        assert len(table) == len(expected)
+        assert list(table) == sorted(expected, key=lambda k: k.encode("utf-8"))
+    assert tables["descriptions"].get("cholera") is None
+    assert "cholera" not in tables["descriptions"] and 42 not in tables["descriptions"]
+    with pytest.raises(KeyError):
+        tables["precautions"]["cholera"]
+
+
+def test_open_mapping_survives_a_rewrite(tmp_path):
+    path = str(tmp_path / "tables.bin")
+    write_tables(path, {"t": {"k": "old"}})
+    _, old = open_tables(path)
+    write_tables(path, {"t": {"k": "new"}})
+    _, new = open_tables(path)
+    assert (old["t"]["k"], new["t"]["k"]) == ("old", "new")
+
+
+def test_rejects_other_formats_and_bad_values(tmp_path):
+    path = str(tmp_path / "tables.bin")
+    write_tables(path, {"t": {"k": "v"}}, format_version=1)
+    with pytest.raises(ValueError):
+        open_tables(path, format_version=2)
+    (tmp_path / "short.bin").write_bytes(b"MTB")
+    with pytest.raises(ValueError):
+        open_tables(str(tmp_path / "short.bin"))
+    with pytest.raises(ValueError):
+        write_tables(path, {"t": {"k": ["a\x1fb"]}})
+
+
+def test_knowledge_base_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "kb_snapshot.bin")
+    kb = build_knowledge_base([])
+    write_snapshot(kb, [], path)
+    mapped = load_snapshot([], path)
+
+    assert mapped is not None
+    assert mapped.topics == kb.topics
+    assert dict(mapped.descriptions.items()) == kb.descriptions
+    assert {k: list(v) for k, v in mapped.precautions.items()} == {k: list(v) for k, v in kb.precautions.items()}
+    assert mapped.fuzzy_index.search("malaira", limit=1) == kb.fuzzy_index.search("malaira", limit=1)
+    assert load_snapshot(["Hindi"], path) is None  # compiled for other languages
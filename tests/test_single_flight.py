@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from shared.single_flight import SingleFlight, AsyncSingleFlight
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def run_concurrently(flight, fn, callers, key="k"):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.do(key, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for t in threads:
+        t.start()
+    return threads, results, errors
+
+
+def test_concurrent_callers_share_one_call():
+    flight, release, runs = SingleFlight(), threading.Event(), []
+
+    def fetch():
+        runs.append(1)
+        release.wait(5)
+        return "answer"
+
+    threads, results, errors = run_concurrently(flight, fetch, 8)
+    wait_for(lambda: flight.stats()["deduplicated"] == 7)
+    release.set()
+    for t in threads:
+        t.join()
+    assert (len(runs), results, errors) == (1, ["answer"] * 8, [])
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_error_reaches_every_waiter():
+    flight, release = SingleFlight(), threading.Event()
+
+    def fetch():
+        release.wait(5)
+        raise ValueError("upstream down")
+
+    threads, results, errors = run_concurrently(flight, fetch, 4)
+    wait_for(lambda: flight.stats()["deduplicated"] == 3)
+    release.set()
+    for t in threads:
+        t.join()
+    assert results == [] and len(errors) == 4
+    assert all(isinstance(e, ValueError) for e in errors)
+
+
+def test_finished_calls_are_not_remembered():
+    flight, runs = SingleFlight(), []
+    assert flight.do("k", lambda: runs.append(1) or len(runs)) == 1
+    assert flight.do("k", lambda: runs.append(1) or len(runs)) == 2
+    assert flight.do("other", lambda: "x") == "x"
+    assert flight.stats()["deduplicated"] == 0
+
+
+def test_async_callers_share_one_task_and_survive_a_cancelled_waiter():
+    async def run():
+        flight, runs = AsyncSingleFlight(), []
+
+        async def fetch():
+            runs.append(1)
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        gone = asyncio.ensure_future(flight.do("k", fetch))
+        waiters = [asyncio.ensure_future(flight.do("k", fetch)) for _ in range(4)]
+        await asyncio.sleep(0)
+        gone.cancel()  # e.g. a client disconnected
+        results = await asyncio.gather(*waiters)
+        with pytest.raises(asyncio.CancelledError):
+            await gone
+        return runs, results, flight.stats()
+
+    runs, results, stats = asyncio.run(run())
+    assert (len(runs), results) == (1, ["answer"] * 4)
+    assert (stats["executed"], stats["deduplicated"], stats["in_flight"]) == (1, 4, 0)
@@ -0,0 +1,84 @@
+"""
+FuzzyIndex must find every topic the legacy per-word get_close_matches loop
+of find_topic_info found, including on short words where a typo breaks most
+of the shared trigrams.
+"""
+import random
+from difflib import get_close_matches
+
+import pytest
+
+from knowledge_base import build_knowledge_base
+from topic_index import FuzzyIndex, _normalize
+
+
+@pytest.fixture(scope="module")
+def topics():
+    return build_knowledge_base([]).topics
+
+
+@pytest.fixture(scope="module")
+def index(topics):
+    return FuzzyIndex(topics)
+
+
+def legacy_fuzzy(text, topics):
+    for word in text.split():
+        if len(word) > 4:
+            matches = get_close_matches(word, topics, n=1, cutoff=0.8)
+            if matches:
+                return matches[0]
+    return None
+
+
+def typos(word):
+    """Adjacent swaps, deletions and vowel substitutions/insertions."""
+    out = set()
+    for i in range(len(word) - 1):
+        out.add(word[:i] + word[i + 1] + word[i] + word[i + 2:])
+    for i in range(len(word)):
+        out.add(word[:i] + word[i + 1:])
+        for c in "aeiouy":
+            out.add(word[:i] + c + word[i + 1:])
+            out.add(word[:i] + c + word[i:])
+    out.discard(word)
+    return out
+
+
+def typo_corpus(topics):
+    rng = random.Random(7)
+    vocab = sorted({w for t in topics for w in _normalize(t).split() if len(w) >= 5 and w.isalpha()})
+    corpus = set()
+    for word in vocab:
+        one_edit = sorted(typos(word))
+        corpus.update(one_edit if " " not in word and word in topics else rng.sample(one_edit, min(6, len(one_edit))))
+        if len(word) >= 8:
+            for typo in rng.sample(one_edit, min(3, len(one_edit))):
+                corpus.update(rng.sample(sorted(typos(typo)), 2))
+    return sorted(corpus)
+
+
+@pytest.mark.parametrize("query,topic", [
+    ("malaira", "malaria"),
+    ("dnegue", "dengue"),
+    ("cholrea", "cholera"),
+    ("tyhpoid", "typhoid"),
+])
+def test_swapped_letters_in_short_topics(index, query, topic):
+    assert index.search(query, limit=1, cutoff=0.8)[0][0] == topic
+
+
+def test_finds_everything_the_legacy_loop_found(topics, index):
+    missed, different = [], []
+    for typo in typo_corpus(topics):
+        for text in (typo, f"please tell me about {typo} precautions"):
+            expected = legacy_fuzzy(text, topics)
+            if expected is None:
+                continue
+            hits = index.search(text, limit=1, cutoff=0.8)
+            if not hits:
+                missed.append((text, expected))
+            elif hits[0][0] != expected:
+                different.append((text, expected, hits[0][0]))
+    assert not missed
+    assert not different
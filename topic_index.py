@@ -0,0 +1,271 @@
+"""
+Compiled topic matchers for the Information Knowledge Base.
+
+TopicIndex: Aho-Corasick automaton over every disease name (plus the colloquial
+aliases below), so a message is scanned in a single pass no matter how many
+topics we carry.
+FuzzyIndex: trigram index over topic words for typo-tolerant lookups when
+there is no exact hit.
+"""
+import re
+from difflib import SequenceMatcher
+
+# Colloquial / regional names -> canonical topic (keys of description_dict)
+TOPIC_ALIASES = {
+    "chickenpox": "chicken pox",
+    "flu": "influenza",
+    "sugar": "diabetes",
+    "bp": "hypertension",
+    "high bp": "hypertension",
+    "madras eye": "madras eye (conjunctivitis)",
+    "piles": "dimorphic hemmorhoids(piles)",
+    "chinnammai": "chicken pox",
+    "chinna ammai": "chicken pox",
+}
+
+
+class TopicIndex:
+    """
+    Multi-pattern matcher over topic names and aliases.
+    Topic names match anywhere in the text (same as the old substring scan);
+    aliases are short words, so they only match on word boundaries
+    ("flu" must not fire inside "fluid" or "influenza").
+    """
+
+    def __init__(self, topics, aliases=None):
+        # Node 0 is the root. goto[n] = {char: next_node}
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]  # (pattern_len, topic, is_alias)
+        self.size = 0
+
+        for topic in topics:
+            self._add(topic, topic, False)
+        for alias, canonical in (aliases or {}).items():
+            self._add(alias, canonical, True)
+
+        self._build_failure_links()
+
+    def _add(self, pattern, topic, is_alias):
+        pattern = pattern.lower()
+        if not pattern:
+            return
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[node][ch] = nxt
+            node = nxt
+        self._out[node].append((len(pattern), topic, is_alias))
+        self.size += 1
+
+    def _build_failure_links(self):
+        # Breadth-first so every node's failure target is final before its children
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                # Inherit matches that end at the same position (suffix patterns)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find_all(self, text):
+        """
+        Returns every (start, end, topic) hit in `text` from one pass.
+        """
+        text = text.lower()
+        goto, fail, out = self._goto, self._fail, self._out
+        hits = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if not out[node]:
+                continue
+            end = i + 1
+            for length, topic, is_alias in out[node]:
+                start = end - length
+                if is_alias and not _on_word_boundary(text, start, end):
+                    continue
+                hits.append((start, end, topic))
+        return hits
+
+    def best_match(self, text):
+        """
+        Longest matching topic in `text` (earliest one wins a tie), or None.
+        """
+        best = None
+        for start, end, topic in self.find_all(text):
+            if best is None or (end - start) > (best[1] - best[0]) or \
+                    ((end - start) == (best[1] - best[0]) and start < best[0]):
+                best = (start, end, topic)
+        return best[2] if best else None
+
+
+class FuzzyIndex:
+    """
+    Typo-tolerant topic lookup.
+    Query words are matched against the topic vocabulary through a character
+    trigram inverted index plus an index of one-letter deletions (so every
+    one-edit typo - "malaira", "dnegue" - finds its word, however short), and
+    only topics containing a near-match word are scored (difflib ratio over message windows that start and end on such
+    words, at most one word longer than the topic name). Multi-word names like "dimorphic hemmorhoids(piles)" therefore match
+    "dimorphic hemorhoids" even though no single word equals the topic.
+    A word neither index places in a name short enough to match it alone is
+    rated against the names it shares a trigram with, so every topic the old
+    per-word get_close_matches loop found is still found.
+    """
+
+    def __init__(self, topics, min_word_len=5, word_cutoff=0.5):
+        self.min_word_len = min_word_len
+        self.word_cutoff = word_cutoff
+        self._topics = list(topics)
+        self._names = []            # normalized topic name
+        self._lengths = []          # words per topic name
+        self._vocab = []            # unique topic words
+        self._vocab_trigrams = []   # len(trigram set) per vocab word
+        self._vocab_topics = []     # vocab id -> topic ids
+        self._trigram_index = {}    # trigram -> vocab ids
+        self._deletion_index = {}   # word and each of its one-letter deletions -> vocab ids
+        self._name_sizes = {}       # len(topic name) -> topic ids
+        self._reachable = {}        # (word length, cutoff) -> ids of topics whose length allows >= cutoff
+
+        vocab_ids = {}
+        for topic_id, topic in enumerate(self._topics):
+            words = _normalize(topic).split()
+            self._names.append(" ".join(words))
+            self._lengths.append(len(words))
+            self._name_sizes.setdefault(len(self._names[-1]), set()).add(topic_id)
+            for word in set(words):
+                vid = vocab_ids.get(word)
+                if vid is None:
+                    vid = vocab_ids[word] = len(self._vocab)
+                    self._vocab.append(word)
+                    self._vocab_topics.append([])
+                    grams = _trigrams(word)
+                    self._vocab_trigrams.append(len(grams))
+                    for g in grams:
+                        self._trigram_index.setdefault(g, []).append(vid)
+                    for variant in _deletions(word):
+                        self._deletion_index.setdefault(variant, set()).add(vid)
+                self._vocab_topics[vid].append(topic_id)
+
+    def _similar_words(self, word, cutoff):
+        grams = _trigrams(word)
+        shared = {}
+        for g in grams:
+            for vid in self._trigram_index.get(g, ()):
+                shared[vid] = shared.get(vid, 0) + 1
+        hits = set()
+        for vid, count in shared.items():
+            dice = 2.0 * count / (len(grams) + self._vocab_trigrams[vid])
+            if dice >= self.word_cutoff:
+                hits.add(vid)
+        # One edit apart (substitution, insertion, deletion, adjacent swap): the two
+        # words share a one-letter deletion; trigrams alone miss these in short words
+        for variant in _deletions(word):
+            hits.update(self._deletion_index.get(variant, ()))
+        # The legacy loop rated the word against whole topic names; if no hit so far is in
+        # a name short enough for that ("tract" of "urinary tract infection" for "atract"),
+        # rate the names sharing a trigram the same way - two edits ("yelaoma" for
+        # "melanoma"), letters missing ("atract" for "cataracts")
+        reachable = self._reachable.get((len(word), cutoff))
+        if reachable is None:
+            reachable = set()
+            for size in range(int(len(word) * cutoff / (2 - cutoff)), int(len(word) * (2 - cutoff) / cutoff) + 2):
+                reachable.update(self._name_sizes.get(size, ()))
+            reachable = self._reachable[(len(word), cutoff)] = frozenset(reachable)
+        if not any(topic_id in reachable for vid in hits for topic_id in self._vocab_topics[vid]):
+            matcher = SequenceMatcher(None, "", word, autojunk=False)
+            rated = set()
+            for vid in shared:
+                for topic_id in self._vocab_topics[vid]:
+                    if topic_id not in reachable or topic_id in rated:
+                        continue
+                    rated.add(topic_id)
+                    matcher.set_seq1(self._names[topic_id])
+                    if matcher.quick_ratio() >= cutoff and matcher.ratio() >= cutoff:
+                        hits.add(vid)
+        return hits
+
+    def search(self, text, limit=5, cutoff=0.8):
+        """
+        Returns up to `limit` (topic, score) pairs with score >= cutoff,
+        best first. Score is the difflib ratio of the topic name against the
+        closest window of the message.
+        """
+        words = _normalize(text).split()
+
+        # 1. Anchor positions: query words that look like some topic word
+        anchors = {}  # topic_id -> positions
+        for pos, word in enumerate(words):
+            if len(word) < self.min_word_len:
+                continue
+            for vid in self._similar_words(word, cutoff):
+                for topic_id in self._vocab_topics[vid]:
+                    anchors.setdefault(topic_id, set()).add(pos)
+
+        # 2. Score each candidate over windows that start and end on its anchors
+        scored = []
+        matcher = SequenceMatcher(autojunk=False)
+        for topic_id, positions in anchors.items():
+            name = self._names[topic_id]
+            max_words = self._lengths[topic_id] + 1
+            best = 0.0
+            positions = sorted(positions)
+            for i, start in enumerate(positions):
+                for end in positions[i:]:
+                    if end - start >= max_words:
+                        break
+                    window = " ".join(words[start:end + 1])
+                    # Length bound on the ratio: skip without running difflib
+                    if 2.0 * min(len(window), len(name)) / (len(window) + len(name)) < max(cutoff, best):
+                        continue
+                    if matcher.b is not name:
+                        matcher.set_seq2(name)
+                    matcher.set_seq1(window)
+                    if matcher.real_quick_ratio() <= best or matcher.quick_ratio() <= best:
+                        continue
+                    best = max(best, matcher.ratio())
+            if best >= cutoff:
+                scored.append((best, -len(name), self._topics[topic_id]))
+
+        scored.sort(reverse=True)
+        return [(topic, score) for score, _, topic in scored[:limit]]
+
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def _normalize(text):
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def _trigrams(word):
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _deletions(word):
+    """The word itself and every string left after deleting one of its letters."""
+    return {word} | {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _on_word_boundary(text, start, end):
+    if start > 0 and text[start - 1].isalnum():
+        return False
+    if end < len(text) and text[end].isalnum():
+        return False
+    return True